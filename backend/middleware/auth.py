@@ -1,12 +1,28 @@
-from fastapi import HTTPException, Security, Depends
+from fastapi import HTTPException, Security, Depends, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from utils.auth import verify_token
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.cache import LRUCache
 from utils.database import get_database
+from typing import Optional
+import os
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)):
-    token = credentials.credentials
+# Authenticated users by id; routes that modify users call invalidate_cached_users
+user_cache = LRUCache(
+    max_size=int(os.environ.get("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("USER_CACHE_TTL", "30"))
+)
+
+
+def invalidate_cached_users(*user_ids: str) -> None:
+    """Drop users from the auth cache after changing their documents"""
+    user_cache.invalidate(user_ids)
+
+
+async def _user_from_token(token: str, db: AsyncIOMotorDatabase) -> dict:
     payload = verify_token(token)
     
     if payload is None:
@@ -16,14 +32,36 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    # Fetch user from database
-    db = get_database()
-    user = await db.users.find_one({"_id": user_id})
-    
+    # Serve from the cache, falling back to the database
+    user = user_cache.get(user_id)
     if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
+        epoch = user_cache.epoch()
+        user = await db.users.find_one({"_id": user_id})
+        
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        
+        user_cache.put(user_id, user, epoch)
     
-    return user
+    # Handlers get their own copy, so they cannot change the cached document
+    return dict(user)
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    return await _user_from_token(credentials.credentials, db)
+
+async def get_stream_user(
+    access_token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Like get_current_user, but also accepts `?access_token=` (EventSource cannot send headers)"""
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await _user_from_token(token, db)
 
 def require_role(allowed_roles: list):
     async def role_checker(current_user: dict = Depends(get_current_user)):
@@ -9,7 +9,8 @@ class InspectionReport(BaseModel):
     issues: Optional[str] = None
     complaints: Optional[str] = None
     suggestions: Optional[str] = None
-    photos: Optional[List[str]] = []  # base64 strings
+    photos: Optional[List[str]] = []  # URLs served by GET /inspections/{id}/photos/{photo_id}
+    photo_ids: Optional[List[str]] = []  # GridFS ids (sha256 of the content)
     submitted_at: Optional[datetime] = None
     submitted_by: Optional[str] = None
     
@@ -37,6 +38,24 @@ class InspectionCreate(InspectionBase):
     due_date: datetime
     priority: str = "medium"  # low, medium, high
     template_id: str
+
+class CampaignTarget(BaseModel):
+    office_id: str
+    school_id: str
+
+class CampaignSelector(BaseModel):
+    district: Optional[str] = None
+    office_type: Optional[str] = None
+    school_ids: Optional[List[str]] = None  # Defaults to the active schools in `district`
+
+class InspectionCampaign(BaseModel):
+    task_name: str
+    task_description: str
+    template_id: str
+    due_date: datetime
+    priority: str = "medium"  # low, medium, high
+    targets: Optional[List[CampaignTarget]] = []  # Explicit (office, school) pairs
+    selector: Optional[CampaignSelector] = None  # Or every active office matching the selector
     
 class Inspection(InspectionBase):
     id: str = Field(alias="_id")
@@ -49,6 +68,10 @@ class Inspection(InspectionBase):
     report: Optional[InspectionReport] = None
     office_response: Optional[OfficeResponse] = None
     govt_review: Optional[GovtReview] = None
+    # Derived on write (see services.inspection_metrics)
+    avg_rating: Optional[float] = None
+    response_time_days: Optional[int] = None
+    issue_categories: List[str] = []
     created_by: str
     created_at: datetime
     
@@ -62,4 +85,4 @@ class InspectionSubmit(BaseModel):
     issues: str
     complaints: str
     suggestions: str
-    photos: List[str] = []  # base64 strings
+    photos: List[str] = []  # base64 strings or data URLs, moved to GridFS on submit
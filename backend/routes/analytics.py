@@ -7,7 +7,10 @@ from services.analytics_service import (
     get_office_compliance,
     get_status_distribution
 )
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.cache import dashboard_cache
 from utils.database import get_database
+from utils.loader import RelationLoader
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
@@ -17,7 +20,7 @@ async def get_analytics_global(
     current_user: dict = Depends(require_role(["admin"]))
 ):
     """Get global system statistics"""
-    stats = await get_global_stats()
+    stats = await dashboard_cache.get("global_stats", get_global_stats)
     return stats
 
 @router.get("/trends")
@@ -56,11 +59,10 @@ async def get_analytics_status(
 @router.get("/school/{school_id}")
 async def get_school_analytics(
     school_id: str,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get detailed analytics for a specific school"""
-    db = get_database()
-    
     # Verify school exists
     school = await db.schools.find_one({"_id": school_id})
     if not school:
@@ -93,10 +95,14 @@ async def get_school_analytics(
     ).sort("created_at", -1).limit(10).to_list(10)
     
     # Enrich recent inspections with office and team data
+    loader = RelationLoader(db)
+    offices = await loader.load_many("offices", (i["office_id"] for i in recent_inspections))
+    teams = await loader.load_many("teams", (i["team_id"] for i in recent_inspections))
+    
     recent_activity = []
     for inspection in recent_inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        team = await db.teams.find_one({"_id": inspection["team_id"]})
+        office = offices.get(inspection["office_id"])
+        team = teams.get(inspection["team_id"])
         
         recent_activity.append({
             "id": inspection["_id"],
@@ -129,11 +135,10 @@ async def get_school_analytics(
 async def get_school_activity_feed(
     school_id: str,
     days: int = 7,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get recent activity feed for a school"""
-    db = get_database()
-    
     # If headmaster, verify they own this school
     if current_user.get("role") == "headmaster" and current_user.get("school_id") != school_id:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -149,9 +154,11 @@ async def get_school_activity_feed(
         "created_at": {"$gte": start_date}
     }).sort("created_at", -1).limit(20).to_list(20)
     
+    loader = RelationLoader(db)
+    teams = await loader.load_many("teams", (i["team_id"] for i in inspections))
+    
     for inspection in inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        team = await db.teams.find_one({"_id": inspection["team_id"]})
+        team = teams.get(inspection["team_id"])
         
         activities.append({
             "type": "inspection_assigned",
@@ -1,17 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.user import UserCreate, UserLogin, UserResponse, UserUpdate, ChangePassword, UserStats
-from utils.auth import get_password_hash, verify_password, create_access_token
+from utils.auth import get_password_hash_async, verify_password_async, create_access_token
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
-from middleware.auth import get_current_user
+from middleware.auth import get_current_user, invalidate_cached_users
 from datetime import datetime
 import uuid
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register")
-async def register(user_data: UserCreate):
-    db = get_database()
-    
+async def register(user_data: UserCreate, db: AsyncIOMotorDatabase = Depends(get_database)):
     # Check if user already exists
     existing_user = await db.users.find_one({"email": user_data.email})
     if existing_user:
@@ -20,7 +19,7 @@ async def register(user_data: UserCreate):
     # Create user document
     user_dict = user_data.dict()
     user_dict["_id"] = str(uuid.uuid4())
-    user_dict["password"] = get_password_hash(user_data.password)
+    user_dict["password"] = await get_password_hash_async(user_data.password)
     user_dict["is_active"] = True
     user_dict["created_at"] = datetime.utcnow()
     user_dict["team_id"] = None
@@ -48,16 +47,14 @@ async def register(user_data: UserCreate):
     }
 
 @router.post("/login")
-async def login(credentials: UserLogin):
-    db = get_database()
-    
+async def login(credentials: UserLogin, db: AsyncIOMotorDatabase = Depends(get_database)):
     # Find user
     user = await db.users.find_one({"email": credentials.email})
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not verify_password(credentials.password, user["password"]):
+    if not await verify_password_async(credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Check if user is active
@@ -94,9 +91,8 @@ async def get_current_user_info(current_user: dict = Depends(lambda: __import__(
     }
 
 @router.get("/schools")
-async def get_schools():
+async def get_schools(db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get all active schools for signup dropdown"""
-    db = get_database()
     schools = await db.schools.find({"is_active": True}).to_list(100)
     return [
         {
@@ -111,11 +107,10 @@ async def get_schools():
 @router.put("/profile")
 async def update_profile(
     profile_data: UserUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update user profile"""
-    db = get_database()
-    
     update_fields = {}
     if profile_data.name:
         update_fields["name"] = profile_data.name
@@ -132,6 +127,7 @@ async def update_profile(
         {"_id": current_user["_id"]},
         {"$set": update_fields}
     )
+    invalidate_cached_users(current_user["_id"])
     
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update profile")
@@ -157,29 +153,27 @@ async def update_profile(
 @router.post("/change-password")
 async def change_password(
     password_data: ChangePassword,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Change user password"""
-    db = get_database()
-    
     # Verify current password
-    if not verify_password(password_data.current_password, current_user["password"]):
+    if not await verify_password_async(password_data.current_password, current_user["password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update password
-    new_password_hash = get_password_hash(password_data.new_password)
+    new_password_hash = await get_password_hash_async(password_data.new_password)
     await db.users.update_one(
         {"_id": current_user["_id"]},
         {"$set": {"password": new_password_hash}}
     )
+    invalidate_cached_users(current_user["_id"])
     
     return {"message": "Password changed successfully"}
 
 @router.get("/stats")
-async def get_user_stats(current_user: dict = Depends(get_current_user)):
+async def get_user_stats(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get user statistics"""
-    db = get_database()
-    
     if current_user["role"] != "student" or not current_user.get("team_id"):
         return {
             "total_inspections": 0,
@@ -1,41 +1,56 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from models.inspection import Inspection, InspectionSubmit, InspectionReport, InspectionCreate
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from gridfs.errors import NoFile
+from models.inspection import Inspection, InspectionSubmit, InspectionReport, InspectionCreate, InspectionCampaign
 from middleware.auth import get_current_user, require_role
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
+from utils.pagination import find_page
+from utils.loader import RelationLoader
 from services.assignment_service import assign_random_team
-from datetime import datetime
-from typing import List, Optional
+from services.campaign_service import create_campaign
+from services.inspection_metrics import compute_derived_fields, issue_category_stages
+from services.rollup_service import (
+    ConcurrentModificationError, apply_transition, delete_inspection_with_rollup, update_inspection_with_rollup
+)
+from services.notification_outbox import enqueue_notification
+from services.search_service import SEARCH_PROJECTION, inspection_search_fields
+from services.photo_store import store_photos, photo_url, get_bucket, iter_photo, sign_report_photos, verify_photo_signature
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from pymongo import DESCENDING
 import uuid
+import re
+import time
 
 router = APIRouter(prefix="/inspections", tags=["inspections"])
 
+
+async def concurrent_modification_handler(request: Request, exc: ConcurrentModificationError) -> JSONResponse:
+    """409 for a transition that lost the race against another write to the same inspection"""
+    return JSONResponse(status_code=409, content={"detail": "Inspection was modified concurrently, please retry"})
+
 @router.get("/team/{team_id}")
-async def get_team_inspections(team_id: str, current_user: dict = Depends(get_current_user)):
+async def get_team_inspections(team_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get all inspections assigned to a team"""
-    db = get_database()
-    
     # Verify user belongs to the team
     if current_user.get("team_id") != team_id and current_user.get("role") not in ["admin", "headmaster"]:
         raise HTTPException(status_code=403, detail="Not authorized to view this team's inspections")
     
-    inspections = await db.inspections.find({"team_id": team_id}).to_list(100)
+    inspections = await db.inspections.find({"team_id": team_id}, SEARCH_PROJECTION).to_list(100)
     
     # Enrich with office and school data
-    for inspection in inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        school = await db.schools.find_one({"_id": inspection["school_id"]})
-        
-        inspection["office"] = office if office else None
-        inspection["school"] = school if school else None
+    loader = RelationLoader(db)
+    await loader.attach(inspections, "office", "offices", "office_id")
+    await loader.attach(inspections, "school", "schools", "school_id")
+    sign_report_photos(inspections)
     
     return inspections
 
 @router.get("/{inspection_id}")
-async def get_inspection_detail(inspection_id: str, current_user: dict = Depends(get_current_user)):
+async def get_inspection_detail(inspection_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get detailed inspection information"""
-    db = get_database()
-    
-    inspection = await db.inspections.find_one({"_id": inspection_id})
+    inspection = await db.inspections.find_one({"_id": inspection_id}, SEARCH_PROJECTION)
     if not inspection:
         raise HTTPException(status_code=404, detail="Inspection not found")
     
@@ -45,15 +60,12 @@ async def get_inspection_detail(inspection_id: str, current_user: dict = Depends
             raise HTTPException(status_code=403, detail="Not authorized to view this inspection")
     
     # Enrich with related data
-    office = await db.offices.find_one({"_id": inspection["office_id"]})
-    school = await db.schools.find_one({"_id": inspection["school_id"]})
-    team = await db.teams.find_one({"_id": inspection["team_id"]})
-    template = await db.templates.find_one({"_id": inspection["template_id"]})
-    
-    inspection["office"] = office
-    inspection["school"] = school
-    inspection["team"] = team
-    inspection["template"] = template
+    loader = RelationLoader(db)
+    inspection["office"] = await loader.load("offices", inspection["office_id"])
+    inspection["school"] = await loader.load("schools", inspection["school_id"])
+    inspection["team"] = await loader.load("teams", inspection["team_id"])
+    inspection["template"] = await loader.load("templates", inspection["template_id"])
+    sign_report_photos([inspection])
     
     return inspection
 
@@ -61,11 +73,10 @@ async def get_inspection_detail(inspection_id: str, current_user: dict = Depends
 async def submit_inspection_report(
     inspection_id: str,
     report_data: InspectionSubmit,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Submit inspection report"""
-    db = get_database()
-    
     # Get inspection
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -79,6 +90,12 @@ async def submit_inspection_report(
     if inspection.get("status") != "assigned":
         raise HTTPException(status_code=400, detail="Inspection already submitted")
     
+    # Photos go to the blob store; the report keeps their URLs and ids
+    try:
+        photo_ids = await store_photos(report_data.photos, current_user["_id"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid photo: {e}")
+    
     # Create report
     report = {
         "cleanliness_rating": report_data.cleanliness_rating,
@@ -87,29 +104,107 @@ async def submit_inspection_report(
         "issues": report_data.issues,
         "complaints": report_data.complaints,
         "suggestions": report_data.suggestions,
-        "photos": report_data.photos,
+        "photos": [photo_url(inspection_id, photo_id) for photo_id in photo_ids],
+        "photo_ids": photo_ids,
         "submitted_at": datetime.utcnow(),
         "submitted_by": current_user["_id"]
     }
     
-    # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    # Update inspection (derived fields are stored alongside the report)
+    await update_inspection_with_rollup(
+        inspection,
         {
             "$set": {
                 "report": report,
-                "status": "submitted"
+                "status": "submitted",
+                **compute_derived_fields({"report": report})
             }
         }
     )
     
     return {"message": "Inspection report submitted successfully", "inspection_id": inspection_id}
 
+@router.get("/{inspection_id}/photos/{photo_id}")
+async def get_inspection_photo(
+    inspection_id: str,
+    photo_id: str,
+    request: Request,
+    expires: int = Query(...),
+    signature: str = Query(...),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Stream an inspection photo with ETag and Range support.
+
+    Not behind bearer auth so report URLs work directly in <img> tags; instead the URL must
+    carry an unexpired signature, handed out with the report to users allowed to read it.
+    """
+    if not verify_photo_signature(inspection_id, photo_id, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired photo URL")
+    
+    owner = await db.inspections.find_one({"_id": inspection_id, "report.photo_ids": photo_id}, {"_id": 1})
+    if not owner:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    try:
+        grid_out = await get_bucket(db).open_download_stream(photo_id)
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    # Content-addressed, so the id is a strong validator and the bytes never change
+    etag = f'"{photo_id}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"private, max-age={max(0, expires - int(time.time()))}, immutable"
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    size = grid_out.length
+    start, end = 0, size - 1
+    status_code = 200
+    
+    range_header = request.headers.get("range")
+    if range_header and size > 0:
+        byte_range = _parse_byte_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    headers["Content-Length"] = str(end - start + 1)
+    content_type = (grid_out.metadata or {}).get("content_type", "application/octet-stream")
+    
+    return StreamingResponse(
+        iter_photo(grid_out, start, end),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers
+    )
+
+
+def _parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive (start, end), or None if unsatisfiable"""
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
 @router.get("/history/{team_id}")
-async def get_team_history(team_id: str, current_user: dict = Depends(get_current_user)):
+async def get_team_history(team_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get completed inspections for a team"""
-    db = get_database()
-    
     # Verify access
     if current_user.get("team_id") != team_id and current_user.get("role") not in ["admin", "headmaster"]:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -117,12 +212,12 @@ async def get_team_history(team_id: str, current_user: dict = Depends(get_curren
     inspections = await db.inspections.find({
         "team_id": team_id,
         "status": {"$in": ["submitted", "responded", "closed", "escalated"]}
-    }).to_list(100)
+    }, SEARCH_PROJECTION).to_list(100)
     
     # Enrich with office data
-    for inspection in inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        inspection["office"] = office
+    loader = RelationLoader(db)
+    await loader.attach(inspections, "office", "offices", "office_id")
+    sign_report_photos(inspections)
     
     return inspections
 
@@ -137,11 +232,10 @@ async def get_office_inspections(
     date_to: Optional[str] = None,
     school_id: Optional[str] = None,
     priority: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all inspections for a specific office"""
-    db = get_database()
-    
     # Verify user belongs to the office or is admin
     if current_user.get("role") == "office":
         if current_user.get("office_id") != office_id:
@@ -167,15 +261,13 @@ async def get_office_inspections(
             query["assigned_date"] = {"$lte": datetime.fromisoformat(date_to)}
     
     # Get inspections
-    inspections = await db.inspections.find(query).sort("assigned_date", -1).to_list(100)
+    inspections = await db.inspections.find(query, SEARCH_PROJECTION).sort("assigned_date", -1).to_list(100)
     
     # Enrich with school and team data
-    for inspection in inspections:
-        school = await db.schools.find_one({"_id": inspection["school_id"]})
-        team = await db.teams.find_one({"_id": inspection["team_id"]})
-        
-        inspection["school"] = school
-        inspection["team"] = team
+    loader = RelationLoader(db)
+    await loader.attach(inspections, "school", "schools", "school_id")
+    await loader.attach(inspections, "team", "teams", "team_id")
+    sign_report_photos(inspections)
     
     return inspections
 
@@ -183,11 +275,10 @@ async def get_office_inspections(
 @router.get("/office/{office_id}/stats")
 async def get_office_stats(
     office_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get statistics for office dashboard"""
-    db = get_database()
-    
     # Verify user belongs to the office or is admin
     if current_user.get("role") == "office":
         if current_user.get("office_id") != office_id:
@@ -203,13 +294,7 @@ async def get_office_stats(
     responded = len([i for i in all_inspections if i["status"] in ["responded", "closed"]])
     
     # Calculate average rating
-    ratings = []
-    for inspection in all_inspections:
-        if inspection.get("report"):
-            report = inspection["report"]
-            if report.get("cleanliness_rating") and report.get("staff_behavior_rating") and report.get("service_quality_rating"):
-                avg = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                ratings.append(avg)
+    ratings = [i["avg_rating"] for i in all_inspections if i.get("avg_rating") is not None]
     
     avg_rating = round(sum(ratings) / len(ratings), 1) if ratings else 0
     
@@ -237,11 +322,10 @@ async def get_office_stats(
 async def submit_office_response(
     inspection_id: str,
     response_data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Submit office response to inspection report"""
-    db = get_database()
-    
     # Get inspection
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -280,18 +364,27 @@ async def submit_office_response(
         "responded_by": current_user["_id"]
     }
     
-    # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    # Update inspection (recomputes response time)
+    await update_inspection_with_rollup(
+        inspection,
         {
             "$set": {
                 "office_response": office_response,
-                "status": "responded"
+                "status": "responded",
+                **compute_derived_fields({"report": inspection["report"], "office_response": office_response})
             }
         }
     )
     
-    # TODO: Create notification for govt responder
+    # Notify govt responders
+    await enqueue_notification(
+        inspection,
+        "response",
+        "Office response received",
+        f"The office responded to inspection \"{inspection['task_name']}\"",
+        ["responders"],
+        actor_id=current_user["_id"]
+    )
     
     return {"message": "Office response submitted successfully", "inspection_id": inspection_id}
 
@@ -300,11 +393,10 @@ async def submit_office_response(
 async def edit_office_response(
     inspection_id: str,
     response_data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Edit office response (only before govt review)"""
-    db = get_database()
-    
     # Get inspection
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -346,9 +438,14 @@ async def edit_office_response(
     }
     
     # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
-        {"$set": {"office_response": office_response}}
+    await update_inspection_with_rollup(
+        inspection,
+        {
+            "$set": {
+                "office_response": office_response,
+                **compute_derived_fields({"report": inspection["report"], "office_response": office_response})
+            }
+        }
     )
     
     return {"message": "Office response updated successfully"}
@@ -361,11 +458,10 @@ async def get_office_response_history(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     school_id: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get response history for an office with filters"""
-    db = get_database()
-    
     # Verify user belongs to the office or is admin
     if current_user.get("role") == "office":
         if current_user.get("office_id") != office_id:
@@ -392,15 +488,13 @@ async def get_office_response_history(
             query["office_response.responded_at"]["$lte"] = datetime.fromisoformat(date_to)
     
     # Get inspections
-    inspections = await db.inspections.find(query).sort("office_response.responded_at", -1).to_list(1000)
+    inspections = await db.inspections.find(query, SEARCH_PROJECTION).sort("office_response.responded_at", -1).to_list(1000)
     
     # Enrich with school and team data
-    for inspection in inspections:
-        school = await db.schools.find_one({"_id": inspection["school_id"]})
-        team = await db.teams.find_one({"_id": inspection["team_id"]})
-        
-        inspection["school"] = school
-        inspection["team"] = team
+    loader = RelationLoader(db)
+    await loader.attach(inspections, "school", "schools", "school_id")
+    await loader.attach(inspections, "team", "teams", "team_id")
+    sign_report_photos(inspections)
     
     return inspections
 
@@ -409,11 +503,10 @@ async def get_office_response_history(
 async def get_office_analytics(
     office_id: str,
     days: int = 30,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get analytics for office dashboard"""
-    db = get_database()
-    
     # Verify user belongs to the office or is admin
     if current_user.get("role") == "office":
         if current_user.get("office_id") != office_id:
@@ -440,10 +533,8 @@ async def get_office_analytics(
                 if date_key not in rating_trends:
                     rating_trends[date_key] = {"ratings": [], "count": 0}
                 
-                report = inspection["report"]
-                if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                    avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                    rating_trends[date_key]["ratings"].append(avg_rating)
+                if inspection.get("avg_rating") is not None:
+                    rating_trends[date_key]["ratings"].append(inspection["avg_rating"])
                     rating_trends[date_key]["count"] += 1
     
     # Calculate average rating per day
@@ -457,43 +548,15 @@ async def get_office_analytics(
                 "count": data["count"]
             })
     
-    # Issue categories
-    issue_categories = {}
-    for inspection in all_inspections:
-        if inspection.get("report") and inspection["report"].get("issues"):
-            issues_text = inspection["report"]["issues"].lower()
-            
-            # Simple keyword categorization
-            if any(word in issues_text for word in ["clean", "dirty", "garbage", "waste", "hygiene"]):
-                issue_categories["Cleanliness"] = issue_categories.get("Cleanliness", 0) + 1
-            if any(word in issues_text for word in ["staff", "behavior", "rude", "attitude"]):
-                issue_categories["Staff Behavior"] = issue_categories.get("Staff Behavior", 0) + 1
-            if any(word in issues_text for word in ["service", "slow", "delay", "queue", "waiting"]):
-                issue_categories["Service Quality"] = issue_categories.get("Service Quality", 0) + 1
-            if any(word in issues_text for word in ["infrastructure", "building", "facility", "equipment"]):
-                issue_categories["Infrastructure"] = issue_categories.get("Infrastructure", 0) + 1
-            
-            # If no category matched, count as "Other"
-            if not any([
-                any(word in issues_text for word in ["clean", "dirty", "garbage", "waste", "hygiene"]),
-                any(word in issues_text for word in ["staff", "behavior", "rude", "attitude"]),
-                any(word in issues_text for word in ["service", "slow", "delay", "queue", "waiting"]),
-                any(word in issues_text for word in ["infrastructure", "building", "facility", "equipment"])
-            ]):
-                issue_categories["Other"] = issue_categories.get("Other", 0) + 1
-    
-    issue_data = [{"category": k, "count": v} for k, v in issue_categories.items()]
+    # Issue categories, counted from the categories stored at submission
+    issue_rows = await db.inspections.aggregate(issue_category_stages({"office_id": office_id})).to_list(None)
+    issue_data = [{"category": row["_id"], "count": row["count"]} for row in issue_rows]
     
     # Response time analysis
     response_times = []
     for inspection in all_inspections:
-        if inspection.get("report") and inspection.get("office_response"):
-            submitted_at = inspection["report"].get("submitted_at")
-            responded_at = inspection["office_response"].get("responded_at")
-            
-            if submitted_at and responded_at:
-                time_diff = (responded_at - submitted_at).days
-                response_times.append(time_diff)
+        if inspection.get("response_time_days") is not None:
+            response_times.append(inspection["response_time_days"])
     
     # Group response times into buckets
     response_time_buckets = {
@@ -536,11 +599,10 @@ async def get_office_analytics(
 async def approve_inspection_report(
     inspection_id: str,
     approval_data: dict,
-    current_user: dict = Depends(require_role(["headmaster", "admin"]))
+    current_user: dict = Depends(require_role(["headmaster", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Approve or reject an inspection report (headmaster/admin only)"""
-    db = get_database()
-    
     # Get inspection
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -580,12 +642,20 @@ async def approve_inspection_report(
     if approved:
         update_data["status"] = "responded"  # Move to next stage
     
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    await update_inspection_with_rollup(
+        inspection,
         {"$set": update_data}
     )
     
-    # TODO: Create notification for the team
+    # Notify the team
+    await enqueue_notification(
+        inspection,
+        "review",
+        f"Report {'approved' if approved else 'rejected'}",
+        f"Your report for \"{inspection['task_name']}\" was {'approved' if approved else 'rejected'} by the headmaster",
+        ["team"],
+        actor_id=current_user["_id"]
+    )
     
     return {
         "message": f"Report {'approved' if approved else 'rejected'} successfully",
@@ -600,15 +670,15 @@ async def approve_inspection_report(
 async def get_all_inspections(
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     school_id: Optional[str] = None,
     office_id: Optional[str] = None,
     priority: Optional[str] = None,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all inspections with filtering (admin only)"""
-    db = get_database()
-    
     # Build query
     query = {}
     if status:
@@ -624,23 +694,23 @@ async def get_all_inspections(
     total = await db.inspections.count_documents(query)
     
     # Get inspections
-    inspections = await db.inspections.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    inspections, next_cursor = await find_page(
+        db.inspections, query, "created_at", DESCENDING, limit, cursor=cursor, skip=skip, projection=SEARCH_PROJECTION
+    )
     
     # Enrich with related data
-    for inspection in inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        school = await db.schools.find_one({"_id": inspection["school_id"]})
-        team = await db.teams.find_one({"_id": inspection["team_id"]})
-        
-        inspection["office"] = office
-        inspection["school"] = school
-        inspection["team"] = team
+    loader = RelationLoader(db)
+    await loader.attach(inspections, "office", "offices", "office_id")
+    await loader.attach(inspections, "school", "schools", "school_id")
+    await loader.attach(inspections, "team", "teams", "team_id")
+    sign_report_photos(inspections)
     
     return {
         "inspections": inspections,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
@@ -648,11 +718,10 @@ async def get_all_inspections(
 async def create_inspection(
     inspection_data: InspectionCreate,
     auto_assign: bool = False,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create a new inspection (admin only)"""
-    db = get_database()
-    
     # Verify school exists
     school = await db.schools.find_one({"_id": inspection_data.school_id})
     if not school:
@@ -703,23 +772,47 @@ async def create_inspection(
         "created_by": current_user["_id"],
         "created_at": datetime.utcnow()
     }
+    inspection.update(compute_derived_fields(inspection))
+    inspection.update(await inspection_search_fields(inspection))
     
     await db.inspections.insert_one(inspection)
-    
-    # TODO: Create notification for assigned team
+    await apply_transition(None, inspection)
+    
+    # Notify the assigned team
+    await enqueue_notification(
+        inspection,
+        "new_assignment",
+        "New inspection assigned",
+        f"Your team has been assigned \"{inspection['task_name']}\"",
+        ["team"],
+        actor_id=current_user["_id"]
+    )
     
     return {"message": "Inspection created successfully", "inspection_id": inspection_id, "team_id": team_id}
 
 
+@router.post("/campaign")
+async def create_inspection_campaign(
+    campaign: InspectionCampaign,
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Create inspections for many (office, school) pairs at once, balancing teams across the batch"""
+    try:
+        result = await create_campaign(campaign, current_user["_id"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"message": f"Campaign created with {result['created_count']} inspections", **result}
+
+
 @router.put("/{inspection_id}")
 async def update_inspection(
     inspection_id: str,
     inspection_data: InspectionCreate,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update inspection details (admin only)"""
-    db = get_database()
-    
     # Check if inspection exists
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -738,8 +831,14 @@ async def update_inspection(
             raise HTTPException(status_code=400, detail="Team does not belong to selected school")
     
     # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    search_fields = await inspection_search_fields({
+        "_id": inspection_id,
+        "task_name": inspection_data.task_name,
+        "office_id": inspection_data.office_id,
+        "school_id": inspection_data.school_id
+    })
+    await update_inspection_with_rollup(
+        inspection,
         {
             "$set": {
                 "task_name": inspection_data.task_name,
@@ -749,7 +848,8 @@ async def update_inspection(
                 "team_id": inspection_data.team_id,
                 "due_date": inspection_data.due_date,
                 "priority": inspection_data.priority,
-                "template_id": inspection_data.template_id
+                "template_id": inspection_data.template_id,
+                **search_fields
             }
         }
     )
@@ -762,11 +862,10 @@ async def reassign_inspection(
     inspection_id: str,
     team_id: str,
     reason: Optional[str] = None,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reassign inspection to a different team"""
-    db = get_database()
-    
     # Check if inspection exists
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -786,18 +885,27 @@ async def reassign_inspection(
         raise HTTPException(status_code=400, detail="Team must belong to the same school")
     
     # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    inspection = await update_inspection_with_rollup(
+        inspection,
         {
             "$set": {
                 "team_id": team_id,
                 "status": "assigned",  # Reset to assigned
-                "report": None  # Clear any existing report
+                "report": None,  # Clear any existing report
+                **compute_derived_fields({"report": None})
             }
         }
     )
     
-    # TODO: Create notification for new team
+    # Notify the new team
+    await enqueue_notification(
+        inspection,
+        "new_assignment",
+        "Inspection reassigned to your team",
+        f"Your team has been assigned \"{inspection['task_name']}\"",
+        ["team"],
+        actor_id=current_user["_id"]
+    )
     
     return {"message": f"Inspection reassigned to team {team['name']} successfully"}
 
@@ -807,11 +915,10 @@ async def override_inspection_status(
     inspection_id: str,
     status: str,
     reason: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Override inspection status (admin only)"""
-    db = get_database()
-    
     # Check if inspection exists
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -823,8 +930,8 @@ async def override_inspection_status(
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
     # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    await update_inspection_with_rollup(
+        inspection,
         {
             "$set": {
                 "status": status,
@@ -844,17 +951,13 @@ async def override_inspection_status(
 @router.delete("/{inspection_id}")
 async def delete_inspection(
     inspection_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete an inspection (admin only)"""
-    db = get_database()
-    
-    # Check if inspection exists
-    inspection = await db.inspections.find_one({"_id": inspection_id})
-    if not inspection:
+    # Delete inspection (only the request that actually deleted it removes the rollup contribution)
+    deleted = await delete_inspection_with_rollup(inspection_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Inspection not found")
     
-    # Delete inspection
-    await db.inspections.delete_one({"_id": inspection_id})
-    
     return {"message": "Inspection deleted successfully"}
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from middleware.auth import require_role, user_cache
+from utils.auth import hash_pool_stats
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/cache")
+async def get_cache_metrics(current_user: dict = Depends(require_role(["admin"]))):
+    """Get hit/miss counters of the in-process caches"""
+    return {
+        "user_cache": user_cache.stats()
+    }
+
+@router.get("/password-hashing")
+async def get_password_hashing_metrics(current_user: dict = Depends(require_role(["admin"]))):
+    """Get queue depth and timings of the password hashing pool"""
+    return hash_pool_stats.snapshot()
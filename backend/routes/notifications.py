@@ -1,43 +1,132 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from models.notification import Notification, NotificationCreate
-from middleware.auth import get_current_user
+from middleware.auth import get_current_user, get_stream_user
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
+from utils.pagination import encode_cursor, find_page, keyset_filter, keyset_sort
+from services.notification_hub import hub
+from services.notification_retention import ARCHIVE_COLLECTION
+from services import notification_service
+from services.notification_service import adjust_unread_counts, publish_unread_counts
 from datetime import datetime
+from typing import Optional
+from pymongo import ASCENDING, DESCENDING
+import asyncio
+import json
 import uuid
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_RETRY_MS = 5000
+STREAM_REPLAY_LIMIT = 100
+
+
+def _sse(event: str, data: dict) -> str:
+    """One SSE message; notifications carry their (created_at, _id) position as the event id"""
+    lines = [f"event: {event}"]
+    if event == "notification":
+        lines.append(f"id: {encode_cursor(data['created_at'], data['_id'])}")
+    lines.append(f"data: {json.dumps(jsonable_encoder(data))}")
+    return "\n".join(lines) + "\n\n"
+
+
 @router.get("")
-async def get_user_notifications(current_user: dict = Depends(get_current_user)):
+async def get_user_notifications(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get all notifications for the current user"""
-    db = get_database()
-    
     notifications = await db.notifications.find(
         {"user_id": current_user["_id"]}
     ).sort("created_at", -1).to_list(100)
     
     return notifications
 
+@router.get("/history")
+async def get_notification_history(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get archived (read) notifications, newest first; admins may pass another user's id"""
+    if user_id and user_id != current_user["_id"] and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    notifications, next_cursor = await find_page(
+        db[ARCHIVE_COLLECTION],
+        {"user_id": user_id or current_user["_id"]},
+        "created_at",
+        DESCENDING,
+        limit,
+        cursor
+    )
+    
+    return {"notifications": notifications, "next_cursor": next_cursor}
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(get_stream_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Server-Sent Events stream of new notifications and unread-count changes"""
+    user_id = current_user["_id"]
+    
+    # Missed notifications are replayed from the Last-Event-ID position (validated before streaming)
+    replay_query = None
+    if last_event_id:
+        replay_query = {"$and": [{"user_id": user_id}, keyset_filter("created_at", ASCENDING, last_event_id)]}
+    
+    # Subscribe before reading the backlog, so nothing published in between is lost
+    queue = hub.subscribe(user_id)
+    
+    async def events():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            
+            if replay_query:
+                missed = await db.notifications.find(replay_query).sort(
+                    keyset_sort("created_at", ASCENDING)
+                ).to_list(STREAM_REPLAY_LIMIT)
+                for notification in missed:
+                    yield _sse("notification", notification)
+            
+            yield _sse("unread_count", {"unread_count": await notification_service.get_unread_count(user_id)})
+            
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                yield _sse(event, data)
+        finally:
+            hub.unsubscribe(user_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/unread-count")
-async def get_unread_count(current_user: dict = Depends(get_current_user)):
+async def get_unread_count(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get count of unread notifications"""
-    db = get_database()
-    
-    count = await db.notifications.count_documents({
-        "user_id": current_user["_id"],
-        "is_read": False
-    })
+    count = await notification_service.get_unread_count(current_user["_id"])
     
     return {"unread_count": count}
 
 @router.post("/{notification_id}/read")
 async def mark_as_read(
     notification_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Mark a notification as read"""
-    db = get_database()
-    
     # Get notification
     notification = await db.notifications.find_one({"_id": notification_id})
     if not notification:
@@ -47,23 +136,27 @@ async def mark_as_read(
     if notification["user_id"] != current_user["_id"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Mark as read
-    await db.notifications.update_one(
-        {"_id": notification_id},
-        {"$set": {"is_read": True}}
+    # Mark as read (only the request that flips it adjusts the counter)
+    result = await db.notifications.update_one(
+        {"_id": notification_id, "is_read": False},
+        {"$set": {"is_read": True, "read_at": datetime.utcnow()}}
     )
+    if result.modified_count:
+        await adjust_unread_counts({current_user["_id"]: -1})
+        await publish_unread_counts([current_user["_id"]])
     
     return {"message": "Notification marked as read"}
 
 @router.post("/mark-all-read")
-async def mark_all_as_read(current_user: dict = Depends(get_current_user)):
+async def mark_all_as_read(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Mark all notifications as read"""
-    db = get_database()
-    
     result = await db.notifications.update_many(
         {"user_id": current_user["_id"], "is_read": False},
-        {"$set": {"is_read": True}}
+        {"$set": {"is_read": True, "read_at": datetime.utcnow()}}
     )
+    # Decrement by what was actually marked, so notifications arriving meanwhile still count
+    await adjust_unread_counts({current_user["_id"]: -result.modified_count})
+    await publish_unread_counts([current_user["_id"]])
     
     return {
         "message": f"Marked {result.modified_count} notifications as read",
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from models.office import OfficeCreate, Office
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
+from utils.pagination import find_page
 from middleware.auth import get_current_user
+from services.rollup_service import update_office_rollups
+from services.search_service import entity_search_fields, refresh_inspection_search_terms, search_filter
 from datetime import datetime
+from typing import Optional
+from pymongo import DESCENDING
 import uuid
 import math
 
@@ -12,27 +18,24 @@ router = APIRouter(prefix="/offices", tags=["offices"])
 async def get_offices(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     search: str = Query(None),
     office_type: str = Query(None),
     district: str = Query(None),
     is_active: bool = Query(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all offices with pagination, search, and filters"""
     # Only admin and responder can access this endpoint
     if current_user["role"] not in ["admin", "responder"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Build query
     query = {}
     if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"contact_person": {"$regex": search, "$options": "i"}},
-            {"district": {"$regex": search, "$options": "i"}}
-        ]
+        # Word-prefix search on name, contact person and district
+        query.update(search_filter(search) or {})
     if office_type:
         query["type"] = office_type
     if district:
@@ -48,7 +51,7 @@ async def get_offices(
     total_pages = math.ceil(total / limit)
     
     # Get offices
-    offices = await db.offices.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    offices, next_cursor = await find_page(db.offices, query, "created_at", DESCENDING, limit, cursor=cursor, skip=skip)
     
     return {
         "offices": [
@@ -71,20 +74,21 @@ async def get_offices(
             "page": page,
             "limit": limit,
             "total": total,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_cursor": next_cursor
         }
     }
 
 @router.get("/{office_id}")
 async def get_office(
     office_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get a single office by ID"""
     if current_user["role"] not in ["admin", "responder", "office"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
     office = await db.offices.find_one({"_id": office_id})
     
     if not office:
@@ -125,14 +129,13 @@ async def get_office(
 @router.post("")
 async def create_office(
     office_data: OfficeCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create a new office"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Validate office type
     valid_types = ["mro", "municipality", "hospital", "police", "other"]
     if office_data.type not in valid_types:
@@ -147,6 +150,7 @@ async def create_office(
     office_dict["is_active"] = True
     office_dict["created_by"] = current_user["_id"]
     office_dict["created_at"] = datetime.utcnow()
+    office_dict.update(entity_search_fields("offices", office_dict))
     
     # Insert office
     await db.offices.insert_one(office_dict)
@@ -167,14 +171,13 @@ async def create_office(
 async def update_office(
     office_id: str,
     office_data: OfficeCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update an office"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Check if office exists
     existing = await db.offices.find_one({"_id": office_id})
     if not existing:
@@ -191,6 +194,7 @@ async def update_office(
     # Update office
     update_data = office_data.dict()
     update_data["updated_at"] = datetime.utcnow()
+    update_data.update(entity_search_fields("offices", update_data))
     
     result = await db.offices.update_one(
         {"_id": office_id},
@@ -200,19 +204,26 @@ async def update_office(
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update office")
     
+    # Rollups copy the office's district and type
+    if update_data["district"] != existing.get("district") or update_data["type"] != existing.get("type"):
+        await update_office_rollups(office_id, update_data)
+    
+    # Inspections are also found by their office's name
+    if update_data["name"] != existing.get("name"):
+        await refresh_inspection_search_terms({"office_id": office_id})
+    
     return {"message": "Office updated successfully"}
 
 @router.delete("/{office_id}")
 async def delete_office(
     office_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Soft delete an office (deactivate)"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Check if office exists
     existing = await db.offices.find_one({"_id": office_id})
     if not existing:
@@ -229,14 +240,13 @@ async def delete_office(
 @router.post("/{office_id}/activate")
 async def activate_office(
     office_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reactivate an office"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Check if office exists
     existing = await db.offices.find_one({"_id": office_id})
     if not existing:
@@ -1,11 +1,26 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from middleware.auth import get_current_user, require_role
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.cache import dashboard_cache
 from utils.database import get_database
+from utils.loader import RelationLoader
+from utils.pagination import keyset_filter, keyset_sort, next_page
+from services.rollup_service import (
+    RESPONSE_TIME_BUCKETS, get_daily_series, get_rollup_totals, update_inspection_with_rollup
+)
+from services.notification_outbox import enqueue_notification
+from services.search_service import SEARCH_PROJECTION, relevance_expr, search_filter
+from services.photo_store import sign_report_photos
+from services.export_service import (
+    EXPORT_BATCH_SIZE, EXPORT_COLUMNS, EXPORT_MEDIA_TYPES, export_projection, gzip_stream, stream_export
+)
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from pydantic import BaseModel
 from models.escalation import Escalation, FollowUpRequest, ResolveRequest, ReEscalateRequest, FollowUp
 import uuid
+import asyncio
 
 router = APIRouter(prefix="/responder", tags=["responder"])
 
@@ -21,12 +36,17 @@ class GovtReviewRequest(BaseModel):
 # ============ DASHBOARD & STATISTICS ============
 
 @router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: dict = Depends(require_role(["responder", "admin"]))):
-    """Get system-wide statistics for responder dashboard"""
-    db = get_database()
-    
-    # Get all inspections
-    all_inspections = await db.inspections.find({}).to_list(10000)
+async def get_dashboard_stats(current_user: dict = Depends(require_role(["responder", "admin"])), db: AsyncIOMotorDatabase = Depends(get_database)):
+    """Get system-wide statistics for responder dashboard (cached until inspections change)"""
+    return await dashboard_cache.get("responder_dashboard_stats", lambda: _compute_dashboard_stats(db))
+
+
+async def _compute_dashboard_stats(db: AsyncIOMotorDatabase) -> Dict:
+    # Get all inspections (only the fields the stats read)
+    all_inspections = await db.inspections.find(
+        {},
+        {"status": 1, "report.submitted_at": 1, "office_response.responded_at": 1}
+    ).to_list(10000)
     
     total_inspections = len(all_inspections)
     active_inspections = len([i for i in all_inspections if i["status"] in ["assigned", "submitted", "responded"]])
@@ -73,109 +93,82 @@ async def get_dashboard_stats(current_user: dict = Depends(require_role(["respon
 
 
 @router.get("/inspections/priority")
-async def get_priority_items(current_user: dict = Depends(require_role(["responder", "admin"]))):
-    """Get priority items: overdue responses, critical issues, repeated violations"""
-    db = get_database()
+async def get_priority_items(current_user: dict = Depends(require_role(["responder", "admin"])), db: AsyncIOMotorDatabase = Depends(get_database)):
+    """Get priority items: overdue responses, critical issues, repeated violations (cached until inspections change)"""
+    return await dashboard_cache.get("responder_priority_items", lambda: _compute_priority_items(db))
+
+
+async def _compute_priority_items(db: AsyncIOMotorDatabase) -> Dict:
+    from services.compliance_service import violation_stages
     
-    # Get all inspections
-    all_inspections = await db.inspections.find({}).to_list(10000)
+    loader = RelationLoader(db)
+    now = datetime.utcnow()
     
     # Overdue responses (submitted more than 7 days ago without office response)
-    overdue_responses = []
-    for inspection in all_inspections:
-        if inspection["status"] == "submitted" and inspection.get("report"):
-            submitted_at = inspection["report"].get("submitted_at")
-            if submitted_at:
-                days_since_submission = (datetime.utcnow() - submitted_at).days
-                if days_since_submission > 7:
-                    # Enrich with office and school data
-                    office = await db.offices.find_one({"_id": inspection["office_id"]})
-                    school = await db.schools.find_one({"_id": inspection["school_id"]})
-                    inspection["office"] = office
-                    inspection["school"] = school
-                    inspection["days_overdue"] = days_since_submission - 7
-                    overdue_responses.append(inspection)
-    
-    # Sort by days overdue
-    overdue_responses.sort(key=lambda x: x["days_overdue"], reverse=True)
-    
-    # Critical issues (low ratings and high priority)
-    critical_issues = []
-    for inspection in all_inspections:
-        if inspection.get("report") and inspection["priority"] == "high":
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                if avg_rating <= 2.5:  # Low rating threshold
-                    office = await db.offices.find_one({"_id": inspection["office_id"]})
-                    school = await db.schools.find_one({"_id": inspection["school_id"]})
-                    inspection["office"] = office
-                    inspection["school"] = school
-                    inspection["avg_rating"] = round(avg_rating, 1)
-                    critical_issues.append(inspection)
-    
-    # Sort by rating (lowest first)
-    critical_issues.sort(key=lambda x: x["avg_rating"])
-    
-    # Repeated violations (offices with multiple low-rated inspections)
-    office_violations = {}
-    for inspection in all_inspections:
-        if inspection.get("report"):
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                if avg_rating < 3:  # Below average rating
-                    office_id = inspection["office_id"]
-                    if office_id not in office_violations:
-                        office_violations[office_id] = {
-                            "office_id": office_id,
-                            "violation_count": 0,
-                            "avg_ratings": [],
-                            "inspections": []
-                        }
-                    office_violations[office_id]["violation_count"] += 1
-                    office_violations[office_id]["avg_ratings"].append(avg_rating)
-                    office_violations[office_id]["inspections"].append(inspection["_id"])
-    
-    # Filter offices with more than 2 violations
-    repeated_violations = []
-    for office_id, data in office_violations.items():
-        if data["violation_count"] >= 2:
-            office = await db.offices.find_one({"_id": office_id})
-            if office:
-                repeated_violations.append({
-                    "office": office,
-                    "violation_count": data["violation_count"],
-                    "avg_rating": round(sum(data["avg_ratings"]) / len(data["avg_ratings"]), 1),
-                    "inspection_ids": data["inspections"]
-                })
-    
-    # Sort by violation count
-    repeated_violations.sort(key=lambda x: x["violation_count"], reverse=True)
+    overdue_responses = await db.inspections.find({
+        "status": "submitted",
+        "report.submitted_at": {"$lte": now - timedelta(days=8)}
+    }, SEARCH_PROJECTION).sort("report.submitted_at", 1).limit(10).to_list(10)
+    
+    for inspection in overdue_responses:
+        days_since_submission = (now - inspection["report"]["submitted_at"]).days
+        inspection["days_overdue"] = days_since_submission - 7
+    
+    # Critical issues (low ratings and high priority), lowest rating first
+    critical_issues = await db.inspections.find({
+        "priority": "high",
+        "avg_rating": {"$ne": None, "$lte": 2.5}  # Low rating threshold
+    }, SEARCH_PROJECTION).sort("avg_rating", 1).limit(10).to_list(10)
+    
+    for inspection in critical_issues:
+        inspection["avg_rating"] = round(inspection["avg_rating"], 1)
+    
+    # Enrich only the returned rows with office and school data
+    await loader.attach(overdue_responses + critical_issues, "office", "offices", "office_id")
+    await loader.attach(overdue_responses + critical_issues, "school", "schools", "school_id")
+    sign_report_photos(overdue_responses + critical_issues)
+    
+    # Repeated violations (offices with multiple below-average inspections), top 10
+    repeated_violations = await db.inspections.aggregate(violation_stages() + [
+        {"$limit": 10},
+        {
+            "$project": {
+                "_id": 0,
+                "office": 1,
+                "violation_count": 1,
+                "avg_rating": {"$round": ["$avg_violation_rating", 1]},
+                "inspection_ids": 1
+            }
+        }
+    ]).to_list(10)
     
     return {
-        "overdue_responses": overdue_responses[:10],  # Top 10
-        "critical_issues": critical_issues[:10],  # Top 10
-        "repeated_violations": repeated_violations[:10]  # Top 10
+        "overdue_responses": overdue_responses,
+        "critical_issues": critical_issues,
+        "repeated_violations": repeated_violations
     }
 
 
 @router.get("/inspections/recent-activity")
 async def get_recent_activity(
     limit: int = 20,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get recent activity feed"""
-    db = get_database()
-    
     # Get recent inspections sorted by updated time
     recent_inspections = await db.inspections.find({}).sort("created_at", -1).limit(limit).to_list(limit)
     
+    # Batch-load referenced offices and schools
+    loader = RelationLoader(db)
+    offices = await loader.load_many("offices", (i["office_id"] for i in recent_inspections))
+    schools = await loader.load_many("schools", (i["school_id"] for i in recent_inspections))
+    
     activity_feed = []
     
     for inspection in recent_inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        school = await db.schools.find_one({"_id": inspection["school_id"]})
+        office = offices.get(inspection["office_id"])
+        school = schools.get(inspection["school_id"])
         
         # Determine activity type and timestamp
         if inspection.get("govt_review"):
@@ -230,8 +223,9 @@ async def get_recent_activity(
 
 @router.get("/inspections")
 async def get_all_inspections(
-    skip: int = 0,
-    limit: int = 50,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     school_id: Optional[str] = None,
     office_id: Optional[str] = None,
@@ -242,12 +236,11 @@ async def get_all_inspections(
     rating_min: Optional[float] = None,
     rating_max: Optional[float] = None,
     search: Optional[str] = None,
-    sort_by: Optional[str] = "date_desc",  # date_asc, date_desc, priority, rating_asc, rating_desc, response_time
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    sort_by: Optional[str] = None,  # relevance (default with search), date_desc (default otherwise), date_asc, priority, rating_asc, rating_desc, response_time
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all inspections with advanced filtering and sorting"""
-    db = get_database()
-    
     # Build query
     query = {}
     
@@ -267,149 +260,219 @@ async def get_all_inspections(
         else:
             query["assigned_date"] = {"$lte": datetime.fromisoformat(date_to)}
     
-    # Get all matching inspections
-    inspections = await db.inspections.find(query).to_list(10000)
+    # Filter, sort and paginate in the database; count and page run concurrently
+    count_pipeline, page_pipeline, sort_field = _build_inspection_list_pipelines(
+        query,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        district=district,
+        rating_min=rating_min,
+        rating_max=rating_max,
+        search=search,
+        sort_by=sort_by
+    )
+    counted, rows = await asyncio.gather(
+        db.inspections.aggregate(count_pipeline).to_list(1),
+        db.inspections.aggregate(page_pipeline).to_list(limit + 1)
+    )
     
-    # Enrich with related data and calculate additional fields
-    enriched_inspections = []
+    total = counted[0]["count"] if counted else 0
+    inspections, next_cursor = next_page(rows, limit, sort_field)
     for inspection in inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        school = await db.schools.find_one({"_id": inspection["school_id"]})
-        team = await db.teams.find_one({"_id": inspection["team_id"]})
-        
-        inspection["office"] = office
-        inspection["school"] = school
-        inspection["team"] = team
-        
-        # Calculate average rating
-        if inspection.get("report"):
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                inspection["avg_rating"] = round(avg_rating, 1)
-            else:
-                inspection["avg_rating"] = None
-        else:
-            inspection["avg_rating"] = None
-        
-        # Calculate response time in days
-        if inspection.get("report") and inspection.get("office_response"):
-            submitted_at = inspection["report"].get("submitted_at")
-            responded_at = inspection["office_response"].get("responded_at")
-            if submitted_at and responded_at:
-                time_diff = (responded_at - submitted_at).days
-                inspection["response_time_days"] = time_diff
-            else:
-                inspection["response_time_days"] = None
-        else:
-            inspection["response_time_days"] = None
-        
-        # Apply district filter
-        if district and office:
-            if office.get("district") != district:
-                continue
-        
-        # Apply rating filter
-        if rating_min is not None and inspection["avg_rating"] is not None:
-            if inspection["avg_rating"] < rating_min:
-                continue
-        if rating_max is not None and inspection["avg_rating"] is not None:
-            if inspection["avg_rating"] > rating_max:
-                continue
-        
-        # Apply search filter
-        if search:
-            search_lower = search.lower()
-            if not any([
-                search_lower in inspection["_id"].lower(),
-                search_lower in (office["name"].lower() if office else ""),
-                search_lower in (school["name"].lower() if school else ""),
-                search_lower in inspection["task_name"].lower()
-            ]):
-                continue
-        
-        enriched_inspections.append(inspection)
-    
-    # Sort inspections
-    if sort_by == "date_asc":
-        enriched_inspections.sort(key=lambda x: x["assigned_date"])
-    elif sort_by == "date_desc":
-        enriched_inspections.sort(key=lambda x: x["assigned_date"], reverse=True)
-    elif sort_by == "priority":
-        priority_order = {"high": 0, "medium": 1, "low": 2}
-        enriched_inspections.sort(key=lambda x: priority_order.get(x["priority"], 3))
-    elif sort_by == "rating_asc":
-        enriched_inspections.sort(key=lambda x: x["avg_rating"] if x["avg_rating"] is not None else 999)
-    elif sort_by == "rating_desc":
-        enriched_inspections.sort(key=lambda x: x["avg_rating"] if x["avg_rating"] is not None else -1, reverse=True)
-    elif sort_by == "response_time":
-        enriched_inspections.sort(key=lambda x: x["response_time_days"] if x["response_time_days"] is not None else 999)
-    
-    # Pagination
-    total = len(enriched_inspections)
-    paginated_inspections = enriched_inspections[skip:skip + limit]
+        inspection.pop("_sort_key", None)
+    sign_report_photos(inspections)
     
     return {
-        "inspections": paginated_inspections,
+        "inspections": inspections,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
+def _lookup_one(collection: str, local_field: str, as_field: str) -> List[Dict]:
+    """Stages that join a single referenced document (or None) onto each row"""
+    return [
+        {
+            "$lookup": {
+                "from": collection,
+                "localField": local_field,
+                "foreignField": "_id",
+                "as": as_field
+            }
+        },
+        {"$addFields": {as_field: {"$ifNull": [{"$arrayElemAt": [f"${as_field}", 0]}, None]}}}
+    ]
+
+
+# Sort key expression and direction for each supported sort_by value
+INSPECTION_SORTS = {
+    "date_asc": ("$assigned_date", 1),
+    "date_desc": ("$assigned_date", -1),
+    "priority": ({"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$priority", "high"]}, "then": 0},
+            {"case": {"$eq": ["$priority", "medium"]}, "then": 1},
+            {"case": {"$eq": ["$priority", "low"]}, "then": 2}
+        ],
+        "default": 3
+    }}, 1),
+    "rating_asc": ({"$ifNull": ["$avg_rating", 999]}, 1),
+    "rating_desc": ({"$ifNull": ["$avg_rating", -1]}, -1),
+    "response_time": ({"$ifNull": ["$response_time_days", 999]}, 1)
+}
+
+
+def _keyset_page_stages(sort_expr, direction: int, skip: int, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict], str]:
+    """
+    Sort and page stages for a (sort key, _id) ordering, plus the field the cursor is built from.
+
+    Plain field keys are sorted on directly so an index can serve the sort and the cursor seek;
+    computed keys are materialized as `_sort_key` first.
+    """
+    stages = []
+    if isinstance(sort_expr, str):
+        sort_field = sort_expr[1:]
+    else:
+        sort_field = "_sort_key"
+        stages.append({"$addFields": {"_sort_key": sort_expr}})
+    
+    if cursor:
+        stages.append({"$match": keyset_filter(sort_field, direction, cursor)})
+        skip = 0
+    
+    stages.append({"$sort": dict(keyset_sort(sort_field, direction))})
+    if skip:
+        stages.append({"$skip": skip})
+    stages.append({"$limit": limit + 1})
+    
+    return stages, sort_field
+
+
+def _build_inspection_list_pipelines(
+    query: Dict,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    district: Optional[str] = None,
+    rating_min: Optional[float] = None,
+    rating_max: Optional[float] = None,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None
+) -> Tuple[List[Dict], List[Dict], str]:
+    """Build the responder inspection count and page pipelines, and the field page cursors use"""
+    match = dict(query)
+    
+    # Rating filters use the stored average (unrated rows are kept)
+    rating_bounds = {}
+    if rating_min is not None:
+        rating_bounds["$gte"] = rating_min
+    if rating_max is not None:
+        rating_bounds["$lte"] = rating_max
+    if rating_bounds:
+        match["$or"] = [{"avg_rating": None}, {"avg_rating": rating_bounds}]
+    
+    # Word-prefix search on id, task, office and school name, served by the search_terms index
+    terms = search_filter(search)
+    if terms:
+        match.update(terms)
+    
+    pipeline = [{"$match": match}]
+    
+    # Offices and schools are only needed before pagination when filters reference them
+    joined_early = bool(district)
+    if joined_early:
+        pipeline += _lookup_one("offices", "office_id", "office")
+        pipeline += _lookup_one("schools", "school_id", "school")
+    
+    filters = []
+    
+    # District filter (rows without an office are kept)
+    if district:
+        filters.append({"$or": [{"office": None}, {"office.district": district}]})
+    
+    if filters:
+        pipeline.append({"$match": {"$and": filters}})
+    
+    count_pipeline = pipeline + [{"$count": "count"}]
+    
+    # Sort by the requested key (best match first when searching, else newest first), with _id as a stable tie-breaker
+    if terms and sort_by in (None, "relevance"):
+        sort_expr, direction = relevance_expr(search), -1
+    else:
+        sort_expr, direction = INSPECTION_SORTS.get(sort_by, INSPECTION_SORTS["date_desc"])
+    page_stages, sort_field = _keyset_page_stages(sort_expr, direction, skip, limit, cursor)
+    
+    # Enrich only the returned page
+    if not joined_early:
+        page_stages += _lookup_one("offices", "office_id", "office")
+        page_stages += _lookup_one("schools", "school_id", "school")
+    page_stages += _lookup_one("teams", "team_id", "team")
+    page_stages.append({"$addFields": {"avg_rating": {"$round": ["$avg_rating", 1]}}})
+    page_stages.append({"$unset": list(SEARCH_PROJECTION)})
+    
+    return count_pipeline, pipeline + page_stages, sort_field
+
+
 @router.get("/inspections/{inspection_id}/full")
 async def get_inspection_full_detail(
     inspection_id: str,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get complete inspection details with all related data"""
-    db = get_database()
-    
-    inspection = await db.inspections.find_one({"_id": inspection_id})
+    inspection = await db.inspections.find_one({"_id": inspection_id}, SEARCH_PROJECTION)
     if not inspection:
         raise HTTPException(status_code=404, detail="Inspection not found")
     
     # Enrich with all related data
-    office = await db.offices.find_one({"_id": inspection["office_id"]})
-    school = await db.schools.find_one({"_id": inspection["school_id"]})
-    team = await db.teams.find_one({"_id": inspection["team_id"]})
-    template = await db.templates.find_one({"_id": inspection["template_id"]})
+    loader = RelationLoader(db)
+    office = await loader.load("offices", inspection["office_id"])
+    school = await loader.load("schools", inspection["school_id"])
+    team = await loader.load("teams", inspection["team_id"])
+    template = await loader.load("templates", inspection["template_id"])
+    
+    # Load every referenced user (members, headmaster, office responder, reviewer) in one query
+    user_ids = list(team.get("student_ids", [])) if team else []
+    if school:
+        user_ids.append(school.get("headmaster_id"))
+    if inspection.get("office_response"):
+        user_ids.append(inspection["office_response"].get("responded_by"))
+    if inspection.get("govt_review"):
+        user_ids.append(inspection["govt_review"].get("reviewed_by"))
+    users = await loader.load_many("users", user_ids)
     
     # Get team members
     if team:
-        team_members = await db.users.find({"_id": {"$in": team.get("student_ids", [])}}).to_list(100)
-        team["members"] = team_members
+        team["members"] = [users[student_id] for student_id in team.get("student_ids", []) if users.get(student_id)]
     
     # Get headmaster info
     if school:
-        headmaster = await db.users.find_one({"_id": school.get("headmaster_id")})
-        school["headmaster"] = headmaster
+        school["headmaster"] = users.get(school.get("headmaster_id"))
     
     # Get office user who responded
     if inspection.get("office_response"):
         responder_id = inspection["office_response"].get("responded_by")
         if responder_id:
-            office_user = await db.users.find_one({"_id": responder_id})
-            inspection["office_response"]["responder"] = office_user
+            inspection["office_response"]["responder"] = users.get(responder_id)
     
     # Get govt reviewer
     if inspection.get("govt_review"):
         reviewer_id = inspection["govt_review"].get("reviewed_by")
         if reviewer_id:
-            govt_user = await db.users.find_one({"_id": reviewer_id})
-            inspection["govt_review"]["reviewer"] = govt_user
+            inspection["govt_review"]["reviewer"] = users.get(reviewer_id)
     
     inspection["office"] = office
     inspection["school"] = school
     inspection["team"] = team
     inspection["template"] = template
     
-    # Calculate average rating
-    if inspection.get("report"):
-        report = inspection["report"]
-        if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-            avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-            inspection["avg_rating"] = round(avg_rating, 1)
+    # Round the stored average rating for display
+    if inspection.get("avg_rating") is not None:
+        inspection["avg_rating"] = round(inspection["avg_rating"], 1)
+    sign_report_photos([inspection])
     
     return inspection
 
@@ -418,11 +481,10 @@ async def get_inspection_full_detail(
 async def submit_govt_review(
     inspection_id: str,
     review_data: GovtReviewRequest,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Submit government review for an inspection"""
-    db = get_database()
-    
     # Get inspection
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -462,8 +524,8 @@ async def submit_govt_review(
         new_status = "responded"  # Send back to responded status
     
     # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    await update_inspection_with_rollup(
+        inspection,
         {
             "$set": {
                 "govt_review": govt_review,
@@ -472,7 +534,16 @@ async def submit_govt_review(
         }
     )
     
-    # TODO: Create notifications for relevant parties based on notify_parties
+    # Notify the parties chosen by the reviewer (team, office, headmaster)
+    if review_data.notify_parties:
+        await enqueue_notification(
+            inspection,
+            "review",
+            f"Government review: {review_data.review_status.replace('_', ' ')}",
+            f"Inspection \"{inspection['task_name']}\" was reviewed: {review_data.review_comments}",
+            review_data.notify_parties,
+            actor_id=current_user["_id"]
+        )
     
     return {
         "message": "Government review submitted successfully",
@@ -486,11 +557,10 @@ async def update_inspection_status(
     inspection_id: str,
     status: str,
     reason: Optional[str] = None,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update inspection status (responder override)"""
-    db = get_database()
-    
     # Get inspection
     inspection = await db.inspections.find_one({"_id": inspection_id})
     if not inspection:
@@ -502,8 +572,8 @@ async def update_inspection_status(
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
     # Update inspection
-    await db.inspections.update_one(
-        {"_id": inspection_id},
+    await update_inspection_with_rollup(
+        inspection,
         {
             "$set": {
                 "status": status,
@@ -525,58 +595,29 @@ async def update_inspection_status(
 @router.get("/analytics/system")
 async def get_system_analytics(
     days: int = 30,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get system-wide analytics"""
-    db = get_database()
-    
-    # Get all inspections
-    all_inspections = await db.inspections.find({}).to_list(10000)
-    
+    """Get system-wide analytics (read from the daily rollups)"""
     # Calculate date range
-    start_date = datetime.utcnow() - timedelta(days=days)
+    start_date = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
     
-    # Inspections over time
-    inspections_by_date = {}
-    for inspection in all_inspections:
-        if inspection["assigned_date"] >= start_date:
-            date_key = inspection["assigned_date"].strftime("%Y-%m-%d")
-            inspections_by_date[date_key] = inspections_by_date.get(date_key, 0) + 1
+    daily, totals, office_types = await asyncio.gather(
+        get_daily_series({"day": {"$gte": start_date}}),
+        get_rollup_totals({}),
+        db.offices.distinct("type")
+    )
     
-    inspections_over_time = [{"date": k, "count": v} for k, v in sorted(inspections_by_date.items())]
+    # Inspections over time
+    inspections_over_time = [{"date": d["date"], "count": d["total"]} for d in daily if d["total"]]
     
     # Status distribution
-    status_distribution = {}
-    for inspection in all_inspections:
-        status = inspection["status"]
-        status_distribution[status] = status_distribution.get(status, 0) + 1
-    
-    status_data = [{"status": k, "count": v} for k, v in status_distribution.items()]
+    status_data = [{"status": k, "count": v} for k, v in totals["status"].items() if v]
     
-    # Office type compliance (offices grouped by type)
-    offices = await db.offices.find({}).to_list(1000)
-    office_compliance = {}
-    
-    for office in offices:
-        office_type = office.get("type", "other")
-        if office_type not in office_compliance:
-            office_compliance[office_type] = {
-                "total": 0,
-                "on_time": 0
-            }
-        
-        # Get inspections for this office
-        office_inspections = [i for i in all_inspections if i["office_id"] == office["_id"]]
-        
-        for inspection in office_inspections:
-            if inspection.get("report") and inspection.get("office_response"):
-                office_compliance[office_type]["total"] += 1
-                submitted_at = inspection["report"].get("submitted_at")
-                responded_at = inspection["office_response"].get("responded_at")
-                if submitted_at and responded_at:
-                    time_diff = (responded_at - submitted_at).days
-                    if time_diff <= 7:
-                        office_compliance[office_type]["on_time"] += 1
+    # Office type compliance (every office type, including ones without responses yet)
+    office_compliance = {office_type or "other": {"total": 0, "on_time": 0} for office_type in office_types}
+    for row in totals["by_office_type"]:
+        office_compliance[row["_id"]] = {"total": row["report_responded"], "on_time": row["on_time"]}
     
     office_compliance_data = []
     for office_type, data in office_compliance.items():
@@ -588,73 +629,23 @@ async def get_system_analytics(
         })
     
     # Rating trends over time
-    rating_trends = {}
-    for inspection in all_inspections:
-        if inspection.get("report") and inspection["assigned_date"] >= start_date:
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                date_key = inspection["assigned_date"].strftime("%Y-%m-%d")
-                if date_key not in rating_trends:
-                    rating_trends[date_key] = {"ratings": [], "count": 0}
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                rating_trends[date_key]["ratings"].append(avg_rating)
-                rating_trends[date_key]["count"] += 1
-    
-    rating_data = []
-    for date_key, data in sorted(rating_trends.items()):
-        if data["ratings"]:
-            avg = sum(data["ratings"]) / len(data["ratings"])
-            rating_data.append({
-                "date": date_key,
-                "average_rating": round(avg, 2),
-                "count": data["count"]
-            })
+    rating_data = [
+        {
+            "date": d["date"],
+            "average_rating": round(d["rating_sum"] / d["rating_count"], 2),
+            "count": d["rating_count"]
+        }
+        for d in daily if d["rating_count"]
+    ]
     
     # Response time distribution
-    response_times = []
-    for inspection in all_inspections:
-        if inspection.get("report") and inspection.get("office_response"):
-            submitted_at = inspection["report"].get("submitted_at")
-            responded_at = inspection["office_response"].get("responded_at")
-            if submitted_at and responded_at:
-                time_diff = (responded_at - submitted_at).days
-                response_times.append(time_diff)
-    
-    response_time_buckets = {
-        "0-3 days": 0,
-        "4-7 days": 0,
-        "8-14 days": 0,
-        "15+ days": 0
-    }
-    
-    for rt in response_times:
-        if rt <= 3:
-            response_time_buckets["0-3 days"] += 1
-        elif rt <= 7:
-            response_time_buckets["4-7 days"] += 1
-        elif rt <= 14:
-            response_time_buckets["8-14 days"] += 1
-        else:
-            response_time_buckets["15+ days"] += 1
-    
-    response_time_data = [{"bucket": k, "count": v} for k, v in response_time_buckets.items()]
+    response_time_data = [
+        {"bucket": label, "count": totals["response_buckets"].get(label, 0)}
+        for _, label in RESPONSE_TIME_BUCKETS
+    ]
     
     # Issue categories
-    issue_categories = {}
-    for inspection in all_inspections:
-        if inspection.get("report") and inspection["report"].get("issues"):
-            issues_text = inspection["report"]["issues"].lower()
-            
-            if any(word in issues_text for word in ["clean", "dirty", "garbage", "waste", "hygiene"]):
-                issue_categories["Cleanliness"] = issue_categories.get("Cleanliness", 0) + 1
-            if any(word in issues_text for word in ["staff", "behavior", "rude", "attitude"]):
-                issue_categories["Staff Behavior"] = issue_categories.get("Staff Behavior", 0) + 1
-            if any(word in issues_text for word in ["service", "slow", "delay", "queue", "waiting"]):
-                issue_categories["Service Quality"] = issue_categories.get("Service Quality", 0) + 1
-            if any(word in issues_text for word in ["infrastructure", "building", "facility", "equipment"]):
-                issue_categories["Infrastructure"] = issue_categories.get("Infrastructure", 0) + 1
-    
-    issue_data = [{"category": k, "count": v} for k, v in issue_categories.items()]
+    issue_data = [{"category": k, "count": v} for k, v in totals["issues"].items() if v]
     
     return {
         "inspections_over_time": inspections_over_time,
@@ -672,6 +663,7 @@ async def get_system_analytics(
 async def get_all_escalations(
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     office_id: Optional[str] = None,
     escalation_reason: Optional[str] = None,
@@ -679,11 +671,10 @@ async def get_all_escalations(
     date_to: Optional[str] = None,
     severity: Optional[str] = None,
     sort_by: Optional[str] = "date_desc",  # date_asc, date_desc, severity
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all escalations with filters"""
-    db = get_database()
-    
     # Build query
     query = {}
     
@@ -703,87 +694,100 @@ async def get_all_escalations(
         else:
             query["escalated_at"] = {"$lte": datetime.fromisoformat(date_to)}
     
-    # Get all matching escalations
-    escalations = await db.escalations.find(query).to_list(10000)
+    # Sort and page in the database; count and page run concurrently
+    sort_expr, direction = ESCALATION_SORTS.get(sort_by, ESCALATION_SORTS["date_desc"])
+    page_stages, sort_field = _keyset_page_stages(sort_expr, direction, skip, limit, cursor)
+    total, rows = await asyncio.gather(
+        db.escalations.count_documents(query),
+        db.escalations.aggregate([{"$match": query}] + page_stages).to_list(limit + 1)
+    )
+    escalations, next_cursor = next_page(rows, limit, sort_field)
+    
+    # Batch-load inspections, then the offices, schools and users they reference
+    loader = RelationLoader(db)
+    inspections = await loader.load_many("inspections", (e["inspection_id"] for e in escalations))
+    offices = await loader.load_many("offices", (i["office_id"] for i in inspections.values() if i))
+    schools = await loader.load_many("schools", (i["school_id"] for i in inspections.values() if i))
+    users = await loader.load_many("users", (e["escalated_by"] for e in escalations))
     
     # Enrich with inspection and related data
     enriched_escalations = []
     for escalation in escalations:
-        # Get inspection
-        inspection = await db.inspections.find_one({"_id": escalation["inspection_id"]})
+        inspection = inspections.get(escalation["inspection_id"])
         if inspection:
-            office = await db.offices.find_one({"_id": inspection["office_id"]})
-            school = await db.schools.find_one({"_id": inspection["school_id"]})
-            
+            escalation.pop("_sort_key", None)
             escalation["inspection"] = inspection
-            escalation["office"] = office
-            escalation["school"] = school
-            
-            # Get escalated_by user
-            escalated_by_user = await db.users.find_one({"_id": escalation["escalated_by"]})
-            escalation["escalated_by_user"] = escalated_by_user
+            escalation["office"] = offices.get(inspection["office_id"])
+            escalation["school"] = schools.get(inspection["school_id"])
+            escalation["escalated_by_user"] = users.get(escalation["escalated_by"])
             
             enriched_escalations.append(escalation)
-    
-    # Sort escalations
-    if sort_by == "date_asc":
-        enriched_escalations.sort(key=lambda x: x["escalated_at"])
-    elif sort_by == "date_desc":
-        enriched_escalations.sort(key=lambda x: x["escalated_at"], reverse=True)
-    elif sort_by == "severity":
-        severity_order = {"critical": 0, "high": 1, "medium": 2, "low": 3}
-        enriched_escalations.sort(key=lambda x: severity_order.get(x.get("severity", "medium"), 4))
-    
-    # Pagination
-    total = len(enriched_escalations)
-    paginated_escalations = enriched_escalations[skip:skip + limit]
+    sign_report_photos(e["inspection"] for e in enriched_escalations)
     
     return {
-        "escalations": paginated_escalations,
+        "escalations": enriched_escalations,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
+# Sort key expression and direction for each supported escalation sort_by value
+ESCALATION_SORTS = {
+    "date_asc": ("$escalated_at", 1),
+    "date_desc": ("$escalated_at", -1),
+    "severity": ({"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$severity", "critical"]}, "then": 0},
+            {"case": {"$eq": ["$severity", "high"]}, "then": 1},
+            {"case": {"$eq": [{"$ifNull": ["$severity", "medium"]}, "medium"]}, "then": 2},
+            {"case": {"$eq": ["$severity", "low"]}, "then": 3}
+        ],
+        "default": 4
+    }}, 1)
+}
+
+
 @router.get("/escalations/{escalation_id}")
 async def get_escalation_detail(
     escalation_id: str,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get complete escalation details"""
-    db = get_database()
-    
     escalation = await db.escalations.find_one({"_id": escalation_id})
     if not escalation:
         raise HTTPException(status_code=404, detail="Escalation not found")
     
+    loader = RelationLoader(db)
+    
     # Get inspection with full details
-    inspection = await db.inspections.find_one({"_id": escalation["inspection_id"]})
+    inspection = await loader.load("inspections", escalation["inspection_id"])
     if inspection:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        school = await db.schools.find_one({"_id": inspection["school_id"]})
-        team = await db.teams.find_one({"_id": inspection["team_id"]})
-        
         escalation["inspection"] = inspection
-        escalation["office"] = office
-        escalation["school"] = school
-        escalation["team"] = team
+        escalation["office"] = await loader.load("offices", inspection["office_id"])
+        escalation["school"] = await loader.load("schools", inspection["school_id"])
+        escalation["team"] = await loader.load("teams", inspection["team_id"])
+    
+    # Load escalated_by, resolved_by and follow-up authors in one query
+    follow_ups = escalation.get("follow_ups") or []
+    users = await loader.load_many(
+        "users",
+        [escalation["escalated_by"], escalation.get("resolved_by")] + [f["added_by"] for f in follow_ups]
+    )
     
     # Get escalated_by user
-    escalated_by_user = await db.users.find_one({"_id": escalation["escalated_by"]})
-    escalation["escalated_by_user"] = escalated_by_user
+    escalation["escalated_by_user"] = users.get(escalation["escalated_by"])
+    sign_report_photos([escalation.get("inspection")])
     
     # Get resolved_by user if resolved
     if escalation.get("resolved_by"):
-        resolved_by_user = await db.users.find_one({"_id": escalation["resolved_by"]})
-        escalation["resolved_by_user"] = resolved_by_user
+        escalation["resolved_by_user"] = users.get(escalation["resolved_by"])
     
     # Enrich follow-ups with user data
-    if escalation.get("follow_ups"):
-        for follow_up in escalation["follow_ups"]:
-            user = await db.users.find_one({"_id": follow_up["added_by"]})
-            follow_up["user"] = user
+    for follow_up in follow_ups:
+        follow_up["user"] = users.get(follow_up["added_by"])
     
     return escalation
 
@@ -792,11 +796,10 @@ async def get_escalation_detail(
 async def add_follow_up(
     escalation_id: str,
     follow_up_data: FollowUpRequest,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Add a follow-up to an escalation"""
-    db = get_database()
-    
     escalation = await db.escalations.find_one({"_id": escalation_id})
     if not escalation:
         raise HTTPException(status_code=404, detail="Escalation not found")
@@ -834,11 +837,10 @@ async def add_follow_up(
 async def resolve_escalation(
     escalation_id: str,
     resolve_data: ResolveRequest,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Mark escalation as resolved"""
-    db = get_database()
-    
     escalation = await db.escalations.find_one({"_id": escalation_id})
     if not escalation:
         raise HTTPException(status_code=404, detail="Escalation not found")
@@ -864,10 +866,9 @@ async def resolve_escalation(
     )
     
     # Update inspection status to closed
-    await db.inspections.update_one(
-        {"_id": escalation["inspection_id"]},
-        {"$set": {"status": "closed"}}
-    )
+    inspection = await db.inspections.find_one({"_id": escalation["inspection_id"]})
+    if inspection:
+        await update_inspection_with_rollup(inspection, {"$set": {"status": "closed"}})
     
     return {
         "message": "Escalation resolved successfully",
@@ -879,11 +880,10 @@ async def resolve_escalation(
 async def re_escalate(
     escalation_id: str,
     re_escalate_data: ReEscalateRequest,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Re-escalate to higher authority"""
-    db = get_database()
-    
     escalation = await db.escalations.find_one({"_id": escalation_id})
     if not escalation:
         raise HTTPException(status_code=404, detail="Escalation not found")
@@ -926,8 +926,8 @@ async def re_escalate(
 
 @router.get("/compliance/offices")
 async def get_offices_compliance(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
     min_score: Optional[float] = None,
     max_score: Optional[float] = None,
     office_type: Optional[str] = None,
@@ -938,45 +938,20 @@ async def get_offices_compliance(
     """Get compliance scores for all offices"""
     from services.compliance_service import get_all_offices_compliance
     
-    # Get all offices compliance
-    compliance_data = await get_all_offices_compliance()
-    
-    # Apply filters
-    filtered_data = []
-    for item in compliance_data:
-        office = item["office"]
-        
-        # Office type filter
-        if office_type and office.get("type") != office_type:
-            continue
-        
-        # District filter
-        if district and office.get("district") != district:
-            continue
-        
-        # Score filters
-        if min_score is not None and item["compliance_score"] < min_score:
-            continue
-        if max_score is not None and item["compliance_score"] > max_score:
-            continue
-        
-        filtered_data.append(item)
-    
-    # Sort
-    if sort_by == "score_asc":
-        filtered_data.sort(key=lambda x: x["compliance_score"])
-    elif sort_by == "score_desc":
-        filtered_data.sort(key=lambda x: x["compliance_score"], reverse=True)
-    elif sort_by == "name":
-        filtered_data.sort(key=lambda x: x["office"]["name"])
-    
-    # Pagination
-    total = len(filtered_data)
-    paginated_data = filtered_data[skip:skip + limit]
+    # Filter, score, sort and paginate in a single aggregation
+    page = await get_all_offices_compliance(
+        office_type=office_type,
+        district=district,
+        min_score=min_score,
+        max_score=max_score,
+        sort_by=sort_by,
+        skip=skip,
+        limit=limit
+    )
     
     return {
-        "offices": paginated_data,
-        "total": total,
+        "offices": page["offices"],
+        "total": page["total"],
         "skip": skip,
         "limit": limit
     }
@@ -985,15 +960,15 @@ async def get_offices_compliance(
 @router.get("/compliance/office/{office_id}")
 async def get_office_compliance_detail(
     office_id: str,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get detailed compliance data for a specific office"""
     from services.compliance_service import calculate_office_compliance, get_office_compliance_history
-    
-    db = get_database()
+    from services.inspection_metrics import issue_category_stages
     
     # Get office
-    office = await db.offices.find_one({"_id": office_id})
+    office = await db.offices.find_one({"_id": office_id}, SEARCH_PROJECTION)
     if not office:
         raise HTTPException(status_code=404, detail="Office not found")
     
@@ -1003,39 +978,25 @@ async def get_office_compliance_detail(
     # Get compliance history (last 6 months)
     history = await get_office_compliance_history(office_id, months=6)
     
-    # Get all inspections for this office
-    inspections = await db.inspections.find({"office_id": office_id}).to_list(10000)
-    
-    # Get common issues
-    issue_categories = {}
-    for inspection in inspections:
-        if inspection.get("report") and inspection["report"].get("issues"):
-            issues_text = inspection["report"]["issues"].lower()
-            
-            if any(word in issues_text for word in ["clean", "dirty", "garbage", "waste"]):
-                issue_categories["Cleanliness"] = issue_categories.get("Cleanliness", 0) + 1
-            if any(word in issues_text for word in ["staff", "behavior", "rude"]):
-                issue_categories["Staff Behavior"] = issue_categories.get("Staff Behavior", 0) + 1
-            if any(word in issues_text for word in ["service", "slow", "delay"]):
-                issue_categories["Service Quality"] = issue_categories.get("Service Quality", 0) + 1
-            if any(word in issues_text for word in ["infrastructure", "building", "facility"]):
-                issue_categories["Infrastructure"] = issue_categories.get("Infrastructure", 0) + 1
-    
-    common_issues = [{"category": k, "count": v} for k, v in sorted(issue_categories.items(), key=lambda x: x[1], reverse=True)]
+    # Get common issues, counted from the categories stored at submission
+    issue_rows = await db.inspections.aggregate(
+        issue_category_stages({"office_id": office_id}, include_other=False)
+    ).to_list(None)
+    common_issues = [{"category": row["_id"], "count": row["count"]} for row in issue_rows]
     
     return {
         "office": office,
         "compliance": compliance,
         "history": history,
         "common_issues": common_issues,
-        "total_inspections": len(inspections)
+        "total_inspections": await db.inspections.count_documents({"office_id": office_id})
     }
 
 
 @router.get("/violations")
 async def get_violations(
-    skip: int = 0,
-    limit: int = 50,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1),
     min_violations: int = 2,
     severity: Optional[str] = None,
     current_user: dict = Depends(require_role(["responder", "admin"]))
@@ -1043,27 +1004,12 @@ async def get_violations(
     """Get offices with repeated violations"""
     from services.compliance_service import get_violation_tracking
     
-    # Get violation data
-    violations = await get_violation_tracking()
-    
-    # Apply filters
-    filtered_violations = []
-    for item in violations:
-        if item["violation_count"] < min_violations:
-            continue
-        
-        if severity and item.get("severity") != severity:
-            continue
-        
-        filtered_violations.append(item)
-    
-    # Pagination
-    total = len(filtered_violations)
-    paginated_violations = filtered_violations[skip:skip + limit]
+    # Filter, group and paginate in the database
+    page = await get_violation_tracking(min_violations, severity, skip, limit)
     
     return {
-        "violations": paginated_violations,
-        "total": total,
+        "violations": page["violations"],
+        "total": page["total"],
         "skip": skip,
         "limit": limit
     }
@@ -1072,15 +1018,14 @@ async def get_violations(
 @router.get("/compliance/report/{office_id}")
 async def generate_compliance_report(
     office_id: str,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Generate compliance report for an office"""
     from services.compliance_service import calculate_office_compliance, get_office_compliance_history
     
-    db = get_database()
-    
     # Get office
-    office = await db.offices.find_one({"_id": office_id})
+    office = await db.offices.find_one({"_id": office_id}, SEARCH_PROJECTION)
     if not office:
         raise HTTPException(status_code=404, detail="Office not found")
     
@@ -1099,11 +1044,8 @@ async def generate_compliance_report(
     # Rating trend
     recent_ratings = []
     for inspection in recent_inspections:
-        if inspection.get("report"):
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                recent_ratings.append(avg_rating)
+        if inspection.get("avg_rating") is not None:
+            recent_ratings.append(inspection["avg_rating"])
     
     avg_recent_rating = sum(recent_ratings) / len(recent_ratings) if recent_ratings else 0
     
@@ -1129,135 +1071,67 @@ async def generate_compliance_report(
 
 # ============ ADVANCED ANALYTICS & REPORTING ============
 
+def _ratio(numerator: float, denominator: float, scale: float = 1, digits: int = 2) -> float:
+    """Rounded numerator / denominator * scale, or 0 when there is nothing to divide by"""
+    return round(numerator / denominator * scale, digits) if denominator else 0
+
+
 @router.get("/analytics/detailed")
 async def get_detailed_analytics(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     office_type: Optional[str] = None,
     district: Optional[str] = None,
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get detailed analytics with custom filters"""
-    db = get_database()
-    
-    # Build date filter
-    date_filter = {}
+    """Get detailed analytics with custom filters (read from the daily rollups)"""
+    # Build rollup filter; date bounds apply at day granularity
+    query = {}
+    day_filter = {}
     if date_from:
-        date_filter["$gte"] = datetime.fromisoformat(date_from)
+        day_filter["$gte"] = datetime.fromisoformat(date_from).replace(hour=0, minute=0, second=0, microsecond=0)
     if date_to:
-        if "$gte" in date_filter:
-            date_filter["$lte"] = datetime.fromisoformat(date_to)
-        else:
-            date_filter = {"$lte": datetime.fromisoformat(date_to)}
-    
-    # Build query
-    query = {}
-    if date_filter:
-        query["assigned_date"] = date_filter
-    
-    # Get inspections
-    all_inspections = await db.inspections.find(query).to_list(10000)
-    
-    # Filter by office type or district if needed
-    if office_type or district:
-        filtered_inspections = []
-        for inspection in all_inspections:
-            office = await db.offices.find_one({"_id": inspection["office_id"]})
-            if office:
-                if office_type and office.get("type") != office_type:
-                    continue
-                if district and office.get("district") != district:
-                    continue
-                filtered_inspections.append(inspection)
-        all_inspections = filtered_inspections
-    
-    # Calculate comprehensive metrics
-    total_inspections = len(all_inspections)
+        day_filter["$lte"] = datetime.fromisoformat(date_to)
+    if day_filter:
+        query["day"] = day_filter
+    if office_type:
+        query["office_type"] = office_type
+    if district:
+        query["district"] = district
     
-    # Status breakdown
-    status_counts = {}
-    for inspection in all_inspections:
-        status = inspection["status"]
-        status_counts[status] = status_counts.get(status, 0) + 1
-    
-    # Rating analysis
-    ratings = []
-    rating_by_category = {"cleanliness": [], "behavior": [], "service": []}
-    for inspection in all_inspections:
-        if inspection.get("report"):
-            report = inspection["report"]
-            if report.get("cleanliness_rating"):
-                rating_by_category["cleanliness"].append(report["cleanliness_rating"])
-            if report.get("staff_behavior_rating"):
-                rating_by_category["behavior"].append(report["staff_behavior_rating"])
-            if report.get("service_quality_rating"):
-                rating_by_category["service"].append(report["service_quality_rating"])
-            
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                ratings.append(avg_rating)
-    
-    # Response time analysis
-    response_times = []
-    for inspection in all_inspections:
-        if inspection.get("report") and inspection.get("office_response"):
-            submitted_at = inspection["report"].get("submitted_at")
-            responded_at = inspection["office_response"].get("responded_at")
-            if submitted_at and responded_at:
-                time_diff = (responded_at - submitted_at).days
-                response_times.append(time_diff)
+    rollup = await get_rollup_totals(query)
+    totals = rollup["totals"]
     
     # District performance
-    district_performance = {}
-    for inspection in all_inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
-        if office and office.get("district"):
-            dist = office["district"]
-            if dist not in district_performance:
-                district_performance[dist] = {"total": 0, "responded": 0, "closed": 0, "ratings": []}
-            
-            district_performance[dist]["total"] += 1
-            if inspection.get("office_response"):
-                district_performance[dist]["responded"] += 1
-            if inspection["status"] == "closed":
-                district_performance[dist]["closed"] += 1
-            
-            if inspection.get("report"):
-                report = inspection["report"]
-                if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                    avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                    district_performance[dist]["ratings"].append(avg_rating)
-    
-    district_data = []
-    for district_name, data in district_performance.items():
-        district_data.append({
-            "district": district_name,
-            "total_inspections": data["total"],
-            "response_rate": round((data["responded"] / data["total"] * 100), 1) if data["total"] > 0 else 0,
-            "resolution_rate": round((data["closed"] / data["total"] * 100), 1) if data["total"] > 0 else 0,
-            "avg_rating": round(sum(data["ratings"]) / len(data["ratings"]), 2) if data["ratings"] else 0
-        })
+    district_data = [
+        {
+            "district": row["_id"],
+            "total_inspections": row["total"],
+            "response_rate": _ratio(row["responded"], row["total"], 100, 1),
+            "resolution_rate": _ratio(row["closed"], row["total"], 100, 1),
+            "avg_rating": _ratio(row["rating_sum"], row["rating_count"])
+        }
+        for row in rollup["by_district"] if row["total"]
+    ]
     
     district_data.sort(key=lambda x: x["avg_rating"], reverse=True)
     
     return {
         "summary": {
-            "total_inspections": total_inspections,
-            "avg_rating": round(sum(ratings) / len(ratings), 2) if ratings else 0,
-            "avg_response_time_days": round(sum(response_times) / len(response_times), 1) if response_times else 0,
-            "on_time_response_rate": round(len([rt for rt in response_times if rt <= 7]) / len(response_times) * 100, 1) if response_times else 0
+            "total_inspections": totals["total"],
+            "avg_rating": _ratio(totals["rating_sum"], totals["rating_count"]),
+            "avg_response_time_days": _ratio(totals["response_time_sum"], totals["response_time_count"], digits=1),
+            "on_time_response_rate": _ratio(totals["on_time"], totals["response_time_count"], 100, 1)
         },
-        "status_breakdown": status_counts,
+        "status_breakdown": {k: v for k, v in rollup["status"].items() if v},
         "rating_by_category": {
-            "cleanliness": round(sum(rating_by_category["cleanliness"]) / len(rating_by_category["cleanliness"]), 2) if rating_by_category["cleanliness"] else 0,
-            "behavior": round(sum(rating_by_category["behavior"]) / len(rating_by_category["behavior"]), 2) if rating_by_category["behavior"] else 0,
-            "service": round(sum(rating_by_category["service"]) / len(rating_by_category["service"]), 2) if rating_by_category["service"] else 0
+            "cleanliness": _ratio(totals["cleanliness_sum"], totals["cleanliness_count"]),
+            "behavior": _ratio(totals["behavior_sum"], totals["behavior_count"]),
+            "service": _ratio(totals["service_sum"], totals["service_count"])
         },
         "response_time_distribution": {
-            "0-3 days": len([rt for rt in response_times if rt <= 3]),
-            "4-7 days": len([rt for rt in response_times if 4 <= rt <= 7]),
-            "8-14 days": len([rt for rt in response_times if 8 <= rt <= 14]),
-            "15+ days": len([rt for rt in response_times if rt > 14])
+            label: rollup["response_buckets"].get(label, 0) for _, label in RESPONSE_TIME_BUCKETS
         },
         "district_performance": district_data
     }
@@ -1270,11 +1144,10 @@ async def generate_custom_report(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     metrics: Optional[List[str]] = [],  # inspections, ratings, compliance, response_time
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Generate custom report"""
-    db = get_database()
-    
     # Build date filter
     date_filter = {}
     if date_from:
@@ -1322,11 +1195,8 @@ async def generate_custom_report(
     if not metrics or "ratings" in metrics:
         ratings = []
         for inspection in inspections:
-            if inspection.get("report"):
-                report = inspection["report"]
-                if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                    avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                    ratings.append(avg_rating)
+            if inspection.get("avg_rating") is not None:
+                ratings.append(inspection["avg_rating"])
         
         report_data["rating_summary"] = {
             "avg_rating": round(sum(ratings) / len(ratings), 2) if ratings else 0,
@@ -1343,12 +1213,8 @@ async def generate_custom_report(
     if not metrics or "response_time" in metrics:
         response_times = []
         for inspection in inspections:
-            if inspection.get("report") and inspection.get("office_response"):
-                submitted_at = inspection["report"].get("submitted_at")
-                responded_at = inspection["office_response"].get("responded_at")
-                if submitted_at and responded_at:
-                    time_diff = (responded_at - submitted_at).days
-                    response_times.append(time_diff)
+            if inspection.get("response_time_days") is not None:
+                response_times.append(inspection["response_time_days"])
         
         report_data["response_time_summary"] = {
             "avg_response_time_days": round(sum(response_times) / len(response_times), 1) if response_times else 0,
@@ -1361,47 +1227,42 @@ async def generate_custom_report(
 
 @router.post("/reports/export")
 async def export_report_data(
-    export_format: str,  # json, csv
+    export_format: str,  # json, csv, ndjson
     data_type: str,  # inspections, offices, schools
     filters: Optional[Dict] = {},
-    current_user: dict = Depends(require_role(["responder", "admin"]))
+    compress: bool = False,
+    current_user: dict = Depends(require_role(["responder", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Export data in specified format"""
-    db = get_database()
+    """Stream data in the specified format, optionally gzip-compressed"""
+    # Validate before the response starts; errors cannot be reported mid-stream
+    if data_type not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=400, detail="Invalid data type")
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid export format")
     
-    # Get data based on type
+    query = {}
     if data_type == "inspections":
-        query = {}
         if filters.get("status"):
             query["status"] = filters["status"]
         if filters.get("office_id"):
             query["office_id"] = filters["office_id"]
-        
-        data = await db.inspections.find(query).to_list(10000)
-    elif data_type == "offices":
-        data = await db.offices.find({}).to_list(1000)
-    elif data_type == "schools":
-        data = await db.schools.find({}).to_list(1000)
-    else:
-        raise HTTPException(status_code=400, detail="Invalid data type")
     
-    # Format data
-    if export_format == "json":
-        return {
-            "format": "json",
-            "data": data,
-            "count": len(data),
-            "exported_at": datetime.utcnow()
-        }
-    elif export_format == "csv":
-        # For CSV, return structured data that frontend can convert
-        return {
-            "format": "csv",
-            "data": data,
-            "count": len(data),
-            "exported_at": datetime.utcnow(),
-            "message": "CSV data ready for download"
-        }
-    else:
-        raise HTTPException(status_code=400, detail="Invalid export format")
+    # CSV only needs its columns; JSON formats keep whole documents minus photo payloads
+    projection = export_projection(data_type) if export_format == "csv" else {"report.photos": 0}
+    cursor = db[data_type].find(query, projection).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    
+    body = stream_export(cursor, export_format, data_type)
+    filename = f"{data_type}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    if compress:
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
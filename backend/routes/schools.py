@@ -1,8 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from models.school import SchoolCreate, School
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
+from utils.pagination import find_page
 from middleware.auth import get_current_user
+from services.search_service import entity_search_fields, refresh_inspection_search_terms, search_filter
 from datetime import datetime
+from typing import Optional
+from pymongo import DESCENDING
 import uuid
 import math
 
@@ -12,26 +17,23 @@ router = APIRouter(prefix="/schools", tags=["schools"])
 async def get_schools(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     search: str = Query(None),
     district: str = Query(None),
     is_active: bool = Query(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all schools with pagination, search, and filters"""
     # Only admin can access this endpoint
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Build query
     query = {}
     if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"district": {"$regex": search, "$options": "i"}},
-            {"state": {"$regex": search, "$options": "i"}}
-        ]
+        # Word-prefix search on name, district and state
+        query.update(search_filter(search) or {})
     if district:
         query["district"] = {"$regex": district, "$options": "i"}
     if is_active is not None:
@@ -45,7 +47,7 @@ async def get_schools(
     total_pages = math.ceil(total / limit)
     
     # Get schools
-    schools = await db.schools.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    schools, next_cursor = await find_page(db.schools, query, "created_at", DESCENDING, limit, cursor=cursor, skip=skip)
     
     return {
         "schools": [
@@ -67,20 +69,21 @@ async def get_schools(
             "page": page,
             "limit": limit,
             "total": total,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_cursor": next_cursor
         }
     }
 
 @router.get("/{school_id}")
 async def get_school(
     school_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get a single school by ID"""
     if current_user["role"] not in ["admin", "headmaster"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
     school = await db.schools.find_one({"_id": school_id})
     
     if not school:
@@ -123,14 +126,13 @@ async def get_school(
 @router.post("")
 async def create_school(
     school_data: SchoolCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create a new school"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Check if school name already exists
     existing = await db.schools.find_one({"name": school_data.name})
     if existing:
@@ -143,6 +145,7 @@ async def create_school(
     school_dict["is_active"] = True
     school_dict["created_by"] = current_user["_id"]
     school_dict["created_at"] = datetime.utcnow()
+    school_dict.update(entity_search_fields("schools", school_dict))
     
     # Insert school
     await db.schools.insert_one(school_dict)
@@ -163,14 +166,13 @@ async def create_school(
 async def update_school(
     school_id: str,
     school_data: SchoolCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update a school"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Check if school exists
     existing = await db.schools.find_one({"_id": school_id})
     if not existing:
@@ -179,6 +181,7 @@ async def update_school(
     # Update school
     update_data = school_data.dict()
     update_data["updated_at"] = datetime.utcnow()
+    update_data.update(entity_search_fields("schools", update_data))
     
     result = await db.schools.update_one(
         {"_id": school_id},
@@ -188,19 +191,22 @@ async def update_school(
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update school")
     
+    # Inspections are also found by their school's name
+    if update_data["name"] != existing.get("name"):
+        await refresh_inspection_search_terms({"school_id": school_id})
+    
     return {"message": "School updated successfully"}
 
 @router.delete("/{school_id}")
 async def delete_school(
     school_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Soft delete a school (deactivate)"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Check if school exists
     existing = await db.schools.find_one({"_id": school_id})
     if not existing:
@@ -217,14 +223,13 @@ async def delete_school(
 @router.post("/{school_id}/activate")
 async def activate_school(
     school_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reactivate a school"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_database()
-    
     # Check if school exists
     existing = await db.schools.find_one({"_id": school_id})
     if not existing:
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from models.user import UserCreate, UserUpdate
-from middleware.auth import require_role, get_current_user
+from middleware.auth import require_role, get_current_user, invalidate_cached_users
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
-from utils.auth import get_password_hash
+from utils.pagination import find_page
+from utils.loader import RelationLoader
+from utils.auth import get_password_hash_async
 from datetime import datetime
+from typing import Optional
+from pymongo import DESCENDING
 import uuid
 import math
 
@@ -14,15 +19,15 @@ async def get_students_by_school(
     school_id: str,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     search: str = Query(None),
     grade: str = Query(None),
     team_status: str = Query(None),  # "assigned" or "unassigned"
     is_active: bool = Query(None),
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all students for a specific school with pagination and filters"""
-    db = get_database()
-    
     # If headmaster, verify they own this school
     if current_user.get("role") == "headmaster" and current_user.get("school_id") != school_id:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -56,7 +61,11 @@ async def get_students_by_school(
     total_pages = math.ceil(total / limit)
     
     # Get students
-    students = await db.users.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    students, next_cursor = await find_page(db.users, query, "created_at", DESCENDING, limit, cursor=cursor, skip=skip)
+    
+    # Batch-load referenced teams
+    loader = RelationLoader(db)
+    teams = await loader.load_many("teams", (s.get("team_id") for s in students))
     
     # Enrich with team info
     enriched_students = []
@@ -74,10 +83,9 @@ async def get_students_by_school(
         }
         
         # Get team name if exists
-        if student.get("team_id"):
-            team = await db.teams.find_one({"_id": student["team_id"]})
-            if team:
-                student_data["team_name"] = team["name"]
+        team = teams.get(student.get("team_id"))
+        if team:
+            student_data["team_name"] = team["name"]
         
         enriched_students.append(student_data)
     
@@ -87,18 +95,18 @@ async def get_students_by_school(
             "page": page,
             "limit": limit,
             "total": total,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_cursor": next_cursor
         }
     }
 
 @router.get("/{student_id}/performance")
 async def get_student_performance(
     student_id: str,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get performance metrics for a specific student"""
-    db = get_database()
-    
     # Get student
     student = await db.users.find_one({"_id": student_id, "role": "student"})
     if not student:
@@ -145,11 +153,10 @@ async def get_student_performance(
 @router.post("")
 async def create_student(
     student_data: UserCreate,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create a new student"""
-    db = get_database()
-    
     # If headmaster, ensure student is created in their school
     if current_user.get("role") == "headmaster":
         if not student_data.school_id or student_data.school_id != current_user.get("school_id"):
@@ -174,7 +181,7 @@ async def create_student(
     # Create student document
     student_dict = student_data.dict()
     student_dict["_id"] = str(uuid.uuid4())
-    student_dict["password"] = get_password_hash(student_data.password)
+    student_dict["password"] = await get_password_hash_async(student_data.password)
     student_dict["is_active"] = True
     student_dict["created_at"] = datetime.utcnow()
     student_dict["team_id"] = None
@@ -205,11 +212,10 @@ async def create_student(
 async def update_student(
     student_id: str,
     student_data: UserUpdate,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update student information"""
-    db = get_database()
-    
     # Check if student exists
     student = await db.users.find_one({"_id": student_id, "role": "student"})
     if not student:
@@ -238,6 +244,7 @@ async def update_student(
         {"_id": student_id},
         {"$set": update_fields}
     )
+    invalidate_cached_users(student_id)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update student")
@@ -247,11 +254,10 @@ async def update_student(
 @router.delete("/{student_id}")
 async def delete_student(
     student_id: str,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Soft delete a student (deactivate)"""
-    db = get_database()
-    
     # Check if student exists
     student = await db.users.find_one({"_id": student_id, "role": "student"})
     if not student:
@@ -266,17 +272,17 @@ async def delete_student(
         {"_id": student_id},
         {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
     )
+    invalidate_cached_users(student_id)
     
     return {"message": "Student deactivated successfully"}
 
 @router.post("/{student_id}/activate")
 async def activate_student(
     student_id: str,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reactivate a student"""
-    db = get_database()
-    
     # Check if student exists
     student = await db.users.find_one({"_id": student_id, "role": "student"})
     if not student:
@@ -291,5 +297,6 @@ async def activate_student(
         {"_id": student_id},
         {"$set": {"is_active": True, "updated_at": datetime.utcnow()}}
     )
+    invalidate_cached_users(student_id)
     
     return {"message": "Student activated successfully"}
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.team import Team, TeamCreate
-from middleware.auth import get_current_user, require_role
+from middleware.auth import get_current_user, require_role, invalidate_cached_users
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
+from utils.pagination import find_page
+from utils.loader import RelationLoader
 from datetime import datetime
 from typing import List, Optional
+from pymongo import DESCENDING
 import uuid
 
 router = APIRouter(prefix="/teams", tags=["teams"])
@@ -12,13 +16,13 @@ router = APIRouter(prefix="/teams", tags=["teams"])
 async def get_teams(
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     school_id: Optional[str] = None,
     search: Optional[str] = None,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all teams with pagination and filtering"""
-    db = get_database()
-    
     # Build query
     query = {"is_active": True}
     if school_id:
@@ -30,17 +34,22 @@ async def get_teams(
     total = await db.teams.count_documents(query)
     
     # Get teams
-    teams = await db.teams.find(query).skip(skip).limit(limit).to_list(limit)
+    teams, next_cursor = await find_page(db.teams, query, "created_at", DESCENDING, limit, cursor=cursor, skip=skip)
+    
+    # Batch-load schools and every member/leader across the page
+    loader = RelationLoader(db)
+    await loader.attach(teams, "school", "schools", "school_id")
+    users = await loader.load_many(
+        "users",
+        [sid for team in teams for sid in team.get("student_ids", [])] + [team.get("team_leader_id") for team in teams]
+    )
     
-    # Enrich with school data and student info
+    # Enrich with student info
     for team in teams:
-        school = await db.schools.find_one({"_id": team["school_id"]})
-        team["school"] = school
-        
         # Get student details
         students = []
         for student_id in team.get("student_ids", []):
-            student = await db.users.find_one({"_id": student_id})
+            student = users.get(student_id)
             if student:
                 students.append({
                     "_id": student["_id"],
@@ -51,34 +60,37 @@ async def get_teams(
         
         # Get team leader details
         if team.get("team_leader_id"):
-            leader = await db.users.find_one({"_id": team["team_leader_id"]})
-            team["team_leader"] = leader if leader else None
+            team["team_leader"] = users.get(team["team_leader_id"])
     
     return {
         "teams": teams,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 @router.get("/school/{school_id}")
 async def get_teams_by_school(
     school_id: str,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all active teams for a school"""
-    db = get_database()
-    
     teams = await db.teams.find({
         "school_id": school_id,
         "is_active": True
     }).to_list(100)
     
+    # Batch-load every member across the school's teams
+    loader = RelationLoader(db)
+    users = await loader.load_many("users", (sid for team in teams for sid in team.get("student_ids", [])))
+    
     # Enrich with student info
     for team in teams:
         students = []
         for student_id in team.get("student_ids", []):
-            student = await db.users.find_one({"_id": student_id})
+            student = users.get(student_id)
             if student:
                 students.append({
                     "_id": student["_id"],
@@ -92,23 +104,25 @@ async def get_teams_by_school(
 @router.get("/{team_id}")
 async def get_team_detail(
     team_id: str,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get detailed team information"""
-    db = get_database()
-    
     team = await db.teams.find_one({"_id": team_id})
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
     
     # Enrich with school data
-    school = await db.schools.find_one({"_id": team["school_id"]})
-    team["school"] = school
+    loader = RelationLoader(db)
+    team["school"] = await loader.load("schools", team["school_id"])
+    
+    # Load members and leader in one query
+    users = await loader.load_many("users", team.get("student_ids", []) + [team.get("team_leader_id")])
     
     # Get full student details
     students = []
     for student_id in team.get("student_ids", []):
-        student = await db.users.find_one({"_id": student_id})
+        student = users.get(student_id)
         if student:
             students.append({
                 "_id": student["_id"],
@@ -121,8 +135,7 @@ async def get_team_detail(
     
     # Get team leader details
     if team.get("team_leader_id"):
-        leader = await db.users.find_one({"_id": team["team_leader_id"]})
-        team["team_leader"] = leader
+        team["team_leader"] = users.get(team["team_leader_id"])
     
     # Get inspection stats
     total_inspections = await db.inspections.count_documents({"team_id": team_id})
@@ -142,20 +155,21 @@ async def get_team_detail(
 @router.post("")
 async def create_team(
     team_data: TeamCreate,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create a new team"""
-    db = get_database()
-    
     # Verify school exists
     school = await db.schools.find_one({"_id": team_data.school_id})
     if not school:
         raise HTTPException(status_code=404, detail="School not found")
     
     # Verify all students exist and belong to the school
+    loader = RelationLoader(db)
+    users = await loader.load_many("users", team_data.student_ids)
     for student_id in team_data.student_ids:
-        student = await db.users.find_one({"_id": student_id, "role": "student"})
-        if not student:
+        student = users.get(student_id)
+        if not student or student.get("role") != "student":
             raise HTTPException(status_code=404, detail=f"Student {student_id} not found")
         if student.get("school_id") != team_data.school_id:
             raise HTTPException(status_code=400, detail=f"Student {student_id} does not belong to this school")
@@ -193,6 +207,7 @@ async def create_team(
         {"_id": {"$in": team_data.student_ids}},
         {"$set": {"team_id": team_id}}
     )
+    invalidate_cached_users(*team_data.student_ids)
     
     return {"message": "Team created successfully", "team_id": team_id}
 
@@ -200,11 +215,10 @@ async def create_team(
 async def update_team(
     team_id: str,
     team_data: TeamCreate,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update team details"""
-    db = get_database()
-    
     # Check if team exists
     team = await db.teams.find_one({"_id": team_id})
     if not team:
@@ -216,9 +230,11 @@ async def update_team(
         raise HTTPException(status_code=404, detail="School not found")
     
     # Verify all students exist and belong to the school
+    loader = RelationLoader(db)
+    users = await loader.load_many("users", team_data.student_ids)
     for student_id in team_data.student_ids:
-        student = await db.users.find_one({"_id": student_id, "role": "student"})
-        if not student:
+        student = users.get(student_id)
+        if not student or student.get("role") != "student":
             raise HTTPException(status_code=404, detail=f"Student {student_id} not found")
         if student.get("school_id") != team_data.school_id:
             raise HTTPException(status_code=400, detail=f"Student {student_id} does not belong to this school")
@@ -248,6 +264,7 @@ async def update_team(
             {"_id": {"$in": list(removed_students)}},
             {"$set": {"team_id": None}}
         )
+        invalidate_cached_users(*removed_students)
     
     # Update team
     await db.teams.update_one(
@@ -267,17 +284,17 @@ async def update_team(
         {"_id": {"$in": team_data.student_ids}},
         {"$set": {"team_id": team_id}}
     )
+    invalidate_cached_users(*team_data.student_ids)
     
     return {"message": "Team updated successfully"}
 
 @router.delete("/{team_id}")
 async def delete_team(
     team_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Soft delete a team (deactivate)"""
-    db = get_database()
-    
     # Check if team exists
     team = await db.teams.find_one({"_id": team_id})
     if not team:
@@ -306,17 +323,17 @@ async def delete_team(
         {"team_id": team_id},
         {"$set": {"team_id": None}}
     )
+    invalidate_cached_users(*team.get("student_ids", []))
     
     return {"message": "Team deleted successfully"}
 
 @router.post("/{team_id}/activate")
 async def activate_team(
     team_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reactivate a deactivated team"""
-    db = get_database()
-    
     # Check if team exists
     team = await db.teams.find_one({"_id": team_id})
     if not team:
@@ -333,17 +350,17 @@ async def activate_team(
         {"_id": {"$in": team.get("student_ids", [])}},
         {"$set": {"team_id": team_id}}
     )
+    invalidate_cached_users(*team.get("student_ids", []))
     
     return {"message": "Team activated successfully"}
 
 @router.get("/{team_id}/performance")
 async def get_team_performance(
     team_id: str,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get detailed performance analytics for a team"""
-    db = get_database()
-    
     # Get team
     team = await db.teams.find_one({"_id": team_id})
     if not team:
@@ -373,9 +390,13 @@ async def get_team_performance(
     ).sort("created_at", -1).limit(5).to_list(5)
     
     # Enrich with office data
+    loader = RelationLoader(db)
+    offices = await loader.load_many("offices", (i["office_id"] for i in recent_inspections))
+    users = await loader.load_many("users", team.get("student_ids", []))
+    
     recent_activity = []
     for inspection in recent_inspections:
-        office = await db.offices.find_one({"_id": inspection["office_id"]})
+        office = offices.get(inspection["office_id"])
         recent_activity.append({
             "id": inspection["_id"],
             "task_name": inspection["task_name"],
@@ -387,7 +408,7 @@ async def get_team_performance(
     # Get team members info
     members = []
     for student_id in team.get("student_ids", []):
-        student = await db.users.find_one({"_id": student_id})
+        student = users.get(student_id)
         if student:
             members.append({
                 "id": student["_id"],
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.template import Template, TemplateCreate, TemplateClone, FormField
 from middleware.auth import get_current_user, require_role
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
+from utils.pagination import find_page
+from services.search_service import SEARCH_PROJECTION, entity_search_fields, search_filter
 from datetime import datetime
 from typing import List, Optional
+from pymongo import DESCENDING
 import uuid
 
 router = APIRouter(prefix="/templates", tags=["templates"])
@@ -12,58 +16,60 @@ router = APIRouter(prefix="/templates", tags=["templates"])
 async def get_templates(
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     office_type: Optional[str] = None,
     search: Optional[str] = None,
-    current_user: dict = Depends(require_role(["admin", "headmaster"]))
+    current_user: dict = Depends(require_role(["admin", "headmaster"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all templates with pagination and filtering"""
-    db = get_database()
-    
     # Build query
     query = {"is_active": True}
     if office_type:
         query["office_types"] = office_type
     if search:
-        query["name"] = {"$regex": search, "$options": "i"}
+        # Word-prefix search on the template name
+        query.update(search_filter(search) or {})
     
     # Get total count
     total = await db.templates.count_documents(query)
     
     # Get templates
-    templates = await db.templates.find(query).skip(skip).limit(limit).to_list(limit)
+    templates, next_cursor = await find_page(
+        db.templates, query, "created_at", DESCENDING, limit, cursor=cursor, skip=skip, projection=SEARCH_PROJECTION
+    )
     
     return {
         "templates": templates,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 @router.get("/all")
 async def get_all_templates(
     office_type: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all active templates (no pagination) - for dropdowns"""
-    db = get_database()
-    
     query = {"is_active": True}
     if office_type:
         query["office_types"] = office_type
     
-    templates = await db.templates.find(query).to_list(1000)
+    templates = await db.templates.find(query, SEARCH_PROJECTION).to_list(1000)
     
     return templates
 
 @router.get("/{template_id}")
 async def get_template_detail(
     template_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get detailed template information"""
-    db = get_database()
-    
-    template = await db.templates.find_one({"_id": template_id})
+    template = await db.templates.find_one({"_id": template_id}, SEARCH_PROJECTION)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
@@ -76,11 +82,10 @@ async def get_template_detail(
 @router.post("")
 async def create_template(
     template_data: TemplateCreate,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create a new template"""
-    db = get_database()
-    
     # Validate form fields
     if not template_data.form_fields or len(template_data.form_fields) == 0:
         raise HTTPException(status_code=400, detail="Template must have at least one form field")
@@ -125,6 +130,7 @@ async def create_template(
         "created_by": current_user["_id"],
         "created_at": datetime.utcnow()
     }
+    template.update(entity_search_fields("templates", template))
     
     await db.templates.insert_one(template)
     
@@ -134,11 +140,10 @@ async def create_template(
 async def update_template(
     template_id: str,
     template_data: TemplateCreate,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update template details"""
-    db = get_database()
-    
     # Check if template exists
     template = await db.templates.find_one({"_id": template_id})
     if not template:
@@ -197,7 +202,8 @@ async def update_template(
                 "name": template_data.name,
                 "description": template_data.description,
                 "office_types": template_data.office_types,
-                "form_fields": [field.dict() for field in template_data.form_fields]
+                "form_fields": [field.dict() for field in template_data.form_fields],
+                **entity_search_fields("templates", {"name": template_data.name})
             }
         }
     )
@@ -208,11 +214,10 @@ async def update_template(
 async def clone_template(
     template_id: str,
     clone_data: TemplateClone,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Clone an existing template"""
-    db = get_database()
-    
     # Check if template exists
     template = await db.templates.find_one({"_id": template_id})
     if not template:
@@ -238,6 +243,7 @@ async def clone_template(
         "created_by": current_user["_id"],
         "created_at": datetime.utcnow()
     }
+    new_template.update(entity_search_fields("templates", new_template))
     
     await db.templates.insert_one(new_template)
     
@@ -246,11 +252,10 @@ async def clone_template(
 @router.delete("/{template_id}")
 async def delete_template(
     template_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Soft delete a template (deactivate)"""
-    db = get_database()
-    
     # Check if template exists
     template = await db.templates.find_one({"_id": template_id})
     if not template:
@@ -279,11 +284,10 @@ async def delete_template(
 @router.post("/{template_id}/activate")
 async def activate_template(
     template_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reactivate a deactivated template"""
-    db = get_database()
-    
     # Check if template exists
     template = await db.templates.find_one({"_id": template_id})
     if not template:
@@ -1,29 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, BackgroundTasks
 from models.user import UserCreate, User, UserUpdate
-from utils.auth import get_password_hash
+from utils.auth import get_password_hash_async
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.database import get_database
-from middleware.auth import get_current_user, require_role
+from utils.pagination import find_page
+from utils.loader import RelationLoader
+from services.user_import import IMPORT_JOBS_COLLECTION, create_import_job, run_import_job
+from middleware.auth import get_current_user, require_role, invalidate_cached_users
 from datetime import datetime
+from typing import Optional
+from pymongo import DESCENDING
 import uuid
 import math
-import csv
-import io
+import tempfile
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 @router.get("")
 async def get_users(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     search: str = Query(None),
     role: str = Query(None),
     school_id: str = Query(None),
     is_active: bool = Query(None),
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all users with pagination, search, and filters"""
-    db = get_database()
-    
     # Build query
     query = {}
     if search:
@@ -47,7 +54,13 @@ async def get_users(
     total_pages = math.ceil(total / limit)
     
     # Get users
-    users = await db.users.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    users, next_cursor = await find_page(db.users, query, "created_at", DESCENDING, limit, cursor=cursor, skip=skip)
+    
+    # Batch-load referenced schools, offices and teams
+    loader = RelationLoader(db)
+    schools = await loader.load_many("schools", (u.get("school_id") for u in users))
+    offices = await loader.load_many("offices", (u.get("office_id") for u in users))
+    teams = await loader.load_many("teams", (u.get("team_id") for u in users))
     
     # Enrich with school/office/team info
     enriched_users = []
@@ -67,22 +80,19 @@ async def get_users(
         }
         
         # Get school name if exists
-        if user.get("school_id"):
-            school = await db.schools.find_one({"_id": user["school_id"]})
-            if school:
-                user_data["school_name"] = school["name"]
+        school = schools.get(user.get("school_id"))
+        if school:
+            user_data["school_name"] = school["name"]
         
         # Get office name if exists
-        if user.get("office_id"):
-            office = await db.offices.find_one({"_id": user["office_id"]})
-            if office:
-                user_data["office_name"] = office["name"]
+        office = offices.get(user.get("office_id"))
+        if office:
+            user_data["office_name"] = office["name"]
         
         # Get team name if exists
-        if user.get("team_id"):
-            team = await db.teams.find_one({"_id": user["team_id"]})
-            if team:
-                user_data["team_name"] = team["name"]
+        team = teams.get(user.get("team_id"))
+        if team:
+            user_data["team_name"] = team["name"]
         
         enriched_users.append(user_data)
     
@@ -92,17 +102,18 @@ async def get_users(
             "page": page,
             "limit": limit,
             "total": total,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_cursor": next_cursor
         }
     }
 
 @router.get("/{user_id}")
 async def get_user(
     user_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get a single user by ID"""
-    db = get_database()
     user = await db.users.find_one({"_id": user_id})
     
     if not user:
@@ -157,11 +168,10 @@ async def get_user(
 @router.post("")
 async def create_user(
     user_data: UserCreate,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create a new user"""
-    db = get_database()
-    
     # Check if user already exists
     existing_user = await db.users.find_one({"email": user_data.email})
     if existing_user:
@@ -185,7 +195,7 @@ async def create_user(
     # Create user document
     user_dict = user_data.dict()
     user_dict["_id"] = str(uuid.uuid4())
-    user_dict["password"] = get_password_hash(user_data.password)
+    user_dict["password"] = await get_password_hash_async(user_data.password)
     user_dict["is_active"] = True
     user_dict["created_at"] = datetime.utcnow()
     user_dict["team_id"] = None
@@ -218,11 +228,10 @@ async def create_user(
 async def update_user(
     user_id: str,
     user_data: UserUpdate,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update a user"""
-    db = get_database()
-    
     # Check if user exists
     existing = await db.users.find_one({"_id": user_id})
     if not existing:
@@ -247,6 +256,7 @@ async def update_user(
         {"_id": user_id},
         {"$set": update_fields}
     )
+    invalidate_cached_users(user_id)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update user")
@@ -256,11 +266,10 @@ async def update_user(
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Soft delete a user (deactivate)"""
-    db = get_database()
-    
     # Check if user exists
     existing = await db.users.find_one({"_id": user_id})
     if not existing:
@@ -275,17 +284,17 @@ async def delete_user(
         {"_id": user_id},
         {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
     )
+    invalidate_cached_users(user_id)
     
     return {"message": "User deactivated successfully"}
 
 @router.post("/{user_id}/activate")
 async def activate_user(
     user_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reactivate a user"""
-    db = get_database()
-    
     # Check if user exists
     existing = await db.users.find_one({"_id": user_id})
     if not existing:
@@ -296,109 +305,49 @@ async def activate_user(
         {"_id": user_id},
         {"$set": {"is_active": True, "updated_at": datetime.utcnow()}}
     )
+    invalidate_cached_users(user_id)
     
     return {"message": "User activated successfully"}
 
-@router.post("/bulk-import")
+@router.post("/bulk-import", status_code=202)
 async def bulk_import_users(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: dict = Depends(require_role(["admin"]))
 ):
-    """Bulk import users from CSV file"""
-    db = get_database()
-    
+    """Start a bulk import of users from a CSV file; poll the returned job for progress"""
     # Validate file type
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
-    # Read CSV file
-    contents = await file.read()
-    csv_text = contents.decode('utf-8')
-    csv_reader = csv.DictReader(io.StringIO(csv_text))
-    
-    created_users = []
-    errors = []
-    
-    for idx, row in enumerate(csv_reader, start=2):  # Start at 2 (header is row 1)
-        try:
-            # Validate required fields
-            required_fields = ["email", "name", "password", "role"]
-            missing_fields = [field for field in required_fields if not row.get(field)]
-            if missing_fields:
-                errors.append({
-                    "row": idx,
-                    "error": f"Missing required fields: {', '.join(missing_fields)}"
-                })
-                continue
-            
-            # Check if user already exists
-            existing_user = await db.users.find_one({"email": row["email"]})
-            if existing_user:
-                errors.append({
-                    "row": idx,
-                    "email": row["email"],
-                    "error": "Email already registered"
-                })
-                continue
-            
-            # Validate role
-            valid_roles = ["admin", "headmaster", "student", "office", "responder"]
-            if row["role"] not in valid_roles:
-                errors.append({
-                    "row": idx,
-                    "email": row["email"],
-                    "error": f"Invalid role: {row['role']}"
-                })
-                continue
-            
-            # Create user document
-            user_dict = {
-                "_id": str(uuid.uuid4()),
-                "email": row["email"],
-                "name": row["name"],
-                "password": get_password_hash(row["password"]),
-                "role": row["role"],
-                "phone": row.get("phone"),
-                "school_id": row.get("school_id") if row.get("school_id") else None,
-                "office_id": None,
-                "team_id": None,
-                "grade": row.get("grade") if row.get("grade") else None,
-                "is_active": True,
-                "created_at": datetime.utcnow(),
-                "profile_image": None
-            }
-            
-            # Insert user
-            await db.users.insert_one(user_dict)
-            
-            # Update school student count if student
-            if user_dict["role"] == "student" and user_dict.get("school_id"):
-                await db.schools.update_one(
-                    {"_id": user_dict["school_id"]},
-                    {"$inc": {"student_count": 1}}
-                )
-            
-            created_users.append({
-                "email": user_dict["email"],
-                "name": user_dict["name"],
-                "role": user_dict["role"]
-            })
-            
-        except Exception as e:
-            errors.append({
-                "row": idx,
-                "email": row.get("email", "N/A"),
-                "error": str(e)
-            })
+    # Copy the upload in chunks to a file the background job owns (the upload is closed with the request)
+    upload = tempfile.TemporaryFile()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        upload.write(chunk)
+    upload.seek(0)
+    
+    job = await create_import_job(file.filename, current_user["_id"])
+    background_tasks.add_task(run_import_job, job["_id"], upload)
     
     return {
-        "message": f"Bulk import completed. Created: {len(created_users)}, Errors: {len(errors)}",
-        "created_count": len(created_users),
-        "error_count": len(errors),
-        "created_users": created_users[:10],  # Return first 10 for preview
-        "errors": errors[:10]  # Return first 10 errors
+        "message": "Bulk import started",
+        "job_id": job["_id"],
+        "status": job["status"]
     }
 
+@router.get("/bulk-import/{job_id}")
+async def get_bulk_import_job(
+    job_id: str,
+    current_user: dict = Depends(require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get progress and results of a bulk import job"""
+    job = await db[IMPORT_JOBS_COLLECTION].find_one({"_id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    
+    return job
+
 
 # Profile & Settings routes
 
@@ -411,11 +360,10 @@ async def get_current_user_profile(current_user: dict = Depends(get_current_user
 @router.put("/me")
 async def update_current_user_profile(
     user_data: UserUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update current user's profile"""
-    db = get_database()
-    
     # Build update fields
     update_fields = {}
     if user_data.name:
@@ -444,6 +392,7 @@ async def update_current_user_profile(
         {"_id": current_user["_id"]},
         {"$set": update_fields}
     )
+    invalidate_cached_users(current_user["_id"])
     
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update profile")
@@ -452,10 +401,8 @@ async def update_current_user_profile(
 
 
 @router.get("/settings")
-async def get_user_settings(current_user: dict = Depends(get_current_user)):
+async def get_user_settings(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get user's settings"""
-    db = get_database()
-    
     # Get settings from user document
     user = await db.users.find_one({"_id": current_user["_id"]})
     if not user:
@@ -476,16 +423,16 @@ async def get_user_settings(current_user: dict = Depends(get_current_user)):
 @router.put("/settings")
 async def update_user_settings(
     settings: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update user's settings"""
-    db = get_database()
-    
     # Update settings
     result = await db.users.update_one(
         {"_id": current_user["_id"]},
         {"$set": {"settings": settings, "updated_at": datetime.utcnow()}}
     )
+    invalidate_cached_users(current_user["_id"])
     
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update settings")
@@ -496,12 +443,11 @@ async def update_user_settings(
 @router.post("/change-password")
 async def change_password(
     password_data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Change user's password"""
-    from utils.auth import verify_password
-    
-    db = get_database()
+    from utils.auth import verify_password_async
     
     # Get current user
     user = await db.users.find_one({"_id": current_user["_id"]})
@@ -509,17 +455,18 @@ async def change_password(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Verify current password
-    if not verify_password(password_data.get("current_password", ""), user["password"]):
+    if not await verify_password_async(password_data.get("current_password", ""), user["password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Hash new password
-    new_password_hash = get_password_hash(password_data.get("new_password"))
+    new_password_hash = await get_password_hash_async(password_data.get("new_password"))
     
     # Update password
     await db.users.update_one(
         {"_id": current_user["_id"]},
         {"$set": {"password": new_password_hash, "updated_at": datetime.utcnow()}}
     )
+    invalidate_cached_users(current_user["_id"])
     
     return {"message": "Password changed successfully"}
 
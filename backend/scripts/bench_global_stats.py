@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark analytics_service.get_global_stats against the previous sequential implementation.
+
+Seeds a throwaway database (BENCH_DB_NAME, default "civica_bench") with synthetic inspections,
+then reports server round trips and wall-clock latency for the sequential counts, the same
+counts run concurrently, and the current single index-only $facet pass.
+
+    cd backend && python scripts/bench_global_stats.py --inspections 1000000 --runs 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pymongo import monitoring
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (one per round trip)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+counter = CommandCounter()
+monitoring.register(counter)
+
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "civica_bench")
+
+from utils.database import get_database, close_mongo_connection  # noqa: E402
+from utils.indexes import ensure_indexes  # noqa: E402
+from services.analytics_service import get_global_stats  # noqa: E402
+
+STATUSES = ["assigned", "in_progress", "submitted", "responded", "reviewed", "closed", "escalated"]
+
+
+async def legacy_get_global_stats():
+    """The sequential implementation this benchmark compares against (13 round trips)"""
+    db = get_database()
+    completed = ["submitted", "responded", "reviewed", "closed"]
+    for status in [None, "assigned", "in_progress", "submitted", "responded", "reviewed", "closed"]:
+        await db.inspections.count_documents({"status": status} if status else {})
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    await db.inspections.count_documents({"status": {"$in": completed}, "created_at": {"$gte": today_start}})
+    await db.inspections.aggregate([
+        {"$match": {"status": {"$in": completed}, "report.submitted_at": {"$exists": True}}},
+        {"$project": {"completion_time": {"$divide": [
+            {"$subtract": ["$report.submitted_at", "$assigned_date"]}, 1000 * 60 * 60 * 24
+        ]}}},
+        {"$group": {"_id": None, "avg_time": {"$avg": "$completion_time"}}}
+    ]).to_list(1)
+    await db.schools.count_documents({"is_active": True})
+    await db.offices.count_documents({"is_active": True})
+    await db.teams.count_documents({"is_active": True})
+    await db.users.count_documents({"role": "student", "is_active": True})
+
+
+async def concurrent_get_global_stats():
+    """Independent count_documents per status and the completion aggregation, all run concurrently"""
+    db = get_database()
+    completed = ["submitted", "responded", "reviewed", "closed"]
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    await asyncio.gather(
+        db.inspections.count_documents({}),
+        *(db.inspections.count_documents({"status": status}) for status in STATUSES[:-1]),
+        db.inspections.count_documents({"status": {"$in": completed}, "created_at": {"$gte": today_start}}),
+        db.inspections.aggregate([
+            {"$match": {"status": {"$in": completed}, "report.submitted_at": {"$exists": True}}},
+            {"$group": {"_id": None, "avg_time": {"$avg": {"$subtract": ["$report.submitted_at", "$assigned_date"]}}}}
+        ]).to_list(1),
+        db.schools.count_documents({"is_active": True}),
+        db.offices.count_documents({"is_active": True}),
+        db.teams.count_documents({"is_active": True}),
+        db.users.count_documents({"role": "student", "is_active": True})
+    )
+
+
+async def seed(inspections: int, batch_size: int = 10000):
+    """Insert synthetic inspections until the collection holds `inspections` documents"""
+    db = get_database()
+    existing = await db.inspections.estimated_document_count()
+    if existing >= inspections:
+        print(f"Using {existing} existing inspections")
+        return
+
+    now = datetime.utcnow()
+    print(f"Seeding {inspections - existing} inspections...")
+    for start in range(existing, inspections, batch_size):
+        docs = []
+        for _ in range(min(batch_size, inspections - start)):
+            status = random.choice(STATUSES)
+            assigned = now - timedelta(days=random.randint(0, 365))
+            doc = {
+                "_id": str(uuid.uuid4()),
+                "status": status,
+                "assigned_date": assigned,
+                "created_at": assigned,
+                "office_id": f"office-{random.randint(1, 500)}",
+                "school_id": f"school-{random.randint(1, 200)}",
+                "team_id": f"team-{random.randint(1, 1000)}",
+                "priority": random.choice(["low", "medium", "high"])
+            }
+            if status not in ("assigned", "in_progress"):
+                doc["report"] = {"submitted_at": assigned + timedelta(hours=random.randint(1, 240))}
+            docs.append(doc)
+        await db.inspections.insert_many(docs, ordered=False)
+
+    if not existing:
+        await db.schools.insert_many([{"_id": f"school-{i}", "is_active": True} for i in range(1, 201)])
+        await db.offices.insert_many([{"_id": f"office-{i}", "is_active": True} for i in range(1, 501)])
+        await db.teams.insert_many([{"_id": f"team-{i}", "is_active": True} for i in range(1, 1001)])
+
+
+async def measure(label: str, fn, runs: int):
+    latencies = []
+    for _ in range(runs):
+        counter.count = 0
+        started = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<12} round trips: {counter.count:>3}   "
+        f"latency ms: min {min(latencies):8.1f}  median {statistics.median(latencies):8.1f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--inspections", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--drop", action="store_true", help="drop the benchmark database afterwards")
+    args = parser.parse_args()
+
+    db = get_database()
+    await ensure_indexes(db)
+    await seed(args.inspections)
+
+    # Warm the cache so both implementations see the same working set
+    await get_global_stats()
+
+    await measure("sequential", legacy_get_global_stats, args.runs)
+    await measure("concurrent", concurrent_get_global_stats, args.runs)
+    await measure("current", get_global_stats, args.runs)
+
+    if args.drop:
+        await db.client.drop_database(db.name)
+    close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,9 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
@@ -11,19 +12,76 @@ import uuid
 from datetime import datetime
 
 # Import all route modules
-from routes import auth, schools, offices, users, teams, templates, inspections, analytics, notifications, students, responder
+from routes import auth, schools, offices, users, teams, templates, inspections, analytics, notifications, students, responder, metrics
+from services.inspection_metrics import backfill_derived_fields
+from services.notification_outbox import run_outbox_worker
+from services.notification_service import run_counter_reconciler
+from services.notification_retention import backfill_read_at, run_archiver
+from services.photo_store import migrate_embedded_photos
+from services.rollup_service import ConcurrentModificationError, ensure_rollups, run_rollup_reconciler
+from services.search_service import backfill_search_terms
+from services.user_import import fail_interrupted_import_jobs
+from utils.database import get_database, connect_to_mongo, close_mongo_connection
+from utils.indexes import ensure_indexes
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared MongoDB pool before serving traffic
+    await connect_to_mongo()
+    await ensure_indexes(get_database())
+
+    updated = await backfill_derived_fields()
+    if updated:
+        logger.info(f"Backfilled derived fields on {updated} inspections")
+
+    # Rollups are built once, and rebuilt whenever the backfill changed stored fields
+    rebuilt = await ensure_rollups(force=bool(updated))
+    if rebuilt is not None:
+        logger.info(f"Rebuilt {rebuilt} inspection rollup documents")
+
+    indexed = await backfill_search_terms()
+    if indexed:
+        logger.info(f"Computed search terms for {indexed} documents")
+
+    migrated = await migrate_embedded_photos()
+    if migrated:
+        logger.info(f"Moved embedded photos to GridFS for {migrated} inspections")
+
+    # Import jobs run in-process, so any still marked running died with the previous process
+    interrupted = await fail_interrupted_import_jobs()
+    if interrupted:
+        logger.warning(f"Marked {interrupted} interrupted import jobs as failed")
+
+    # Notifications read before read_at was recorded still need one to expire
+    backfilled = await backfill_read_at()
+    if backfilled:
+        logger.info(f"Set read_at on {backfilled} read notifications")
+
+    # Fan out queued notifications off the request path
+    outbox_worker = asyncio.create_task(run_outbox_worker())
+    counter_reconciler = asyncio.create_task(run_counter_reconciler())
+    archiver = asyncio.create_task(run_archiver())
+    rollup_reconciler = asyncio.create_task(run_rollup_reconciler())
+
+    yield
+
+    for task in (outbox_worker, counter_reconciler, archiver, rollup_reconciler):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    close_mongo_connection()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Inspection writes that lose a concurrent transition race (routes.inspections and routes.responder)
+app.add_exception_handler(ConcurrentModificationError, inspections.concurrent_modification_handler)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -44,14 +102,14 @@ async def root():
     return {"message": "Hello World"}
 
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
+async def create_status_check(input: StatusCheckCreate, db: AsyncIOMotorDatabase = Depends(get_database)):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
+async def get_status_checks(db: AsyncIOMotorDatabase = Depends(get_database)):
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
@@ -67,6 +125,7 @@ api_router.include_router(analytics.router)
 api_router.include_router(notifications.router)
 api_router.include_router(students.router)
 api_router.include_router(responder.router)
+api_router.include_router(metrics.router)
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -85,7 +144,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -1,22 +1,73 @@
 """Analytics service for aggregating inspection data"""
+import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, List
 from utils.database import get_database
+from services.rollup_service import get_daily_series
+
+# Statuses counted as completed in dashboard figures
+COMPLETED_STATUSES = ["submitted", "responded", "reviewed", "closed"]
+
 
 async def get_global_stats() -> Dict:
     """Calculate global statistics"""
     db = get_database()
     
-    # Total inspections
-    total_inspections = await db.inspections.count_documents({})
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    # All inspection figures in one pass. Sorting on status first and keeping only fields of the
+    # {status, report.submitted_at, created_at, assigned_date} index makes the pass an index-only scan
+    pipeline = [
+        {"$sort": {"status": 1}},
+        {"$project": {"_id": 0, "status": 1, "report.submitted_at": 1, "created_at": 1, "assigned_date": 1}},
+        {
+            "$facet": {
+                "by_status": [
+                    {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+                ],
+                "completed_today": [
+                    {"$match": {"status": {"$in": COMPLETED_STATUSES}, "created_at": {"$gte": today_start}}},
+                    {"$count": "count"}
+                ],
+                "completion_time": [
+                    {"$match": {"status": {"$in": COMPLETED_STATUSES}, "report.submitted_at": {"$exists": True}}},
+                    {
+                        "$group": {
+                            "_id": None,
+                            "avg_time": {
+                                "$avg": {
+                                    "$divide": [
+                                        {"$subtract": ["$report.submitted_at", "$assigned_date"]},
+                                        1000 * 60 * 60 * 24  # Convert milliseconds to days
+                                    ]
+                                }
+                            }
+                        }
+                    }
+                ]
+            }
+        }
+    ]
+    
+    # Entity counts run concurrently with the aggregation
+    facet_result, total_schools, total_offices, total_teams, total_students = await asyncio.gather(
+        db.inspections.aggregate(pipeline).to_list(1),
+        db.schools.count_documents({"is_active": True}),
+        db.offices.count_documents({"is_active": True}),
+        db.teams.count_documents({"is_active": True}),
+        db.users.count_documents({"role": "student", "is_active": True})
+    )
+    facets = facet_result[0]
     
-    # Count by status
-    assigned = await db.inspections.count_documents({"status": "assigned"})
-    in_progress = await db.inspections.count_documents({"status": "in_progress"})
-    submitted = await db.inspections.count_documents({"status": "submitted"})
-    responded = await db.inspections.count_documents({"status": "responded"})
-    reviewed = await db.inspections.count_documents({"status": "reviewed"})
-    closed = await db.inspections.count_documents({"status": "closed"})
+    # Every inspection falls in one status group (missing statuses group under None)
+    status_counts = {row["_id"]: row["count"] for row in facets["by_status"]}
+    total_inspections = sum(status_counts.values())
+    assigned = status_counts.get("assigned", 0)
+    in_progress = status_counts.get("in_progress", 0)
+    submitted = status_counts.get("submitted", 0)
+    responded = status_counts.get("responded", 0)
+    reviewed = status_counts.get("reviewed", 0)
+    closed = status_counts.get("closed", 0)
     
     # Active (assigned + in_progress)
     active_inspections = assigned + in_progress
@@ -27,48 +78,11 @@ async def get_global_stats() -> Dict:
     # Calculate completion rate
     completion_rate = (completed_inspections / total_inspections * 100) if total_inspections > 0 else 0
     
-    # Count today
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    completed_today = await db.inspections.count_documents({
-        "status": {"$in": ["submitted", "responded", "reviewed", "closed"]},
-        "created_at": {"$gte": today_start}
-    })
-    
-    # Calculate average completion time (in days)
-    pipeline = [
-        {
-            "$match": {
-                "status": {"$in": ["submitted", "responded", "reviewed", "closed"]},
-                "report.submitted_at": {"$exists": True}
-            }
-        },
-        {
-            "$project": {
-                "completion_time": {
-                    "$divide": [
-                        {"$subtract": ["$report.submitted_at", "$assigned_date"]},
-                        1000 * 60 * 60 * 24  # Convert milliseconds to days
-                    ]
-                }
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "avg_time": {"$avg": "$completion_time"}
-            }
-        }
-    ]
+    completed_today = facets["completed_today"][0]["count"] if facets["completed_today"] else 0
     
-    avg_result = await db.inspections.aggregate(pipeline).to_list(1)
+    avg_result = facets["completion_time"]
     avg_completion_time = round(avg_result[0]["avg_time"], 1) if avg_result and avg_result[0].get("avg_time") else 0
     
-    # Count entities
-    total_schools = await db.schools.count_documents({"is_active": True})
-    total_offices = await db.offices.count_documents({"is_active": True})
-    total_teams = await db.teams.count_documents({"is_active": True})
-    total_students = await db.users.count_documents({"role": "student", "is_active": True})
-    
     return {
         "total_inspections": total_inspections,
         "active_inspections": active_inspections,
@@ -93,44 +107,18 @@ async def get_global_stats() -> Dict:
     }
 
 async def get_inspection_trends(days: int = 30) -> List[Dict]:
-    """Get inspection trends over time"""
-    db = get_database()
-    
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    pipeline = [
-        {
-            "$match": {
-                "created_at": {"$gte": start_date}
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}
-                },
-                "count": {"$sum": 1},
-                "submitted": {
-                    "$sum": {
-                        "$cond": [{"$in": ["$status", ["submitted", "responded", "reviewed", "closed"]]}, 1, 0]
-                    }
-                }
-            }
-        },
-        {
-            "$sort": {"_id": 1}
-        }
-    ]
+    """Get inspection trends over time (read from the daily rollups)"""
+    start_date = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
     
-    results = await db.inspections.aggregate(pipeline).to_list(days)
+    results = await get_daily_series({"day": {"$gte": start_date}})
     
     return [
         {
-            "date": r["_id"],
-            "total": r["count"],
-            "completed": r["submitted"]
+            "date": r["date"],
+            "total": r["total"],
+            "completed": r["completed"]
         }
-        for r in results
+        for r in results if r["total"]
     ]
 
 async def get_school_performance() -> List[Dict]:
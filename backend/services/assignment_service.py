@@ -1,7 +1,11 @@
 import random
 from datetime import datetime, timedelta
+from typing import Dict, List
 from utils.database import get_database
 
+# Assignments within this many days count towards a team's workload
+WORKLOAD_WINDOW_DAYS = 30
+
 async def assign_random_team(school_id: str) -> str:
     """
     Assign a random team from a school using a fair distribution algorithm
@@ -22,7 +26,7 @@ async def assign_random_team(school_id: str) -> str:
     teams = await db.teams.find({
         "school_id": school_id,
         "is_active": True
-    }).to_list(1000)
+    }, {"_id": 1}).to_list(1000)
     
     if not teams:
         raise Exception(f"No active teams found for school {school_id}")
@@ -31,35 +35,46 @@ async def assign_random_team(school_id: str) -> str:
     if len(teams) == 1:
         return teams[0]["_id"]
     
-    # Count recent assignments (last 30 days) for each team
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    # Count recent assignments (last 30 days) for all teams at once
+    team_ids = [team["_id"] for team in teams]
+    team_workload = await get_recent_workload(team_ids)
     
-    team_workload = {}
-    for team in teams:
-        count = await db.inspections.count_documents({
-            "team_id": team["_id"],
-            "assigned_date": {"$gte": thirty_days_ago}
-        })
-        team_workload[team["_id"]] = count
+    return pick_fair_team(team_ids, team_workload)
+
+
+async def get_recent_workload(team_ids: List[str], days: int = WORKLOAD_WINDOW_DAYS) -> Dict[str, int]:
+    """Inspections assigned to each team in the last `days` days, in one aggregation"""
+    db = get_database()
+    since = datetime.utcnow() - timedelta(days=days)
+    
+    counts = await db.inspections.aggregate([
+        {"$match": {"team_id": {"$in": team_ids}, "assigned_date": {"$gte": since}}},
+        {"$group": {"_id": "$team_id", "count": {"$sum": 1}}}
+    ]).to_list(None)
     
+    workload = {team_id: 0 for team_id in team_ids}
+    workload.update({row["_id"]: row["count"] for row in counts})
+    return workload
+
+
+def pick_fair_team(team_ids: List[str], team_workload: Dict[str, int]) -> str:
+    """Randomly pick among teams below the fairness threshold (average workload + 1), or among all teams"""
     # Calculate fairness threshold (average + 1)
-    avg_workload = sum(team_workload.values()) / len(team_workload)
+    avg_workload = sum(team_workload[team_id] for team_id in team_ids) / len(team_ids)
     fairness_threshold = avg_workload + 1
     
     # Filter teams below fairness threshold
     eligible_teams = [
-        team_id for team_id, count in team_workload.items()
-        if count < fairness_threshold
+        team_id for team_id in team_ids
+        if team_workload[team_id] < fairness_threshold
     ]
     
     # If no eligible teams, use all teams
     if not eligible_teams:
-        eligible_teams = [team["_id"] for team in teams]
+        eligible_teams = team_ids
     
     # Randomly select a team
-    selected_team_id = random.choice(eligible_teams)
-    
-    return selected_team_id
+    return random.choice(eligible_teams)
 
 
 async def get_team_workload_stats(school_id: str) -> dict:
@@ -74,23 +89,31 @@ async def get_team_workload_stats(school_id: str) -> dict:
         "is_active": True
     }).to_list(1000)
     
+    # Per-team counts in a single $group instead of three count queries per team
+    counts = await db.inspections.aggregate([
+        {"$match": {"team_id": {"$in": [team["_id"] for team in teams]}}},
+        {
+            "$group": {
+                "_id": "$team_id",
+                "total_assigned": {"$sum": 1},
+                "pending": {"$sum": {"$cond": [{"$eq": ["$status", "assigned"]}, 1, 0]}},
+                "completed": {"$sum": {"$cond": [{"$in": ["$status", ["submitted", "responded", "closed"]]}, 1, 0]}}
+            }
+        }
+    ]).to_list(None)
+    counts = {row["_id"]: row for row in counts}
+    
     stats = []
     for team in teams:
-        total_assigned = await db.inspections.count_documents({"team_id": team["_id"]})
-        pending = await db.inspections.count_documents({
-            "team_id": team["_id"],
-            "status": "assigned"
-        })
-        completed = await db.inspections.count_documents({
-            "team_id": team["_id"],
-            "status": {"$in": ["submitted", "responded", "closed"]}
-        })
+        team_counts = counts.get(team["_id"], {})
+        total_assigned = team_counts.get("total_assigned", 0)
+        completed = team_counts.get("completed", 0)
         
         stats.append({
             "team_id": team["_id"],
             "team_name": team["name"],
             "total_assigned": total_assigned,
-            "pending": pending,
+            "pending": team_counts.get("pending", 0),
             "completed": completed,
             "completion_rate": (completed / total_assigned * 100) if total_assigned > 0 else 0
         })
@@ -0,0 +1,193 @@
+"""Bulk creation of inspection campaigns with workload-balanced team assignment"""
+import heapq
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+from models.inspection import InspectionCampaign
+from services.assignment_service import get_recent_workload
+from services.inspection_metrics import compute_derived_fields
+from services.notification_outbox import enqueue, outbox_event
+from services.rollup_service import apply_inserts
+from services.search_service import SEARCH_VERSION, compute_inspection_search_terms
+from utils.database import get_database
+
+MAX_CAMPAIGN_INSPECTIONS = 20000
+CAMPAIGN_INSERT_BATCH_SIZE = 1000
+
+
+class TeamBalancer:
+    """
+    Min-heap of teams keyed by current load (30-day workload plus campaign assignments).
+
+    Each assignment goes to the least loaded team and pushes it back with load + 1, so a
+    campaign spreads evenly across teams. Ties are broken randomly.
+    """
+
+    def __init__(self, teams: List[Dict], workload: Dict[str, int]):
+        self._heap = [(workload.get(team["_id"], 0), random.random(), team["_id"], team["school_id"]) for team in teams]
+        heapq.heapify(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def assign(self) -> Tuple[str, str]:
+        """(team_id, school_id) of the least loaded team, counting the new assignment against it"""
+        load, _, team_id, school_id = self._heap[0]
+        heapq.heapreplace(self._heap, (load + 1, random.random(), team_id, school_id))
+        return team_id, school_id
+
+
+async def _selector_targets(db, campaign: InspectionCampaign) -> Tuple[List[Dict], List[str]]:
+    """Offices matched by the selector, and the schools whose teams may inspect them"""
+    selector = campaign.selector
+    if not selector.district and not selector.office_type:
+        raise ValueError("Selector needs a district or an office_type")
+
+    query = {"is_active": True}
+    if selector.district:
+        query["district"] = selector.district
+    if selector.office_type:
+        query["type"] = selector.office_type
+    offices = await db.offices.find(query, {"district": 1, "type": 1}).to_list(None)
+
+    if selector.school_ids:
+        school_ids = list(dict.fromkeys(selector.school_ids))
+    elif selector.district:
+        schools = await db.schools.find({"district": selector.district, "is_active": True}, {"_id": 1}).to_list(None)
+        school_ids = [school["_id"] for school in schools]
+    else:
+        raise ValueError("Selector needs school_ids when no district is given")
+
+    return offices, school_ids
+
+
+async def create_campaign(campaign: InspectionCampaign, created_by: str) -> Dict:
+    """
+    Validate and create every inspection of a campaign.
+
+    References are checked with one `$in` query per collection, teams are balanced with a
+    load heap seeded from their 30-day workload (one aggregation), and inspections are
+    written with insert_many (search terms included) and counted into the rollups in one
+    bulk write per batch.
+    Raises ValueError, naming the offending ids, if any reference is invalid.
+    """
+    db = get_database()
+
+    if bool(campaign.targets) == bool(campaign.selector):
+        raise ValueError("Provide either targets or a selector")
+
+    template = await db.templates.find_one({"_id": campaign.template_id}, {"_id": 1})
+    if not template:
+        raise ValueError(f"Template not found: {campaign.template_id}")
+
+    if campaign.selector:
+        office_docs, school_ids = await _selector_targets(db, campaign)
+        offices = {office["_id"]: office for office in office_docs}
+        targets = [(office["_id"], None) for office in office_docs]
+    else:
+        targets = [(target.office_id, target.school_id) for target in campaign.targets]
+        office_ids = list({office_id for office_id, _ in targets})
+        school_ids = list({school_id for _, school_id in targets})
+        offices = {
+            office["_id"]: office for office in
+            await db.offices.find({"_id": {"$in": office_ids}}, {"district": 1, "type": 1}).to_list(len(office_ids))
+        }
+        missing_offices = sorted(set(office_ids) - set(offices))
+        if missing_offices:
+            raise ValueError(f"Offices not found: {', '.join(missing_offices[:20])}")
+
+    if not targets:
+        raise ValueError("Campaign matches no offices")
+    if len(targets) > MAX_CAMPAIGN_INSPECTIONS:
+        raise ValueError(f"Campaign exceeds {MAX_CAMPAIGN_INSPECTIONS} inspections")
+
+    schools = {
+        school["_id"] for school in
+        await db.schools.find({"_id": {"$in": school_ids}}, {"_id": 1}).to_list(len(school_ids))
+    }
+    missing_schools = sorted(set(school_ids) - schools)
+    if missing_schools:
+        raise ValueError(f"Schools not found: {', '.join(missing_schools[:20])}")
+
+    # Active teams of every school involved, with their current workload
+    teams = await db.teams.find(
+        {"school_id": {"$in": school_ids}, "is_active": True},
+        {"_id": 1, "school_id": 1}
+    ).to_list(None)
+    workload = await get_recent_workload([team["_id"] for team in teams])
+
+    teams_by_school = defaultdict(list)
+    for team in teams:
+        teams_by_school[team["school_id"]].append(team)
+
+    if campaign.selector:
+        # Any school of the selector may take any office; balance across all their teams
+        balancers = {None: TeamBalancer(teams, workload)}
+    else:
+        balancers = {school_id: TeamBalancer(teams_by_school[school_id], workload) for school_id in school_ids}
+
+    schools_without_teams = sorted(str(school_id) for school_id, balancer in balancers.items() if not balancer)
+    if schools_without_teams:
+        raise ValueError(
+            f"No active teams found for schools: {', '.join(schools_without_teams[:20])}"
+            if campaign.targets else "No active teams found for the selected schools"
+        )
+
+    # Build documents
+    campaign_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    team_counts = defaultdict(int)
+    inspections = []
+    for office_id, school_id in targets:
+        team_id, team_school_id = balancers[school_id].assign()
+        team_counts[team_id] += 1
+        inspection = {
+            "_id": str(uuid.uuid4()),
+            "task_name": campaign.task_name,
+            "task_description": campaign.task_description,
+            "office_id": office_id,
+            "school_id": team_school_id,
+            "team_id": team_id,
+            "assigned_date": now,
+            "due_date": campaign.due_date,
+            "status": "assigned",
+            "priority": campaign.priority,
+            "template_id": campaign.template_id,
+            "campaign_id": campaign_id,
+            "report": None,
+            "office_response": None,
+            "govt_review": None,
+            "created_by": created_by,
+            "created_at": now
+        }
+        inspection.update(compute_derived_fields(inspection))
+        inspections.append(inspection)
+
+    # Insert in batches, counting each batch into the rollups and queueing team notifications once it is written
+    for start in range(0, len(inspections), CAMPAIGN_INSERT_BATCH_SIZE):
+        batch = inspections[start:start + CAMPAIGN_INSERT_BATCH_SIZE]
+        search_terms = await compute_inspection_search_terms(batch)
+        for inspection in batch:
+            inspection["search_terms"] = search_terms[inspection["_id"]]
+            inspection["search_version"] = SEARCH_VERSION
+        await db.inspections.insert_many(batch, ordered=False)
+        await apply_inserts(batch, offices)
+        await enqueue([
+            outbox_event(
+                inspection,
+                "new_assignment",
+                "New inspection assigned",
+                f"Your team has been assigned \"{inspection['task_name']}\"",
+                ["team"],
+                actor_id=created_by
+            )
+            for inspection in batch
+        ])
+
+    return {
+        "campaign_id": campaign_id,
+        "created_count": len(inspections),
+        "team_distribution": dict(team_counts)
+    }
@@ -1,220 +1,315 @@
 """Compliance calculation service for offices"""
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
+from services.rollup_service import ROLLUP_COLLECTION
 from utils.database import get_database
 
 
+# Per-office inspection counters the compliance score is computed from
+INSPECTION_STATS_GROUP = {
+    "_id": None,
+    "total": {"$sum": 1},
+    "responded": {"$sum": {"$cond": [{"$ifNull": ["$office_response", False]}, 1, 0]}},
+    "on_time": {"$sum": {"$cond": [
+        {"$and": [{"$isNumber": "$response_time_days"}, {"$lte": ["$response_time_days", 7]}]}, 1, 0
+    ]}},
+    "avg_response_time": {"$avg": "$response_time_days"},
+    "avg_rating": {"$avg": "$avg_rating"},
+    "rated": {"$sum": {"$cond": [{"$isNumber": "$avg_rating"}, 1, 0]}},
+    "violations": {"$sum": {"$cond": [
+        {"$and": [{"$isNumber": "$avg_rating"}, {"$lt": ["$avg_rating", 3]}]}, 1, 0
+    ]}},
+    "closed": {"$sum": {"$cond": [{"$eq": ["$status", "closed"]}, 1, 0]}}
+}
+
+
+def _percent(numerator: str, denominator: str) -> Dict:
+    return {"$cond": [
+        {"$gt": [denominator, 0]},
+        {"$multiply": [{"$divide": [numerator, denominator]}, 100]},
+        0
+    ]}
+
+
+def compliance_stages() -> List[Dict]:
+    """
+    Stages turning a stream of one office's inspections into its compliance document.
+
+    Weighted score: response rate 30%, on-time rate 25%, rating 25%, resolution 15%, low violations 5%.
+    """
+    return [
+        {"$group": INSPECTION_STATS_GROUP},
+        {
+            "$set": {
+                "response_rate": _percent("$responded", "$total"),
+                "on_time_rate": _percent("$on_time", "$responded"),
+                "avg_response_time": {"$ifNull": ["$avg_response_time", 0]},
+                "avg_rating": {"$ifNull": ["$avg_rating", 0]},
+                "resolution_rate": _percent("$closed", "$total"),
+                "violation_rate": _percent("$violations", "$rated")
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "compliance_score": {"$round": [{"$add": [
+                    {"$multiply": ["$response_rate", 0.30]},
+                    {"$multiply": ["$on_time_rate", 0.25]},
+                    {"$multiply": [{"$divide": ["$avg_rating", 5]}, 100, 0.25]},
+                    {"$multiply": ["$resolution_rate", 0.15]},
+                    {"$multiply": [{"$subtract": [100, "$violation_rate"]}, 0.05]}
+                ]}, 1]},
+                "total_inspections": "$total",
+                "metrics": {
+                    "response_rate": {"$round": ["$response_rate", 1]},
+                    "on_time_rate": {"$round": ["$on_time_rate", 1]},
+                    "avg_response_time_days": {"$round": ["$avg_response_time", 1]},
+                    "avg_rating": {"$round": ["$avg_rating", 2]},
+                    "resolution_rate": {"$round": ["$resolution_rate", 1]},
+                    "violation_count": "$violations",
+                    "violation_rate": {"$round": ["$violation_rate", 1]}
+                }
+            }
+        }
+    ]
+
+
+def _empty_compliance(office_id) -> Dict:
+    return {"office_id": office_id, "compliance_score": 0, "total_inspections": 0, "metrics": {}}
+
+
 async def calculate_office_compliance(office_id: str) -> Dict:
     """Calculate compliance score for a specific office"""
     db = get_database()
     
-    # Get all inspections for this office
-    inspections = await db.inspections.find({"office_id": office_id}).to_list(10000)
-    
-    if not inspections:
-        return {
-            "office_id": office_id,
-            "compliance_score": 0,
-            "total_inspections": 0,
-            "metrics": {}
-        }
-    
-    total_inspections = len(inspections)
+    result = await db.inspections.aggregate(
+        [{"$match": {"office_id": office_id}}] + compliance_stages()
+    ).to_list(1)
     
-    # 1. Response Rate (% of inspections responded to)
-    responded_count = len([i for i in inspections if i.get("office_response")])
-    response_rate = (responded_count / total_inspections * 100) if total_inspections > 0 else 0
+    if not result:
+        return _empty_compliance(office_id)
     
-    # 2. On-Time Response Rate (% responded within 7 days)
-    on_time_count = 0
-    response_times = []
-    for inspection in inspections:
-        if inspection.get("report") and inspection.get("office_response"):
-            submitted_at = inspection["report"].get("submitted_at")
-            responded_at = inspection["office_response"].get("responded_at")
-            if submitted_at and responded_at:
-                time_diff = (responded_at - submitted_at).days
-                response_times.append(time_diff)
-                if time_diff <= 7:
-                    on_time_count += 1
-    
-    on_time_rate = (on_time_count / responded_count * 100) if responded_count > 0 else 0
-    avg_response_time = sum(response_times) / len(response_times) if response_times else 0
+    return {"office_id": office_id, **result[0]}
+
+
+# Sort specification for each supported sort_by value of the all-offices listing
+COMPLIANCE_SORTS = {
+    "score_asc": {"compliance_score": 1, "office_id": 1},
+    "score_desc": {"compliance_score": -1, "office_id": 1},
+    "name": {"office.name": 1, "office_id": 1}
+}
+
+
+async def get_all_offices_compliance(
+    office_type: Optional[str] = None,
+    district: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    sort_by: Optional[str] = "score_desc",
+    skip: int = 0,
+    limit: int = 100
+) -> Dict:
+    """
+    Compliance scores for active offices, filtered, sorted and paginated in one aggregation.
+
+    Each office's inspections are grouped inside a correlated $lookup (an $expr equality match, served
+    by the office_id index), so the cost is one round trip regardless of the number of offices.
+    Uses the pipeline-only $lookup form, since combining localField with a pipeline needs MongoDB 5.0.
+    """
+    db = get_database()
     
-    # 3. Average Rating
-    ratings = []
-    for inspection in inspections:
-        if inspection.get("report"):
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                ratings.append(avg_rating)
+    office_match = {"is_active": True}
+    if office_type:
+        office_match["type"] = office_type
+    if district:
+        office_match["district"] = district
     
-    avg_rating = sum(ratings) / len(ratings) if ratings else 0
-    rating_score = (avg_rating / 5 * 100)  # Convert to percentage
+    score_match = {}
+    if min_score is not None:
+        score_match["$gte"] = min_score
+    if max_score is not None:
+        score_match["$lte"] = max_score
     
-    # 4. Resolution Rate (% of closed inspections)
-    closed_count = len([i for i in inspections if i["status"] == "closed"])
-    resolution_rate = (closed_count / total_inspections * 100) if total_inspections > 0 else 0
+    pipeline = [
+        {"$match": office_match},
+        {"$replaceWith": {"office": "$$ROOT"}},
+        {
+            "$lookup": {
+                "from": "inspections",
+                "let": {"office_id": "$office._id"},
+                "pipeline": [{"$match": {"$expr": {"$eq": ["$office_id", "$$office_id"]}}}] + compliance_stages(),
+                "as": "compliance"
+            }
+        },
+        {
+            "$replaceWith": {
+                "$mergeObjects": [
+                    {"office_id": "$office._id", "compliance_score": 0, "total_inspections": 0, "metrics": {"$literal": {}}},
+                    {"$arrayElemAt": ["$compliance", 0]},
+                    {"office": "$office"}
+                ]
+            }
+        }
+    ]
+    if score_match:
+        pipeline.append({"$match": {"compliance_score": score_match}})
     
-    # 5. Violation Count (inspections with rating < 3)
-    violation_count = len([r for r in ratings if r < 3])
-    violation_rate = (violation_count / len(ratings) * 100) if ratings else 0
+    pipeline += [
+        {"$sort": COMPLIANCE_SORTS.get(sort_by, COMPLIANCE_SORTS["score_desc"])},
+        {
+            "$facet": {
+                "total": [{"$count": "count"}],
+                "offices": [{"$skip": skip}, {"$limit": limit}]
+            }
+        }
+    ]
     
-    # Calculate weighted compliance score
-    # Response Rate: 30%, On-Time Rate: 25%, Rating: 25%, Resolution: 15%, Low Violations: 5%
-    compliance_score = (
-        response_rate * 0.30 +
-        on_time_rate * 0.25 +
-        rating_score * 0.25 +
-        resolution_rate * 0.15 +
-        (100 - violation_rate) * 0.05
-    )
+    result = await db.offices.aggregate(pipeline).to_list(1)
+    page = result[0] if result else {"total": [], "offices": []}
     
     return {
-        "office_id": office_id,
-        "compliance_score": round(compliance_score, 1),
-        "total_inspections": total_inspections,
-        "metrics": {
-            "response_rate": round(response_rate, 1),
-            "on_time_rate": round(on_time_rate, 1),
-            "avg_response_time_days": round(avg_response_time, 1),
-            "avg_rating": round(avg_rating, 2),
-            "resolution_rate": round(resolution_rate, 1),
-            "violation_count": violation_count,
-            "violation_rate": round(violation_rate, 1)
-        }
+        "offices": page["offices"],
+        "total": page["total"][0]["count"] if page["total"] else 0
     }
 
 
-async def get_all_offices_compliance() -> List[Dict]:
-    """Get compliance scores for all offices"""
-    db = get_database()
-    
-    offices = await db.offices.find({"is_active": True}).to_list(1000)
-    
-    compliance_data = []
-    for office in offices:
-        compliance = await calculate_office_compliance(office["_id"])
-        compliance["office"] = office
-        compliance_data.append(compliance)
-    
-    # Sort by compliance score (descending)
-    compliance_data.sort(key=lambda x: x["compliance_score"], reverse=True)
-    
-    return compliance_data
+# Inspections rated below this average count as violations
+VIOLATION_RATING = 3
+
+
+def violation_stages(min_violations: int = 2, severity: Optional[str] = None) -> List[Dict]:
+    """
+    Stages grouping violating inspections per office (most violations first) with office data and severity tier.
+
+    Offices need at least two violations, or `min_violations` if higher. The opening
+    $match is served by the avg_rating index, so only violating inspections are read, and
+    each office group keeps only its latest 10 violations ($topN, MongoDB 5.2+), so memory per office is bounded.
+    """
+    stages = [
+        {"$match": {"avg_rating": {"$ne": None, "$lt": VIOLATION_RATING}}},
+        {
+            "$group": {
+                "_id": "$office_id",
+                "violation_count": {"$sum": 1},
+                "avg_violation_rating": {"$avg": "$avg_rating"},
+                "violations": {
+                    "$topN": {
+                        "n": 10,
+                        "sortBy": {"assigned_date": -1, "_id": -1},
+                        "output": {
+                            "inspection_id": "$_id",
+                            "task_name": "$task_name",
+                            "rating": {"$round": ["$avg_rating", 1]},
+                            "date": "$assigned_date",
+                            "status": "$status"
+                        }
+                    }
+                }
+            }
+        },
+        {"$match": {"violation_count": {"$gte": max(2, min_violations)}}},
+        {"$lookup": {"from": "offices", "localField": "_id", "foreignField": "_id", "as": "office"}},
+        {"$unwind": "$office"},
+        {
+            "$set": {
+                "inspection_ids": "$violations.inspection_id",
+                "severity": {
+                    "$switch": {
+                        "branches": [
+                            {"case": {"$gte": ["$violation_count", 5]}, "then": "critical"},
+                            {"case": {"$gte": ["$violation_count", 3]}, "then": "high"}
+                        ],
+                        "default": "medium"
+                    }
+                }
+            }
+        }
+    ]
+    if severity:
+        stages.append({"$match": {"severity": severity}})
+    stages.append({"$sort": {"violation_count": -1, "_id": 1}})
+    return stages
 
 
-async def get_violation_tracking() -> List[Dict]:
-    """Get offices with repeated violations"""
+async def get_violation_tracking(
+    min_violations: int = 2,
+    severity: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50
+) -> Dict:
+    """Get one page of offices with repeated violations, plus the total"""
     db = get_database()
     
-    # Get all inspections
-    all_inspections = await db.inspections.find({}).to_list(10000)
-    
-    # Track violations per office
-    office_violations = {}
-    
-    for inspection in all_inspections:
-        if inspection.get("report"):
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                
-                if avg_rating < 3:  # Below average rating = violation
-                    office_id = inspection["office_id"]
-                    
-                    if office_id not in office_violations:
-                        office_violations[office_id] = {
-                            "office_id": office_id,
-                            "violations": [],
-                            "violation_count": 0,
-                            "avg_violation_rating": []
+    pipeline = violation_stages(min_violations, severity) + [
+        {
+            "$facet": {
+                "total": [{"$count": "count"}],
+                "violations": [
+                    {"$skip": skip},
+                    {"$limit": limit},
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "office": 1,
+                            "violation_count": 1,
+                            "avg_violation_rating": {"$round": ["$avg_violation_rating", 2]},
+                            "violations": 1,
+                            "severity": 1
                         }
-                    
-                    office_violations[office_id]["violations"].append({
-                        "inspection_id": inspection["_id"],
-                        "task_name": inspection["task_name"],
-                        "rating": round(avg_rating, 1),
-                        "date": inspection["assigned_date"],
-                        "status": inspection["status"]
-                    })
-                    office_violations[office_id]["violation_count"] += 1
-                    office_violations[office_id]["avg_violation_rating"].append(avg_rating)
-    
-    # Filter offices with 2+ violations and enrich with office data
-    repeated_violations = []
-    for office_id, data in office_violations.items():
-        if data["violation_count"] >= 2:
-            office = await db.offices.find_one({"_id": office_id})
-            if office:
-                # Sort violations by date (most recent first)
-                data["violations"].sort(key=lambda x: x["date"], reverse=True)
-                
-                repeated_violations.append({
-                    "office": office,
-                    "violation_count": data["violation_count"],
-                    "avg_violation_rating": round(sum(data["avg_violation_rating"]) / len(data["avg_violation_rating"]), 2),
-                    "violations": data["violations"][:10],  # Latest 10 violations
-                    "severity": "critical" if data["violation_count"] >= 5 else "high" if data["violation_count"] >= 3 else "medium"
-                })
+                    }
+                ]
+            }
+        }
+    ]
     
-    # Sort by violation count (descending)
-    repeated_violations.sort(key=lambda x: x["violation_count"], reverse=True)
+    page = (await db.inspections.aggregate(pipeline).to_list(1))[0]
     
-    return repeated_violations
+    return {
+        "violations": page["violations"],
+        "total": page["total"][0]["count"] if page["total"] else 0
+    }
 
 
 async def get_office_compliance_history(office_id: str, months: int = 6) -> List[Dict]:
-    """Get compliance history for an office over time"""
+    """Get monthly compliance history for an office, bucketed from its daily rollups"""
     db = get_database()
     
     # Calculate date ranges
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=months * 30)
     
-    # Get inspections in date range
-    inspections = await db.inspections.find({
-        "office_id": office_id,
-        "assigned_date": {"$gte": start_date, "$lte": end_date}
-    }).to_list(10000)
-    
-    # Group by month
-    monthly_data = {}
-    
-    for inspection in inspections:
-        month_key = inspection["assigned_date"].strftime("%Y-%m")
-        
-        if month_key not in monthly_data:
-            monthly_data[month_key] = {
-                "month": month_key,
-                "inspections": [],
-                "ratings": []
+    # One row per month, so memory is bounded by `months` rather than by inspection volume
+    # (keyed by $year/$month rather than $dateTrunc, which needs MongoDB 5.0)
+    pipeline = [
+        {"$match": {"office_id": office_id, "day": {"$gte": start_date.replace(hour=0, minute=0, second=0, microsecond=0), "$lte": end_date}}},
+        {
+            "$group": {
+                "_id": {"year": {"$year": "$day"}, "month": {"$month": "$day"}},
+                "total": {"$sum": "$total"},
+                "responded": {"$sum": "$responded"},
+                "closed": {"$sum": {"$ifNull": ["$status.closed", 0]}},
+                "rating_sum": {"$sum": "$rating_sum"},
+                "rating_count": {"$sum": "$rating_count"}
             }
-        
-        monthly_data[month_key]["inspections"].append(inspection)
-        
-        # Calculate rating
-        if inspection.get("report"):
-            report = inspection["report"]
-            if all([report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]):
-                avg_rating = (report["cleanliness_rating"] + report["staff_behavior_rating"] + report["service_quality_rating"]) / 3
-                monthly_data[month_key]["ratings"].append(avg_rating)
-    
-    # Calculate metrics for each month
-    history = []
-    for month_key, data in sorted(monthly_data.items()):
-        total = len(data["inspections"])
-        responded = len([i for i in data["inspections"] if i.get("office_response")])
-        closed = len([i for i in data["inspections"] if i["status"] == "closed"])
-        avg_rating = sum(data["ratings"]) / len(data["ratings"]) if data["ratings"] else 0
-        
-        history.append({
-            "month": month_key,
-            "total_inspections": total,
-            "response_rate": round((responded / total * 100), 1) if total > 0 else 0,
-            "resolution_rate": round((closed / total * 100), 1) if total > 0 else 0,
-            "avg_rating": round(avg_rating, 2)
-        })
+        },
+        {"$match": {"total": {"$gt": 0}}},
+        {"$sort": {"_id": 1}},
+        {
+            "$project": {
+                "_id": 0,
+                "month": {"$dateToString": {"date": {"$dateFromParts": {"year": "$_id.year", "month": "$_id.month"}}, "format": "%Y-%m"}},
+                "total_inspections": "$total",
+                "response_rate": {"$round": [{"$multiply": [{"$divide": ["$responded", "$total"]}, 100]}, 1]},
+                "resolution_rate": {"$round": [{"$multiply": [{"$divide": ["$closed", "$total"]}, 100]}, 1]},
+                "avg_rating": {
+                    "$cond": [
+                        {"$gt": ["$rating_count", 0]},
+                        {"$round": [{"$divide": ["$rating_sum", "$rating_count"]}, 2]},
+                        0
+                    ]
+                }
+            }
+        }
+    ]
     
-    return history
+    return await db[ROLLUP_COLLECTION].aggregate(pipeline).to_list(None)
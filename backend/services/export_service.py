@@ -0,0 +1,130 @@
+"""Streaming exports (CSV, NDJSON, JSON) over Mongo cursors with bounded memory"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+
+EXPORT_BATCH_SIZE = 1000
+
+# Columns per exportable collection; nested report/office_response fields are flattened with dots
+EXPORT_COLUMNS = {
+    "inspections": [
+        "_id", "task_name", "office_id", "school_id", "team_id", "template_id",
+        "status", "priority", "assigned_date", "due_date", "created_at",
+        "avg_rating", "response_time_days", "issue_categories",
+        "report.cleanliness_rating", "report.staff_behavior_rating", "report.service_quality_rating",
+        "report.issues", "report.complaints", "report.suggestions", "report.photo_ids",
+        "report.submitted_at", "report.submitted_by",
+        "office_response.response_text", "office_response.action_taken", "office_response.remarks",
+        "office_response.responded_at", "office_response.responded_by"
+    ],
+    "offices": [
+        "_id", "name", "type", "address", "district", "state", "pincode",
+        "contact_person", "contact_phone", "is_active", "created_at"
+    ],
+    "schools": [
+        "_id", "name", "address", "district", "state", "pincode",
+        "headmaster_id", "student_count", "is_active", "created_at"
+    ]
+}
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json"
+}
+
+
+def export_projection(data_type: str) -> Dict[str, int]:
+    """Projection limited to the exported columns (keeps legacy embedded photos off the wire)"""
+    return {column: 1 for column in EXPORT_COLUMNS[data_type]}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return "; ".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+def _get_path(doc: Dict, path: str):
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+async def _batches(cursor, batch_size: int) -> AsyncIterator[List[Dict]]:
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def iter_csv(cursor, columns: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Header row, then one encoded chunk per batch of flattened rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    async for batch in _batches(cursor, batch_size):
+        for doc in batch:
+            writer.writerow([_csv_value(_get_path(doc, column)) for column in columns])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def iter_ndjson(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """One JSON document per line"""
+    async for batch in _batches(cursor, batch_size):
+        yield "".join(json.dumps(doc, default=_json_default) + "\n" for doc in batch).encode()
+
+
+async def iter_json(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """The `{"format", "data", "count", "exported_at"}` envelope, written incrementally"""
+    yield b'{"format": "json", "data": ['
+    count = 0
+    async for batch in _batches(cursor, batch_size):
+        rows = ", ".join(json.dumps(doc, default=_json_default) for doc in batch)
+        yield ((", " if count else "") + rows).encode()
+        count += len(batch)
+    yield f'], "count": {count}, "exported_at": "{datetime.utcnow().isoformat()}"}}'.encode()
+
+
+def stream_export(cursor, export_format: str, data_type: str) -> AsyncIterator[bytes]:
+    """Byte stream of the cursor in the requested format"""
+    if export_format == "csv":
+        return iter_csv(cursor, EXPORT_COLUMNS[data_type])
+    if export_format == "ndjson":
+        return iter_ndjson(cursor)
+    return iter_json(cursor)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Gzip-compress a byte stream incrementally"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,167 @@
+"""Derived inspection fields computed on the write path and stored on the document"""
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from utils.database import get_database
+
+# Keyword vocabulary used to bucket report issues into categories.
+# ISSUE_KEYWORDS_JSON replaces it, e.g. '{"Cleanliness": ["clean", "dirty"], ...}'.
+DEFAULT_ISSUE_KEYWORDS = {
+    "Cleanliness": ["clean", "dirty", "garbage", "waste", "hygiene"],
+    "Staff Behavior": ["staff", "behavior", "rude", "attitude"],
+    "Service Quality": ["service", "slow", "delay", "queue", "waiting"],
+    "Infrastructure": ["infrastructure", "building", "facility", "equipment"]
+}
+
+
+def _load_issue_keywords() -> Dict[str, List[str]]:
+    raw = os.environ.get("ISSUE_KEYWORDS_JSON")
+    if not raw:
+        return DEFAULT_ISSUE_KEYWORDS
+    keywords = json.loads(raw)
+    if not isinstance(keywords, dict) or not all(
+        isinstance(words, list) and all(isinstance(word, str) and word for word in words)
+        for words in keywords.values()
+    ):
+        raise ValueError("ISSUE_KEYWORDS_JSON must map category names to lists of keywords")
+    return keywords
+
+
+ISSUE_KEYWORDS = _load_issue_keywords()
+
+# Bump when the derivation changes so the backfill recomputes existing documents.
+# A custom vocabulary gets its own version, so changing it re-categorizes stored inspections.
+DERIVED_FIELDS_VERSION = 2
+if ISSUE_KEYWORDS is not DEFAULT_ISSUE_KEYWORDS:
+    DERIVED_FIELDS_VERSION = "2-" + hashlib.sha1(
+        json.dumps(ISSUE_KEYWORDS, sort_keys=True).encode()
+    ).hexdigest()[:12]
+
+
+class IssueClassifier:
+    """
+    Substring keyword matcher compiled into a single regular expression.
+
+    The pattern is a zero-width lookahead over every keyword (longest first), so one scan
+    tries each position of the text once. A keyword found there also counts every keyword
+    it contains, which keeps the result identical to checking each keyword separately.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        self.categories = list(keywords)
+        words = {word.lower() for category_words in keywords.values() for word in category_words}
+        self._categories_of = {
+            word: {
+                category for category, category_words in keywords.items()
+                if any(other.lower() in word for other in category_words)
+            }
+            for word in words
+        }
+        alternation = "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+        self._pattern = re.compile(f"(?=({alternation}))") if words else None
+
+    def classify(self, text: Optional[str]) -> List[str]:
+        """Categories with a keyword in `text`, in vocabulary order"""
+        if not text or self._pattern is None:
+            return []
+        found = set()
+        for match in self._pattern.finditer(text.lower()):
+            found |= self._categories_of[match.group(1)]
+            if len(found) == len(self.categories):
+                break
+        return [category for category in self.categories if category in found]
+
+
+issue_classifier = IssueClassifier(ISSUE_KEYWORDS)
+
+
+def calculate_avg_rating(report: Optional[Dict]) -> Optional[float]:
+    """Average of the three ratings, or None unless all three are set"""
+    if not report:
+        return None
+    ratings = [report.get("cleanliness_rating"), report.get("staff_behavior_rating"), report.get("service_quality_rating")]
+    if not all(ratings):
+        return None
+    return sum(ratings) / 3
+
+
+def calculate_response_time_days(report: Optional[Dict], office_response: Optional[Dict]) -> Optional[int]:
+    """Whole days from report submission to office response, or None if either is missing"""
+    if not report or not office_response:
+        return None
+    submitted_at = report.get("submitted_at")
+    responded_at = office_response.get("responded_at")
+    if not submitted_at or not responded_at:
+        return None
+    return (responded_at - submitted_at).days
+
+
+def categorize_issues(issues_text: Optional[str]) -> List[str]:
+    """Categories whose keywords appear in the issues text"""
+    return issue_classifier.classify(issues_text)
+
+
+def issue_category_stages(match: Dict, include_other: bool = True) -> List[Dict]:
+    """
+    Aggregation stages counting inspections matching `match` per stored issue category.
+
+    With `include_other`, reports with issues that fit no category count as "Other".
+    Yields `{_id: category, count}` rows, most frequent first.
+    """
+    categories = "$issue_categories"
+    if include_other:
+        categories = {"$cond": [
+            {"$gt": [{"$size": {"$ifNull": ["$issue_categories", []]}}, 0]},
+            "$issue_categories",
+            ["Other"]
+        ]}
+    return [
+        {"$match": {**match, "report.issues": {"$nin": [None, ""]}}},
+        {"$project": {"category": categories}},
+        {"$unwind": "$category"},
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}}
+    ]
+
+
+def compute_derived_fields(inspection: Dict) -> Dict:
+    """Fields to `$set` on an inspection whenever its report or office response changes"""
+    report = inspection.get("report")
+    office_response = inspection.get("office_response")
+    return {
+        "avg_rating": calculate_avg_rating(report),
+        "response_time_days": calculate_response_time_days(report, office_response),
+        "issue_categories": categorize_issues(report.get("issues") if report else None),
+        "derived_version": DERIVED_FIELDS_VERSION
+    }
+
+
+async def backfill_derived_fields(batch_size: int = 500) -> int:
+    """
+    Compute derived fields for inspections written before they existed (or under an older version).
+
+    Idempotent: only documents whose `derived_version` differs from the current one are touched,
+    and that lookup is served by the `derived_version` index declared in utils.indexes.
+    """
+    db = get_database()
+
+    updated = 0
+    while True:
+        batch = await db.inspections.find(
+            {"derived_version": {"$ne": DERIVED_FIELDS_VERSION}},
+            {"report.photos": 0}
+        ).limit(batch_size).to_list(batch_size)
+
+        if not batch:
+            break
+
+        await db.inspections.bulk_write(
+            [UpdateOne({"_id": i["_id"]}, {"$set": compute_derived_fields(i)}) for i in batch],
+            ordered=False
+        )
+        updated += len(batch)
+
+    return updated
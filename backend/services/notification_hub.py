@@ -0,0 +1,48 @@
+"""In-process pub/sub of notification events to connected stream clients"""
+import asyncio
+from collections import defaultdict
+from typing import Dict, Set
+
+# Events buffered per connection before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class NotificationHub:
+    """
+    Fans events out to every open stream of a user.
+
+    Delivery is per process: a stream only receives events published by the process
+    serving it. Publishing to a user without open streams is a dictionary lookup.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def has_subscribers(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, user_id: str, event: str, data: Dict) -> None:
+        """Queue `event` for every stream of `user_id`; a slow stream loses its oldest events"""
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((event, data))
+
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+hub = NotificationHub()
@@ -0,0 +1,217 @@
+"""
+Notification outbox: write paths append events, a background worker fans them out.
+
+An event records the inspection it is about and which audiences to notify. The worker
+claims pending events in batches, resolves every audience of the batch with one query
+per audience type, and writes all resulting notifications with insert_many.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from services.notification_service import build_notification, insert_notifications
+from utils.database import get_database
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "notification_outbox"
+
+# team: the inspection's team members, office: users of the inspected office,
+# headmaster: the school's headmaster, responders: all active government responders
+AUDIENCES = ("team", "office", "headmaster", "responders")
+
+OUTBOX_POLL_SECONDS = float(os.environ.get("NOTIFICATION_OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_CLAIM_BATCH = 200
+OUTBOX_LOCK_SECONDS = 60
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Set by enqueue so the worker picks up new events without waiting for the next poll
+_wakeup = asyncio.Event()
+
+
+def outbox_event(
+    inspection: Dict,
+    notification_type: str,
+    title: str,
+    message: str,
+    audiences: List[str],
+    actor_id: Optional[str] = None
+) -> Dict:
+    """Pending outbox event for `inspection`; unknown audiences are ignored"""
+    now = datetime.utcnow()
+    return {
+        "_id": str(uuid.uuid4()),
+        "type": notification_type,
+        "title": title,
+        "message": message,
+        "audiences": [audience for audience in audiences if audience in AUDIENCES],
+        "inspection_id": inspection["_id"],
+        "team_id": inspection.get("team_id"),
+        "office_id": inspection.get("office_id"),
+        "school_id": inspection.get("school_id"),
+        "actor_id": actor_id,
+        "status": "pending",
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now,
+        "processed_at": None
+    }
+
+
+async def enqueue(events: List[Dict]) -> None:
+    """Append events to the outbox (one round trip however many)"""
+    if not events:
+        return
+    await get_database()[OUTBOX_COLLECTION].insert_many(events, ordered=False)
+    _wakeup.set()
+
+
+async def enqueue_notification(
+    inspection: Dict,
+    notification_type: str,
+    title: str,
+    message: str,
+    audiences: List[str],
+    actor_id: Optional[str] = None
+) -> None:
+    """Append a single event about `inspection` to the outbox"""
+    await enqueue([outbox_event(inspection, notification_type, title, message, audiences, actor_id)])
+
+
+async def _claim(db, limit: int) -> List[Dict]:
+    """
+    Lease up to `limit` due events in three round trips.
+
+    The lease pushes `available_at` forward, so concurrent workers skip leased events
+    and events of a crashed worker become due again after OUTBOX_LOCK_SECONDS.
+    """
+    outbox = db[OUTBOX_COLLECTION]
+    now = datetime.utcnow()
+    due = {"status": "pending", "available_at": {"$lte": now}}
+
+    candidates = await outbox.find(due, {"_id": 1}).sort("available_at", 1).limit(limit).to_list(limit)
+    if not candidates:
+        return []
+
+    lease = str(uuid.uuid4())
+    await outbox.update_many(
+        {**due, "_id": {"$in": [c["_id"] for c in candidates]}},
+        {
+            "$set": {"lease": lease, "available_at": now + timedelta(seconds=OUTBOX_LOCK_SECONDS)},
+            "$inc": {"attempts": 1}
+        }
+    )
+    return await outbox.find({"lease": lease}).to_list(limit)
+
+
+async def _resolve_recipients(db, events: List[Dict]) -> Dict[str, List[str]]:
+    """User ids to notify per event, with one query per audience type for the whole batch"""
+    def ids_for(audience: str, field: str) -> List[str]:
+        return list({e[field] for e in events if audience in e["audiences"] and e.get(field)})
+
+    team_members: Dict[str, List[str]] = {}
+    team_ids = ids_for("team", "team_id")
+    if team_ids:
+        teams = await db.teams.find({"_id": {"$in": team_ids}}, {"student_ids": 1}).to_list(len(team_ids))
+        team_members = {team["_id"]: team.get("student_ids", []) for team in teams}
+
+    office_users: Dict[str, List[str]] = {}
+    office_ids = ids_for("office", "office_id")
+    if office_ids:
+        users = await db.users.find(
+            {"office_id": {"$in": office_ids}, "role": "office", "is_active": True},
+            {"office_id": 1}
+        ).to_list(None)
+        for user in users:
+            office_users.setdefault(user["office_id"], []).append(user["_id"])
+
+    headmasters: Dict[str, str] = {}
+    school_ids = ids_for("headmaster", "school_id")
+    if school_ids:
+        schools = await db.schools.find({"_id": {"$in": school_ids}}, {"headmaster_id": 1}).to_list(len(school_ids))
+        headmasters = {school["_id"]: school["headmaster_id"] for school in schools if school.get("headmaster_id")}
+
+    responders: List[str] = []
+    if any("responders" in e["audiences"] for e in events):
+        users = await db.users.find({"role": "responder", "is_active": True}, {"_id": 1}).to_list(None)
+        responders = [user["_id"] for user in users]
+
+    recipients = {}
+    for event in events:
+        user_ids = []
+        if "team" in event["audiences"]:
+            user_ids += team_members.get(event.get("team_id"), [])
+        if "office" in event["audiences"]:
+            user_ids += office_users.get(event.get("office_id"), [])
+        if "headmaster" in event["audiences"] and event.get("school_id") in headmasters:
+            user_ids.append(headmasters[event["school_id"]])
+        if "responders" in event["audiences"]:
+            user_ids += responders
+        recipients[event["_id"]] = [u for u in dict.fromkeys(user_ids) if u != event.get("actor_id")]
+    return recipients
+
+
+async def process_outbox_batch(limit: int = OUTBOX_CLAIM_BATCH) -> int:
+    """Fan out one batch of due events; returns how many events were claimed"""
+    db = get_database()
+    events = await _claim(db, limit)
+    if not events:
+        return 0
+
+    event_ids = [event["_id"] for event in events]
+    try:
+        recipients = await _resolve_recipients(db, events)
+        # Ids derive from (event, user), so a retried batch never duplicates notifications
+        notifications = [
+            build_notification(
+                f"{event['_id']}:{user_id}",
+                user_id,
+                event["title"],
+                event["message"],
+                event["type"],
+                event["inspection_id"],
+                event["created_at"]
+            )
+            for event in events
+            for user_id in recipients[event["_id"]]
+        ]
+        await insert_notifications(notifications)
+    except Exception as e:
+        logger.warning(f"Notification outbox batch failed: {e!r}")
+        now = datetime.utcnow()
+        await db[OUTBOX_COLLECTION].update_many(
+            {"_id": {"$in": event_ids}, "attempts": {"$gte": OUTBOX_MAX_ATTEMPTS}},
+            {"$set": {"status": "failed", "error": str(e), "processed_at": now}}
+        )
+        await db[OUTBOX_COLLECTION].update_many(
+            {"_id": {"$in": event_ids}, "status": "pending"},
+            {"$set": {"available_at": now + timedelta(seconds=OUTBOX_POLL_SECONDS * 5), "error": str(e)}}
+        )
+        return len(events)
+
+    await db[OUTBOX_COLLECTION].update_many(
+        {"_id": {"$in": event_ids}},
+        {"$set": {"status": "done", "processed_at": datetime.utcnow()}}
+    )
+    return len(events)
+
+
+async def run_outbox_worker() -> None:
+    """Process the outbox until cancelled, draining full batches back to back"""
+    while True:
+        try:
+            claimed = await process_outbox_batch()
+        except Exception as e:
+            logger.warning(f"Notification outbox worker error: {e!r}")
+            claimed = 0
+
+        if claimed >= OUTBOX_CLAIM_BATCH:
+            continue
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,66 @@
+"""
+Notification retention: read notifications are copied to an archive, then expire from the hot collection.
+
+The hot `notifications` collection only keeps unread notifications and those read within
+NOTIFICATION_RETENTION_DAYS (a TTL index on `read_at`, declared in utils.indexes). Copies
+for compliance live in `notifications_archive`, filled by a periodic `$merge`.
+"""
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from utils.database import get_database
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "notifications_archive"
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("NOTIFICATION_ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Each run re-scans this far behind the newest archived read_at, so notifications whose
+# read_at was stamped earlier but committed later (slow requests, clock skew) are not skipped
+ARCHIVE_OVERLAP_SECONDS = float(os.environ.get("NOTIFICATION_ARCHIVE_OVERLAP_SECONDS", "86400"))
+
+
+async def backfill_read_at() -> int:
+    """
+    Give notifications read before `read_at` existed one, so they can expire.
+
+    The backfill time is used rather than the creation time: old notifications would otherwise
+    be past the TTL at once and could be deleted before the archiver has copied them.
+    """
+    db = get_database()
+    result = await db.notifications.update_many(
+        {"is_read": True, "read_at": {"$exists": False}},
+        [{"$set": {"read_at": "$$NOW"}}]
+    )
+    return result.modified_count
+
+
+async def archive_read_notifications() -> None:
+    """
+    Copy notifications read since the last run into the archive, server-side.
+
+    The newest archived `read_at`, less ARCHIVE_OVERLAP_SECONDS, is the watermark; copies
+    are idempotent (existing archive documents are kept), so the overlap is harmless.
+    """
+    db = get_database()
+
+    latest = await db[ARCHIVE_COLLECTION].find_one({}, {"read_at": 1}, sort=[("read_at", -1)])
+    match = {"is_read": True, "read_at": {"$ne": None}}
+    if latest:
+        match["read_at"] = {"$gte": latest["read_at"] - timedelta(seconds=ARCHIVE_OVERLAP_SECONDS)}
+
+    await db.notifications.aggregate([
+        {"$match": match},
+        {"$merge": {"into": ARCHIVE_COLLECTION, "on": "_id", "whenMatched": "keepExisting", "whenNotMatched": "insert"}}
+    ]).to_list(None)
+
+
+async def run_archiver() -> None:
+    """Archive read notifications at startup and then every ARCHIVE_INTERVAL_SECONDS until cancelled"""
+    while True:
+        try:
+            await archive_read_notifications()
+        except Exception as e:
+            logger.warning(f"Notification archiving failed: {e!r}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
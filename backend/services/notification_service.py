@@ -0,0 +1,173 @@
+"""Notification write path shared by every sender, and the per-user unread counters it maintains"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from services.notification_hub import hub
+from utils.database import get_database
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_BATCH_SIZE = 1000
+
+# One document per user: {_id: user_id, unread}
+COUNTERS_COLLECTION = "notification_counters"
+COUNTER_RECONCILE_SECONDS = float(os.environ.get("NOTIFICATION_COUNTER_RECONCILE_SECONDS", "3600"))
+
+
+def build_notification(
+    notification_id: str,
+    user_id: str,
+    title: str,
+    message: str,
+    notification_type: str,
+    related_inspection_id: Optional[str] = None,
+    created_at: Optional[datetime] = None
+) -> Dict:
+    """Notification document in the shape of models.notification.Notification"""
+    return {
+        "_id": notification_id,
+        "user_id": user_id,
+        "title": title,
+        "message": message,
+        "type": notification_type,
+        "related_inspection_id": related_inspection_id,
+        "is_read": False,
+        "created_at": created_at or datetime.utcnow()
+    }
+
+
+async def insert_notifications(notifications: List[Dict]) -> List[Dict]:
+    """
+    Insert notifications with unordered insert_many batches; returns the ones actually inserted.
+
+    Documents whose `_id` already exists are skipped, so senders with deterministic ids
+    can retry a partially written batch without creating duplicates.
+    """
+    db = get_database()
+    inserted = []
+
+    for start in range(0, len(notifications), NOTIFICATION_BATCH_SIZE):
+        batch = notifications[start:start + NOTIFICATION_BATCH_SIZE]
+        try:
+            await db.notifications.insert_many(batch, ordered=False)
+            inserted.extend(batch)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted.extend(doc for index, doc in enumerate(batch) if index not in failed)
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    await adjust_unread_counts(Counter(notification["user_id"] for notification in inserted))
+
+    # Push to connected streams
+    for notification in inserted:
+        hub.publish(notification["user_id"], "notification", notification)
+    await publish_unread_counts({notification["user_id"] for notification in inserted})
+
+    return inserted
+
+
+async def adjust_unread_counts(deltas: Dict[str, int]) -> None:
+    """Apply per-user changes to the unread counters in one bulk write"""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    await get_database()[COUNTERS_COLLECTION].bulk_write(
+        [
+            UpdateOne({"_id": user_id}, {"$inc": {"unread": delta}, "$set": {"updated_at": now}}, upsert=True)
+            for user_id, delta in deltas.items()
+        ],
+        ordered=False
+    )
+
+
+async def get_unread_count(user_id: str) -> int:
+    """Unread notifications of a user, read from their counter document"""
+    db = get_database()
+    counter = await db[COUNTERS_COLLECTION].find_one({"_id": user_id}, {"unread": 1})
+    if counter is None:
+        # First read for this user: seed the counter from the notifications themselves
+        count = await db.notifications.count_documents({"user_id": user_id, "is_read": False})
+        await db[COUNTERS_COLLECTION].update_one(
+            {"_id": user_id},
+            {"$setOnInsert": {"unread": count, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        return count
+    return max(0, counter["unread"])
+
+
+async def reconcile_unread_counters() -> int:
+    """
+    Recompute every unread counter from the notifications collection; returns how many were corrected.
+
+    Counters are only ever adjusted by deltas, so anything that slips past the write path
+    (a crash between two writes, manual edits) is repaired here.
+    """
+    db = get_database()
+    counters = db[COUNTERS_COLLECTION]
+    started_at = datetime.utcnow()
+
+    # Sorting on user_id lets the partial {user_id} index (is_read: False) serve the scan
+    actual = {
+        row["_id"]: row["unread"] for row in await db.notifications.aggregate([
+            {"$match": {"is_read": False}},
+            {"$sort": {"user_id": 1}},
+            {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}}
+        ]).to_list(None)
+    }
+    stored = {
+        counter["_id"]: counter.get("unread", 0)
+        for counter in await counters.find({}, {"unread": 1}).to_list(None)
+    }
+
+    # Counters written since the snapshot was taken are left for the next run
+    untouched = {"$lt": started_at}
+    operations = []
+    for user_id, unread in actual.items():
+        if user_id not in stored:
+            operations.append(UpdateOne(
+                {"_id": user_id},
+                {"$setOnInsert": {"unread": unread, "updated_at": started_at}},
+                upsert=True
+            ))
+        elif stored[user_id] != unread:
+            operations.append(UpdateOne(
+                {"_id": user_id, "updated_at": untouched},
+                {"$set": {"unread": unread, "updated_at": started_at}}
+            ))
+    for user_id, unread in stored.items():
+        if unread and user_id not in actual:
+            operations.append(UpdateOne(
+                {"_id": user_id, "updated_at": untouched},
+                {"$set": {"unread": 0, "updated_at": started_at}}
+            ))
+
+    if operations:
+        await counters.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def run_counter_reconciler() -> None:
+    """Reconcile unread counters at startup and then every COUNTER_RECONCILE_SECONDS until cancelled"""
+    while True:
+        try:
+            corrected = await reconcile_unread_counters()
+            if corrected:
+                logger.info(f"Corrected {corrected} unread notification counters")
+        except Exception as e:
+            logger.warning(f"Unread counter reconciliation failed: {e!r}")
+        await asyncio.sleep(COUNTER_RECONCILE_SECONDS)
+
+
+async def publish_unread_counts(user_ids: Iterable[str]) -> None:
+    """Push the current unread count to users with open streams (no queries for anyone else)"""
+    for user_id in user_ids:
+        if hub.has_subscribers(user_id):
+            hub.publish(user_id, "unread_count", {"unread_count": await get_unread_count(user_id)})
@@ -0,0 +1,165 @@
+"""Content-addressed photo storage in GridFS"""
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+from utils.auth import SECRET_KEY
+from utils.database import get_database
+
+BUCKET_NAME = "photos"
+DEFAULT_CONTENT_TYPE = "image/jpeg"
+
+# Signed photo URLs stay valid for one to two periods (expiry is rounded up so URLs stay cacheable)
+PHOTO_URL_TTL_SECONDS = int(os.environ.get("PHOTO_URL_TTL_SECONDS", "3600"))
+
+# Prefix making photo URLs absolute (e.g. https://api.example.org); relative when unset
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "").rstrip("/")
+
+DATA_URL_PATTERN = re.compile(r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+)?(;[^,]*)?;base64,(?P<data>.*)$", re.DOTALL)
+
+
+def get_bucket(db=None) -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db if db is not None else get_database(), bucket_name=BUCKET_NAME)
+
+
+def photo_url(inspection_id: str, photo_id: str) -> str:
+    """Path of the streaming endpoint serving a photo (unsigned, as stored on reports)"""
+    return f"/api/inspections/{inspection_id}/photos/{photo_id}"
+
+
+def _photo_signature(inspection_id: str, photo_id: str, expires: int) -> str:
+    message = f"{inspection_id}:{photo_id}:{expires}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def signed_photo_url(inspection_id: str, photo_id: str) -> str:
+    """URL of a photo that works without credentials until it expires"""
+    expires = (int(time.time()) // PHOTO_URL_TTL_SECONDS + 2) * PHOTO_URL_TTL_SECONDS
+    signature = _photo_signature(inspection_id, photo_id, expires)
+    return f"{PUBLIC_BASE_URL}{photo_url(inspection_id, photo_id)}?expires={expires}&signature={signature}"
+
+
+def verify_photo_signature(inspection_id: str, photo_id: str, expires: int, signature: str) -> bool:
+    """Whether a signed photo URL is authentic and not yet expired"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_photo_signature(inspection_id, photo_id, expires), signature)
+
+
+def sign_report_photos(inspections: Iterable[Optional[Dict]]) -> None:
+    """Replace the stored photo paths of each report with signed URLs, in place, before returning it"""
+    for inspection in inspections:
+        report = inspection.get("report") if inspection else None
+        if not report or not report.get("photo_ids"):
+            continue
+        signed = {
+            photo_url(inspection["_id"], photo_id): signed_photo_url(inspection["_id"], photo_id)
+            for photo_id in report["photo_ids"]
+        }
+        # Photos that never moved to GridFS (e.g. external links) are returned as stored
+        report["photos"] = [signed.get(photo, photo) for photo in report.get("photos") or []]
+
+
+def decode_photo(photo: str) -> Tuple[bytes, str]:
+    """Bytes and content type of a `data:` URL or bare base64 string; raises ValueError if malformed"""
+    content_type = DEFAULT_CONTENT_TYPE
+    match = DATA_URL_PATTERN.match(photo)
+    if match:
+        content_type = match.group("content_type") or DEFAULT_CONTENT_TYPE
+        photo = match.group("data")
+    try:
+        data = base64.b64decode(photo, validate=True)
+    except binascii.Error:
+        raise ValueError("Photo is not valid base64")
+    if not data:
+        raise ValueError("Photo is empty")
+    return data, content_type
+
+
+async def store_photo(data: bytes, content_type: str, uploaded_by: Optional[str] = None) -> str:
+    """Store photo bytes under their sha256 digest, returning the photo id (identical uploads are stored once)"""
+    db = get_database()
+    photo_id = hashlib.sha256(data).hexdigest()
+
+    if await db[f"{BUCKET_NAME}.files"].find_one({"_id": photo_id}, {"_id": 1}):
+        return photo_id
+
+    try:
+        await get_bucket(db).upload_from_stream_with_id(
+            photo_id,
+            photo_id,
+            data,
+            metadata={"content_type": content_type, "uploaded_by": uploaded_by}
+        )
+    except DuplicateKeyError:
+        # Same content uploaded concurrently; the other writer's copy is identical
+        pass
+
+    return photo_id
+
+
+async def store_photos(photos: List[str], uploaded_by: Optional[str] = None) -> List[str]:
+    """Decode and store submitted photos, returning their ids in order"""
+    decoded = [decode_photo(photo) for photo in photos]
+    return [await store_photo(data, content_type, uploaded_by) for data, content_type in decoded]
+
+
+async def iter_photo(grid_out, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes `start`..`end` (inclusive) of an open GridFS file one chunk at a time"""
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+
+
+async def migrate_embedded_photos(batch_size: int = 50) -> int:
+    """
+    Move base64 photos still embedded in inspection reports into GridFS.
+
+    Idempotent: migrated reports carry `photo_ids`, and only reports without it are read.
+    Batches are small because each document still holds its embedded images.
+    """
+    db = get_database()
+    query = {"report.photos.0": {"$exists": True}, "report.photo_ids": {"$exists": False}}
+
+    migrated = 0
+    while True:
+        batch = await db.inspections.find(
+            query,
+            {"report.photos": 1, "report.submitted_by": 1}
+        ).limit(batch_size).to_list(batch_size)
+
+        if not batch:
+            break
+
+        for inspection in batch:
+            photos, photo_ids = [], []
+            for photo in inspection["report"]["photos"]:
+                try:
+                    data, content_type = decode_photo(photo)
+                except ValueError:
+                    # Not an embedded image (e.g. an external link); keep it as is
+                    photos.append(photo)
+                    continue
+                photo_id = await store_photo(data, content_type, inspection["report"].get("submitted_by"))
+                photo_ids.append(photo_id)
+                photos.append(photo_url(inspection["_id"], photo_id))
+
+            await db.inspections.update_one(
+                {"_id": inspection["_id"]},
+                {"$set": {"report.photo_ids": photo_ids, "report.photos": photos}}
+            )
+            migrated += 1
+
+    return migrated
@@ -0,0 +1,381 @@
+"""Daily inspection rollups, maintained with $inc on every inspection write"""
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import ReturnDocument, UpdateOne
+from utils.cache import inspections_version
+from utils.database import get_database
+from utils.indexes import INDEXES
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "inspection_daily_rollups"
+
+# Bump when the counters change so startup rebuilds rollups written under an older version
+ROLLUP_VERSION = 2
+
+# Rollups are rebuilt from the inspections this often, repairing any drift of the $inc counters
+ROLLUP_RECONCILE_SECONDS = float(os.environ.get("ROLLUP_RECONCILE_SECONDS", "21600"))
+
+# Response within this many days counts as on time
+ON_TIME_DAYS = 7
+
+# Upper bound (inclusive) in days and label of each response time bucket
+RESPONSE_TIME_BUCKETS = [(3, "0-3 days"), (7, "4-7 days"), (14, "8-14 days"), (None, "15+ days")]
+
+# Statuses counted as completed in trend figures
+COMPLETED_STATUSES = ["submitted", "responded", "reviewed", "closed"]
+
+
+class ConcurrentModificationError(Exception):
+    """An inspection changed between being read and being written"""
+
+
+def _day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _response_bucket(days: int) -> str:
+    for upper, label in RESPONSE_TIME_BUCKETS:
+        if upper is None or days <= upper:
+            return label
+
+
+def rollup_key(inspection: Dict, office: Optional[Dict]) -> Dict:
+    """Dimensions of the rollup document an inspection counts towards"""
+    return {
+        "day": _day(inspection["assigned_date"]),
+        "office_id": inspection.get("office_id"),
+        "school_id": inspection.get("school_id"),
+        "district": office.get("district") if office else None,
+        "office_type": office.get("type", "other") if office else None
+    }
+
+
+def rollup_id(key: Dict) -> str:
+    return f"{key['day'].strftime('%Y-%m-%d')}:{key['office_id']}:{key['school_id']}"
+
+
+def rollup_counters(inspection: Dict) -> Dict[str, float]:
+    """Counters a single inspection contributes to its rollup document"""
+    counters = {"total": 1, f"status.{inspection['status']}": 1}
+
+    if inspection.get("avg_rating") is not None:
+        counters["rating_sum"] = inspection["avg_rating"]
+        counters["rating_count"] = 1
+
+    report = inspection.get("report") or {}
+    for field, name in [
+        ("cleanliness_rating", "cleanliness"),
+        ("staff_behavior_rating", "behavior"),
+        ("service_quality_rating", "service")
+    ]:
+        if report.get(field):
+            counters[f"{name}_sum"] = report[field]
+            counters[f"{name}_count"] = 1
+
+    if inspection.get("office_response"):
+        counters["responded"] = 1
+        # Office type compliance only counts responses to submitted reports
+        if inspection.get("report"):
+            counters["report_responded"] = 1
+
+    response_time = inspection.get("response_time_days")
+    if response_time is not None:
+        counters["response_time_sum"] = response_time
+        counters["response_time_count"] = 1
+        counters[f"response_buckets.{_response_bucket(response_time)}"] = 1
+        if response_time <= ON_TIME_DAYS:
+            counters["on_time"] = 1
+
+    for category in inspection.get("issue_categories") or []:
+        counters[f"issues.{category}"] = 1
+
+    return counters
+
+
+def _contribution(inspection: Optional[Dict], office: Optional[Dict]) -> Optional[Tuple[Dict, Dict]]:
+    if not inspection or not inspection.get("assigned_date"):
+        return None
+    return rollup_key(inspection, office), rollup_counters(inspection)
+
+
+def _upsert(key: Dict, inc: Dict) -> UpdateOne:
+    return UpdateOne({"_id": rollup_id(key)}, {"$inc": inc, "$setOnInsert": {**key, "version": ROLLUP_VERSION}}, upsert=True)
+
+
+async def apply_transition(before: Optional[Dict], after: Optional[Dict]) -> None:
+    """
+    Move an inspection's contribution from its previous state to its new one.
+
+    `before` is None for inserts and `after` is None for deletes. Only counters that
+    actually changed are incremented, and a change of office/school/day moves the
+    whole contribution to the new rollup document.
+    """
+    db = get_database()
+
+    office_ids = {i["office_id"] for i in (before, after) if i and i.get("office_id")}
+    offices = {}
+    if office_ids:
+        docs = await db.offices.find({"_id": {"$in": list(office_ids)}}, {"district": 1, "type": 1}).to_list(len(office_ids))
+        offices = {o["_id"]: o for o in docs}
+
+    old = _contribution(before, offices.get(before.get("office_id")) if before else None)
+    new = _contribution(after, offices.get(after.get("office_id")) if after else None)
+
+    operations = []
+    if old and new and rollup_id(old[0]) == rollup_id(new[0]):
+        inc = {k: new[1].get(k, 0) - old[1].get(k, 0) for k in set(old[1]) | set(new[1])}
+        inc = {k: v for k, v in inc.items() if v}
+        if inc:
+            operations.append(_upsert(new[0], inc))
+    else:
+        if old:
+            operations.append(_upsert(old[0], {k: -v for k, v in old[1].items()}))
+        if new:
+            operations.append(_upsert(new[0], new[1]))
+
+    if operations:
+        await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+    # After both writes, so a recomputation never caches the previous state under the new version
+    inspections_version.bump()
+
+
+async def apply_inserts(inspections: List[Dict], offices: Dict[str, Dict]) -> None:
+    """Add the contributions of newly inserted inspections, merged per rollup document into one bulk write"""
+    db = get_database()
+
+    keys: Dict[str, Dict] = {}
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for inspection in inspections:
+        contribution = _contribution(inspection, offices.get(inspection.get("office_id")))
+        if not contribution:
+            continue
+        key, counters = contribution
+        doc_id = rollup_id(key)
+        keys[doc_id] = key
+        for name, value in counters.items():
+            totals[doc_id][name] += value
+
+    if keys:
+        await db[ROLLUP_COLLECTION].bulk_write(
+            [_upsert(key, dict(totals[doc_id])) for doc_id, key in keys.items()],
+            ordered=False
+        )
+
+    inspections_version.bump()
+
+
+async def update_inspection_with_rollup(before: Dict, update: Dict) -> Dict:
+    """
+    Apply `update` to an inspection read as `before` and move its rollup contribution.
+
+    The write only matches while the stored `revision` is still the one read with `before`,
+    so the replaced document is exactly `before` and concurrent transitions of the same
+    inspection cannot both apply their delta. The losing write raises ConcurrentModificationError.
+    """
+    db = get_database()
+    update = dict(update)
+    update["$inc"] = {**update.get("$inc", {}), "revision": 1}
+    after = await db.inspections.find_one_and_update(
+        {"_id": before["_id"], "revision": before.get("revision")},
+        update,
+        return_document=ReturnDocument.AFTER
+    )
+    if after is None:
+        raise ConcurrentModificationError(before["_id"])
+    await apply_transition(before, after)
+    return after
+
+
+async def delete_inspection_with_rollup(inspection_id: str) -> Optional[Dict]:
+    """Delete an inspection and remove its rollup contribution; returns the deleted document, if any"""
+    deleted = await get_database().inspections.find_one_and_delete({"_id": inspection_id})
+    if deleted:
+        await apply_transition(deleted, None)
+    return deleted
+
+
+async def update_office_rollups(office_id: str, office: Dict) -> None:
+    """Re-key the rollups of an office after its district or type changed"""
+    await get_database()[ROLLUP_COLLECTION].update_many(
+        {"office_id": office_id},
+        {"$set": {"district": office.get("district"), "office_type": office.get("type", "other")}}
+    )
+    inspections_version.bump()
+
+
+async def rebuild_rollups(batch_size: int = 1000) -> int:
+    """
+    Recompute every rollup document from the inspections collection.
+
+    Uses the same contribution logic as the write path, so it also repairs drift
+    (e.g. after derived fields are recomputed). Returns the number of rollup documents.
+    """
+    db = get_database()
+
+    offices = {o["_id"]: o for o in await db.offices.find({}, {"district": 1, "type": 1}).to_list(None)}
+
+    rollups: Dict[str, Dict] = {}
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    cursor = db.inspections.find(
+        {},
+        {
+            "assigned_date": 1, "office_id": 1, "school_id": 1, "status": 1, "avg_rating": 1,
+            "response_time_days": 1, "issue_categories": 1, "office_response": 1,
+            "report.cleanliness_rating": 1, "report.staff_behavior_rating": 1, "report.service_quality_rating": 1
+        }
+    ).batch_size(batch_size)
+
+    async for inspection in cursor:
+        contribution = _contribution(inspection, offices.get(inspection.get("office_id")))
+        if not contribution:
+            continue
+        key, counters = contribution
+        doc_id = rollup_id(key)
+        rollups[doc_id] = key
+        for name, value in counters.items():
+            totals[doc_id][name] += value
+
+    # Build into a scratch collection and swap it in, so readers never see a partial rebuild
+    scratch = db[f"{ROLLUP_COLLECTION}_rebuild"]
+    await scratch.drop()
+    await scratch.create_indexes(INDEXES[ROLLUP_COLLECTION])
+
+    operations = []
+    for doc_id, key in rollups.items():
+        doc = {"_id": doc_id, **key, "version": ROLLUP_VERSION}
+        for name, value in totals[doc_id].items():
+            # Expand dotted counter names into nested documents
+            target = doc
+            *parents, leaf = name.split(".")
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = int(value) if name != "rating_sum" else value
+        operations.append(doc)
+
+        if len(operations) >= batch_size:
+            await scratch.insert_many(operations, ordered=False)
+            operations = []
+
+    if operations:
+        await scratch.insert_many(operations, ordered=False)
+
+    if rollups:
+        await scratch.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        await db[ROLLUP_COLLECTION].delete_many({})
+
+    return len(rollups)
+
+
+async def ensure_rollups(force: bool = False) -> Optional[int]:
+    """Build rollups if never built, built under an older version, or when forced; returns the rebuilt count or None"""
+    db = get_database()
+    if not force:
+        has_rollups = await db[ROLLUP_COLLECTION].find_one({}, {"_id": 1})
+        outdated = await db[ROLLUP_COLLECTION].find_one({"version": {"$ne": ROLLUP_VERSION}}, {"_id": 1})
+        has_inspections = await db.inspections.find_one({}, {"_id": 1})
+        if (has_rollups and not outdated) or not has_inspections:
+            return None
+    return await rebuild_rollups()
+
+
+async def run_rollup_reconciler() -> None:
+    """Rebuild rollups every ROLLUP_RECONCILE_SECONDS until cancelled (the startup build happens in the lifespan)"""
+    while True:
+        await asyncio.sleep(ROLLUP_RECONCILE_SECONDS)
+        try:
+            # Writes made while the rebuild scanned may be missing from it; rebuild again if any happened
+            for _ in range(3):
+                version = inspections_version.value
+                await rebuild_rollups()
+                if inspections_version.value == version:
+                    break
+            inspections_version.bump()
+        except Exception as e:
+            logger.warning(f"Rollup reconciliation failed: {e!r}")
+
+
+def _sum_map(field: str) -> List[Dict]:
+    """Stages totalling a map of counters (e.g. `status`) across rollup documents"""
+    return [
+        {"$project": {"kv": {"$objectToArray": {"$ifNull": [f"${field}", {}]}}}},
+        {"$unwind": "$kv"},
+        {"$group": {"_id": "$kv.k", "count": {"$sum": "$kv.v"}}}
+    ]
+
+
+def _sum_counters(*names: str) -> Dict:
+    return {name: {"$sum": f"${name}"} for name in names}
+
+
+async def get_daily_series(match: Dict) -> List[Dict]:
+    """Per-day totals for rollups matching `match`, oldest first"""
+    db = get_database()
+    pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": "$day",
+                "total": {"$sum": "$total"},
+                "completed": {"$sum": {"$add": [{"$ifNull": [f"$status.{s}", 0]} for s in COMPLETED_STATUSES]}},
+                **_sum_counters("rating_sum", "rating_count")
+            }
+        },
+        {"$sort": {"_id": 1}}
+    ]
+    rows = await db[ROLLUP_COLLECTION].aggregate(pipeline).to_list(None)
+    return [{"date": row.pop("_id").strftime("%Y-%m-%d"), **row} for row in rows]
+
+
+async def get_rollup_totals(match: Dict) -> Dict:
+    """Counters summed over rollups matching `match`, plus breakdowns by status, bucket, issue, office type and district"""
+    db = get_database()
+    scalar_counters = (
+        "total", "responded", "on_time", "rating_sum", "rating_count",
+        "response_time_sum", "response_time_count",
+        "cleanliness_sum", "cleanliness_count", "behavior_sum", "behavior_count",
+        "service_sum", "service_count"
+    )
+    pipeline = [
+        {"$match": match},
+        {
+            "$facet": {
+                "totals": [{"$group": {"_id": None, **_sum_counters(*scalar_counters)}}],
+                "status": _sum_map("status"),
+                "response_buckets": _sum_map("response_buckets"),
+                "issues": _sum_map("issues"),
+                "by_office_type": [
+                    {"$match": {"office_type": {"$ne": None}}},
+                    {"$group": {"_id": "$office_type", **_sum_counters("total", "responded", "report_responded", "on_time")}}
+                ],
+                "by_district": [
+                    {"$match": {"district": {"$nin": [None, ""]}}},
+                    {
+                        "$group": {
+                            "_id": "$district",
+                            "closed": {"$sum": {"$ifNull": ["$status.closed", 0]}},
+                            **_sum_counters("total", "responded", "rating_sum", "rating_count")
+                        }
+                    }
+                ]
+            }
+        }
+    ]
+    result = (await db[ROLLUP_COLLECTION].aggregate(pipeline).to_list(1))[0]
+
+    totals = result["totals"][0] if result["totals"] else {}
+    totals.pop("_id", None)
+    return {
+        "totals": {name: totals.get(name, 0) for name in scalar_counters},
+        "status": {row["_id"]: row["count"] for row in result["status"]},
+        "response_buckets": {row["_id"]: row["count"] for row in result["response_buckets"]},
+        "issues": {row["_id"]: row["count"] for row in result["issues"]},
+        "by_office_type": result["by_office_type"],
+        "by_district": result["by_district"]
+    }
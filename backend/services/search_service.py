@@ -0,0 +1,188 @@
+"""
+Indexed search over stored `search_terms` arrays.
+
+Every searchable document stores the normalized prefixes of the words it can be found by
+(plus each whole word, marked), under a multikey index. A search matches documents holding
+a term for every query word with `$all`, so it is served by the index instead of scanning
+with an unanchored regex. Terms are written with the document and refreshed when a field
+they copy changes; `backfill_search_terms` fills in documents written before they existed.
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+from utils.database import get_database
+
+# Bump when term generation changes so the backfill recomputes existing documents
+SEARCH_VERSION = 1
+
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 15
+
+# Whole words are also stored with this marker, to rank exact word matches first
+EXACT_MARKER = "="
+
+# Fields each collection is searchable by; inspections also take their office and school names
+SEARCH_FIELDS = {
+    "offices": ("name", "contact_person", "district"),
+    "schools": ("name", "district", "state"),
+    "templates": ("name",),
+    "inspections": ("_id", "task_name")
+}
+
+# Excludes the stored search fields from documents returned to clients
+SEARCH_PROJECTION = {"search_terms": 0, "search_version": 0}
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased words of `text` with accents removed, each cut to MAX_PREFIX_LENGTH"""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [word[:MAX_PREFIX_LENGTH] for word in _WORD.findall(text)]
+
+
+def build_search_terms(*values: Optional[str]) -> List[str]:
+    """Prefix terms (and marked whole words) for every word of `values`"""
+    terms = set()
+    for value in values:
+        for word in tokenize(value):
+            terms.add(word)
+            terms.add(EXACT_MARKER + word)
+            terms.update(word[:length] for length in range(MIN_PREFIX_LENGTH, len(word)))
+    return sorted(terms)
+
+
+def entity_search_fields(collection: str, doc: Dict) -> Dict:
+    """Fields to store on an office, school or template document whenever its searchable fields change"""
+    return {
+        "search_terms": build_search_terms(*(doc.get(field) for field in SEARCH_FIELDS[collection])),
+        "search_version": SEARCH_VERSION
+    }
+
+
+def search_filter(search: Optional[str]) -> Optional[Dict]:
+    """
+    Match documents containing every word of `search` as a word prefix, or None for an empty search.
+
+    Query words shorter than MIN_PREFIX_LENGTH only match whole words.
+    """
+    words = list(dict.fromkeys(tokenize(search)))
+    if not words:
+        return None
+    return {"search_terms": {"$all": words}}
+
+
+def relevance_expr(search: Optional[str], tie_breaker: str = "$assigned_date") -> Dict:
+    """
+    Sort key ranking matches by how many query words they contain whole, newest first within a rank.
+
+    The rank and the `tie_breaker` date are folded into one number (rank * 1e13 + epoch millis),
+    so results page with a plain (sort key, _id) cursor.
+    """
+    exact = [EXACT_MARKER + word for word in dict.fromkeys(tokenize(search))]
+    rank = {"$size": {"$setIntersection": [{"$ifNull": ["$search_terms", []]}, exact]}}
+    return {"$add": [
+        {"$multiply": [rank, 10 ** 13]},
+        {"$toLong": {"$ifNull": [tie_breaker, {"$toDate": 0}]}}
+    ]}
+
+
+async def compute_inspection_search_terms(inspections: Iterable[Dict]) -> Dict[str, List[str]]:
+    """Search terms per inspection id, loading the office and school names with one query each"""
+    db = get_database()
+    inspections = list(inspections)
+
+    office_ids = list({i.get("office_id") for i in inspections if i.get("office_id")})
+    school_ids = list({i.get("school_id") for i in inspections if i.get("school_id")})
+    office_names = {
+        office["_id"]: office.get("name")
+        for office in await db.offices.find({"_id": {"$in": office_ids}}, {"name": 1}).to_list(len(office_ids))
+    }
+    school_names = {
+        school["_id"]: school.get("name")
+        for school in await db.schools.find({"_id": {"$in": school_ids}}, {"name": 1}).to_list(len(school_ids))
+    }
+
+    return {
+        inspection["_id"]: build_search_terms(
+            *(inspection.get(field) for field in SEARCH_FIELDS["inspections"]),
+            office_names.get(inspection.get("office_id")),
+            school_names.get(inspection.get("school_id"))
+        )
+        for inspection in inspections
+    }
+
+
+async def inspection_search_fields(inspection: Dict) -> Dict:
+    """Fields to store on an inspection whenever its task name, office or school changes"""
+    terms = await compute_inspection_search_terms([inspection])
+    return {"search_terms": terms[inspection["_id"]], "search_version": SEARCH_VERSION}
+
+
+async def _write_inspection_terms(inspections: List[Dict]) -> None:
+    terms = await compute_inspection_search_terms(inspections)
+    await get_database().inspections.bulk_write(
+        [
+            UpdateOne({"_id": inspection_id}, {"$set": {"search_terms": t, "search_version": SEARCH_VERSION}})
+            for inspection_id, t in terms.items()
+        ],
+        ordered=False
+    )
+
+
+async def refresh_inspection_search_terms(query: Dict, batch_size: int = 500) -> int:
+    """Recompute the terms of inspections matching `query` (after an office or school rename)"""
+    db = get_database()
+    projection = {"task_name": 1, "office_id": 1, "school_id": 1}
+
+    refreshed = 0
+    batch = []
+    async for inspection in db.inspections.find(query, projection):
+        batch.append(inspection)
+        if len(batch) >= batch_size:
+            await _write_inspection_terms(batch)
+            refreshed += len(batch)
+            batch = []
+    if batch:
+        await _write_inspection_terms(batch)
+        refreshed += len(batch)
+
+    return refreshed
+
+
+async def backfill_search_terms(batch_size: int = 500) -> int:
+    """
+    Compute search terms for documents written before they existed (or under an older version).
+
+    Idempotent: only documents whose `search_version` differs from the current one are touched.
+    """
+    db = get_database()
+    stale = {"search_version": {"$ne": SEARCH_VERSION}}
+
+    updated = 0
+    for collection in ("offices", "schools", "templates"):
+        projection = {field: 1 for field in SEARCH_FIELDS[collection]}
+        while True:
+            batch = await db[collection].find(stale, projection).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            await db[collection].bulk_write(
+                [UpdateOne({"_id": doc["_id"]}, {"$set": entity_search_fields(collection, doc)}) for doc in batch],
+                ordered=False
+            )
+            updated += len(batch)
+
+    while True:
+        batch = await db.inspections.find(
+            stale, {"task_name": 1, "office_id": 1, "school_id": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        await _write_inspection_terms(batch)
+        updated += len(batch)
+
+    return updated
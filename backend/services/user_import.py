@@ -0,0 +1,218 @@
+"""Bulk user import from CSV, run as a background job with progress stored in `import_jobs`"""
+import asyncio
+import csv
+import io
+import multiprocessing
+import os
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from utils.auth import hash_passwords
+from utils.database import get_database
+
+IMPORT_JOBS_COLLECTION = "import_jobs"
+IMPORT_BATCH_SIZE = 1000
+
+# Hashing processes per import job; separate from the request-path hashing pool so imports never starve logins
+IMPORT_HASH_WORKERS = int(os.environ.get("IMPORT_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+VALID_ROLES = ["admin", "headmaster", "student", "office", "responder"]
+REQUIRED_FIELDS = ["email", "name", "password", "role"]
+
+# Errors and created users kept on the job document for display
+MAX_STORED_ERRORS = 100
+MAX_PREVIEW_USERS = 10
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def create_import_job(filename: str, created_by: str) -> Dict:
+    """Record a queued import job and return it"""
+    db = get_database()
+    job = {
+        "_id": str(uuid.uuid4()),
+        "type": "users",
+        "filename": filename,
+        "status": "queued",
+        "processed_rows": 0,
+        "created_count": 0,
+        "error_count": 0,
+        "errors": [],
+        "created_users": [],
+        "created_by": created_by,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "finished_at": None
+    }
+    await db[IMPORT_JOBS_COLLECTION].insert_one(job)
+    return job
+
+
+async def fail_interrupted_import_jobs() -> int:
+    """Mark jobs left queued/running by a previous process as failed; returns how many"""
+    db = get_database()
+    result = await db[IMPORT_JOBS_COLLECTION].update_many(
+        {"status": {"$in": ["queued", "running"]}},
+        {"$set": {"status": "failed", "failure": "Interrupted by a server restart", "finished_at": datetime.utcnow()}}
+    )
+    return result.modified_count
+
+
+def _row_batches(upload: BinaryIO, batch_size: int) -> Iterator[List[tuple]]:
+    """(row number, row) batches parsed lazily from the uploaded file"""
+    reader = csv.DictReader(io.TextIOWrapper(upload, encoding="utf-8", newline=""))
+    batch = []
+    for idx, row in enumerate(reader, start=2):  # Start at 2 (header is row 1)
+        batch.append((idx, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _validate(row: Dict) -> str:
+    missing_fields = [field for field in REQUIRED_FIELDS if not row.get(field)]
+    if missing_fields:
+        return f"Missing required fields: {', '.join(missing_fields)}"
+    if row["role"] not in VALID_ROLES:
+        return f"Invalid role: {row['role']}"
+    return ""
+
+
+async def _hash_batch(executor: ProcessPoolExecutor, passwords: List[str]) -> List[str]:
+    """Hash passwords in parallel, one slice per worker process"""
+    loop = asyncio.get_running_loop()
+    size = -(-len(passwords) // IMPORT_HASH_WORKERS)  # ceil
+    slices = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    hashed = await asyncio.gather(*[loop.run_in_executor(executor, hash_passwords, s) for s in slices])
+    return [h for part in hashed for h in part]
+
+
+async def _import_batch(db, executor: ProcessPoolExecutor, batch: List[tuple], seen_emails: set, school_counts: Counter) -> Dict:
+    errors = []
+    candidates = []
+
+    for idx, row in batch:
+        error = _validate(row)
+        if error:
+            errors.append({"row": idx, "email": row.get("email") or "N/A", "error": error})
+        elif row["email"] in seen_emails:
+            errors.append({"row": idx, "email": row["email"], "error": "Email appears more than once in the file"})
+        else:
+            seen_emails.add(row["email"])
+            candidates.append((idx, row))
+
+    # One $in query per batch instead of a find_one per row
+    emails = [row["email"] for _, row in candidates]
+    existing = {
+        user["email"] for user in
+        await db.users.find({"email": {"$in": emails}}, {"email": 1}).to_list(len(emails))
+    } if emails else set()
+
+    new_rows = []
+    for idx, row in candidates:
+        if row["email"] in existing:
+            errors.append({"row": idx, "email": row["email"], "error": "Email already registered"})
+        else:
+            new_rows.append((idx, row))
+
+    hashes = await _hash_batch(executor, [row["password"] for _, row in new_rows]) if new_rows else []
+
+    now = datetime.utcnow()
+    docs = [
+        {
+            "_id": str(uuid.uuid4()),
+            "email": row["email"],
+            "name": row["name"],
+            "password": password_hash,
+            "role": row["role"],
+            "phone": row.get("phone"),
+            "school_id": row.get("school_id") if row.get("school_id") else None,
+            "office_id": None,
+            "team_id": None,
+            "grade": row.get("grade") if row.get("grade") else None,
+            "is_active": True,
+            "created_at": now,
+            "profile_image": None
+        }
+        for (_, row), password_hash in zip(new_rows, hashes)
+    ]
+
+    failed = {}
+    if docs:
+        try:
+            await db.users.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                failed[write_error["index"]] = (
+                    "Email already registered" if write_error.get("code") == DUPLICATE_KEY_ERROR
+                    else write_error.get("errmsg", "Insert failed")
+                )
+
+    created = []
+    for position, doc in enumerate(docs):
+        if position in failed:
+            errors.append({"row": new_rows[position][0], "email": doc["email"], "error": failed[position]})
+            continue
+        created.append({"email": doc["email"], "name": doc["name"], "role": doc["role"]})
+        if doc["role"] == "student" and doc["school_id"]:
+            school_counts[doc["school_id"]] += 1
+
+    errors.sort(key=lambda e: e["row"])
+    return {"created": created, "errors": errors}
+
+
+async def run_import_job(job_id: str, upload: BinaryIO, batch_size: int = IMPORT_BATCH_SIZE) -> None:
+    """
+    Import users from an uploaded CSV, recording progress on the job after every batch.
+
+    Rows are parsed lazily, existing emails are prefetched per batch, passwords are hashed
+    in a process pool and users are written with unordered insert_many. School student
+    counts are applied once at the end as a single bulk write. Closes `upload` when done.
+    """
+    db = get_database()
+    jobs = db[IMPORT_JOBS_COLLECTION]
+    await jobs.update_one({"_id": job_id}, {"$set": {"status": "running", "started_at": datetime.utcnow()}})
+
+    seen_emails: set = set()
+    school_counts: Counter = Counter()
+    # Spawned rather than forked, so workers never inherit the event loop, Mongo client or their threads
+    executor = ProcessPoolExecutor(max_workers=IMPORT_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+    status = {"status": "completed"}
+    try:
+        for batch in _row_batches(upload, batch_size):
+            result = await _import_batch(db, executor, batch, seen_emails, school_counts)
+            await jobs.update_one(
+                {"_id": job_id},
+                {
+                    "$inc": {
+                        "processed_rows": len(batch),
+                        "created_count": len(result["created"]),
+                        "error_count": len(result["errors"])
+                    },
+                    "$push": {
+                        "errors": {"$each": result["errors"], "$slice": MAX_STORED_ERRORS},
+                        "created_users": {"$each": result["created"], "$slice": MAX_PREVIEW_USERS}
+                    }
+                }
+            )
+    except Exception as e:
+        status = {"status": "failed", "failure": str(e)}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        upload.close()
+
+    # Update school student counts in one round trip (including students inserted before a failure)
+    if school_counts:
+        await db.schools.bulk_write(
+            [UpdateOne({"_id": school_id}, {"$inc": {"student_count": count}}) for school_id, count in school_counts.items()],
+            ordered=False
+        )
+
+    await jobs.update_one({"_id": job_id}, {"$set": {**status, "finished_at": datetime.utcnow()}})
@@ -1,7 +1,11 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import asyncio
 import os
+import threading
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
@@ -15,6 +19,85 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def hash_passwords(passwords: list) -> list:
+    """Hash a batch of passwords (a picklable entry point for process pools)"""
+    return [pwd_context.hash(password) for password in passwords]
+
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+class HashPoolStats:
+    """Queue depth and timing counters of the password hashing pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def submitted(self):
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def started(self, waited: float):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds += waited
+
+    def finished(self, ran: float):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+            self.run_seconds += ran
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": PASSWORD_HASH_WORKERS,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "max_queued": self.max_queued,
+                "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 1) if self.completed else 0,
+                "avg_run_ms": round(self.run_seconds / self.completed * 1000, 1) if self.completed else 0
+            }
+
+
+hash_pool_stats = HashPoolStats()
+
+
+async def _run_in_hash_pool(fn, *args):
+    submitted_at = time.perf_counter()
+
+    def job():
+        started_at = time.perf_counter()
+        hash_pool_stats.started(started_at - submitted_at)
+        try:
+            return fn(*args)
+        finally:
+            hash_pool_stats.finished(time.perf_counter() - started_at)
+
+    hash_pool_stats.submitted()
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, job)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool, without blocking the event loop"""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool, without blocking the event loop"""
+    return await _run_in_hash_pool(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
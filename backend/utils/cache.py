@@ -0,0 +1,182 @@
+"""In-process caches: TTL with stale-while-revalidate for aggregates, and a bounded LRU for documents"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class DataVersion:
+    """Counter bumped whenever the data behind a family of cached results changes"""
+
+    def __init__(self):
+        self.value = 0
+
+    def bump(self) -> None:
+        self.value += 1
+
+
+# Bumped on every inspection write (see rollup_service.apply_transition)
+inspections_version = DataVersion()
+
+
+class _Entry:
+    __slots__ = ("value", "version", "stored_at")
+
+    def __init__(self, value: Any, version: int, stored_at: float):
+        self.value = value
+        self.version = version
+        self.stored_at = stored_at
+
+
+class TTLCache:
+    """
+    Caches the results of async computations per key.
+
+    An entry is fresh while younger than `ttl` and its version still matches. A stale entry
+    (expired, or its version has been bumped) is served for up to `stale_ttl` more seconds
+    while a single background refresh recomputes it; past that, callers wait for the
+    recomputation. Concurrent misses for the same key share one computation, so any number
+    of pollers costs one computation per change.
+
+    The cache is per process: with several workers, each keeps its own copy and sees only
+    its own version bumps, so `ttl` bounds how stale another worker's writes can look.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, version: Optional[DataVersion] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.version = version
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+
+    def _current_version(self) -> int:
+        return self.version.value if self.version else 0
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for `key`, computing it with `compute()` when missing or too stale"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.stored_at
+            if age < self.ttl and entry.version == self._current_version():
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background(key, compute)
+                return entry.value
+
+        return await asyncio.shield(self._start(key, compute))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry when no key is given"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _start(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+        return task
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        # Read the version first, so a bump during the computation leaves the entry stale
+        version = self._current_version()
+        try:
+            value = await compute()
+            self._entries[key] = _Entry(value, version, time.monotonic())
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._inflight:
+            return
+        task = self._start(key, compute)
+        self._refreshes.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # Keep serving the stale value; the next request past the stale window retries
+            logger.warning(f"Background cache refresh failed: {task.exception()!r}")
+
+
+class LRUCache:
+    """
+    Bounded mapping with per-entry TTL, evicting the least recently used entry when full.
+
+    Writers call `invalidate` after changing the underlying data. A reader that fetched a
+    value before such an invalidation passes the `epoch()` it read before fetching to `put`,
+    which then skips storing it, so a slow read can never resurrect an invalidated entry.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.stored_at >= self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def epoch(self) -> int:
+        return self._epoch
+
+    def put(self, key: Hashable, value: Any, epoch: Optional[int] = None) -> None:
+        if self.max_size < 1 or (epoch is not None and epoch != self._epoch):
+            return
+        self._entries[key] = _Entry(value, epoch or 0, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        self._epoch += 1
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+# Dashboard aggregates: fresh for DASHBOARD_CACHE_TTL seconds, then served stale while refreshing
+dashboard_cache = TTLCache(
+    ttl=float(os.environ.get("DASHBOARD_CACHE_TTL", "30")),
+    stale_ttl=float(os.environ.get("DASHBOARD_CACHE_STALE_TTL", "300")),
+    version=inspections_version
+)
@@ -1,10 +1,55 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+"""Application-wide MongoDB client and the lifecycle of its connection pool"""
+import asyncio
+import logging
 import os
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db_name = os.environ.get('DB_NAME', 'student_governance')
-db = client[db_name]
+logger = logging.getLogger(__name__)
 
-def get_database():
-    return db
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def _client_options() -> dict:
+    """Pool settings read from the environment"""
+    options = {
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", 100)),
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", 0)),
+    }
+    wait_queue_timeout = os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+    if wait_queue_timeout:
+        options["waitQueueTimeoutMS"] = int(wait_queue_timeout)
+    compressors = os.environ.get("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """The shared client, created on first use so scripts work without the app lifespan"""
+    global _client
+    if _client is None:
+        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+        _client = AsyncIOMotorClient(mongo_url, **_client_options())
+    return _client
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    """Application database; also usable as a FastAPI dependency"""
+    return get_client()[os.environ.get('DB_NAME', 'student_governance')]
+
+
+async def connect_to_mongo():
+    """Create the client and open `minPoolSize` connections before serving traffic"""
+    client = get_client()
+    warm_connections = max(1, client.options.pool_options.min_pool_size)
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(warm_connections)))
+    logger.info(f"Connected to MongoDB with {warm_connections} warm connection(s)")
+
+
+def close_mongo_connection():
+    """Close the client, draining its pool"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
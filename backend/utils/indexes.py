@@ -0,0 +1,172 @@
+"""Declarative index registry, reconciled against the database at startup"""
+import logging
+import os
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Index options that must match for an existing index to count as the declared one
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+# Read notifications are deleted from the hot collection this many days after being read
+# (they are copied to notifications_archive first; see services.notification_retention)
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "90"))
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    # List endpoints page by keyset on (sort key, _id), so sort indexes end with _id
+    "inspections": [
+        IndexModel([("status", ASCENDING), ("assigned_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("office_id", ASCENDING), ("assigned_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("school_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("team_id", ASCENDING), ("assigned_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("assigned_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("template_id", ASCENDING)]),
+        # Overdue responses and office response history; the trailing fields let the
+        # global stats $facet (services.analytics_service) run as an index-only scan
+        IndexModel([
+            ("status", ASCENDING), ("report.submitted_at", ASCENDING), ("created_at", ASCENDING), ("assigned_date", ASCENDING)
+        ]),
+        IndexModel([("office_id", ASCENDING), ("office_response.responded_at", DESCENDING)]),
+        # Stored derived fields (see services.inspection_metrics)
+        IndexModel([("priority", ASCENDING), ("avg_rating", ASCENDING)]),
+        IndexModel([("avg_rating", ASCENDING)]),
+        IndexModel([("response_time_days", ASCENDING)]),
+        IndexModel([("issue_categories", ASCENDING)]),
+        IndexModel([("derived_version", ASCENDING)]),
+        # Word-prefix search (see services.search_service)
+        IndexModel([("search_terms", ASCENDING)]),
+        IndexModel([("search_version", ASCENDING)]),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        # Unread counter reconciliation groups unread notifications by user
+        IndexModel([("user_id", ASCENDING)], partialFilterExpression={"is_read": False}),
+        IndexModel([("read_at", ASCENDING)], expireAfterSeconds=NOTIFICATION_RETENTION_DAYS * 24 * 3600),
+    ],
+    "notifications_archive": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("read_at", DESCENDING)]),
+    ],
+    "notification_outbox": [
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)]),
+        IndexModel([("lease", ASCENDING)], sparse=True),
+        # Processed events are kept for a week for troubleshooting
+        IndexModel([("processed_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("school_id", ASCENDING), ("role", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("role", ASCENDING), ("is_active", ASCENDING)]),
+        IndexModel([("team_id", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "teams": [
+        IndexModel([("school_id", ASCENDING), ("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "schools": [
+        IndexModel([("is_active", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("search_terms", ASCENDING)]),
+    ],
+    "offices": [
+        IndexModel([("is_active", ASCENDING), ("type", ASCENDING), ("district", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("search_terms", ASCENDING)]),
+    ],
+    "templates": [
+        IndexModel([("is_active", ASCENDING), ("office_types", ASCENDING)]),
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("search_terms", ASCENDING)]),
+    ],
+    "inspection_daily_rollups": [
+        IndexModel([("day", ASCENDING)]),
+        IndexModel([("office_id", ASCENDING), ("day", ASCENDING)]),
+        IndexModel([("office_type", ASCENDING), ("day", ASCENDING)]),
+        IndexModel([("district", ASCENDING), ("day", ASCENDING)]),
+    ],
+    "escalations": [
+        IndexModel([("status", ASCENDING), ("escalated_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("escalated_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("inspection_id", ASCENDING)]),
+    ],
+}
+
+
+def _spec(info: Dict) -> Dict:
+    """Normalize an index description (declared or existing) for comparison"""
+    spec = {"key": [(field, direction) for field, direction in dict(info["key"]).items()]}
+    for option in COMPARED_OPTIONS:
+        if option in info:
+            spec[option] = info[option]
+    return spec
+
+
+def _only_expiry_differs(existing: Dict, declared: Dict) -> bool:
+    if "expireAfterSeconds" not in existing or "expireAfterSeconds" not in declared:
+        return False
+    existing_spec, declared_spec = _spec(existing), _spec(declared)
+    existing_spec.pop("expireAfterSeconds")
+    declared_spec.pop("expireAfterSeconds")
+    return existing_spec == declared_spec
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Reconcile declared indexes with the database.
+
+    Missing indexes are created, and TTL indexes whose only difference is the expiry are
+    updated in place with collMod. Other indexes whose definition differs from the
+    declaration, undeclared indexes and indexes that failed to build are reported but
+    never dropped, since rebuilding a large index is an operational decision.
+    """
+    report = {"created": [], "updated": [], "mismatched": [], "undeclared": [], "failed": []}
+
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        declared_names = set()
+
+        for model in models:
+            document = model.document
+            name = document["name"]
+            declared_names.add(name)
+
+            if name not in existing:
+                try:
+                    await db[collection].create_indexes([model])
+                    report["created"].append(f"{collection}.{name}")
+                except OperationFailure as e:
+                    report["failed"].append(f"{collection}.{name}: {e}")
+            elif _spec(existing[name]) != _spec(document):
+                if _only_expiry_differs(existing[name], document):
+                    try:
+                        await db.command(
+                            "collMod", collection,
+                            index={"name": name, "expireAfterSeconds": document["expireAfterSeconds"]}
+                        )
+                        report["updated"].append(f"{collection}.{name}")
+                        continue
+                    except OperationFailure as e:
+                        report["failed"].append(f"{collection}.{name}: {e}")
+                report["mismatched"].append(f"{collection}.{name}")
+
+        for name in existing:
+            if name != "_id_" and name not in declared_names:
+                report["undeclared"].append(f"{collection}.{name}")
+
+    if report["created"]:
+        logger.info(f"Created indexes: {', '.join(report['created'])}")
+    if report["updated"]:
+        logger.info(f"Updated index expiry: {', '.join(report['updated'])}")
+    if report["mismatched"]:
+        logger.warning(f"Indexes differ from their declaration: {', '.join(report['mismatched'])}")
+    if report["undeclared"]:
+        logger.warning(f"Undeclared indexes present: {', '.join(report['undeclared'])}")
+    for failure in report["failed"]:
+        logger.error(f"Failed to create index {failure}")
+
+    return report
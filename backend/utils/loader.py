@@ -0,0 +1,47 @@
+"""Request-scoped batch loader for documents referenced by id"""
+from typing import Dict, Iterable, List, Optional
+from services.search_service import SEARCH_PROJECTION
+
+
+class RelationLoader:
+    """
+    Collects referenced ids and fetches them with one `$in` query per collection.
+
+    A loader is meant to live for a single request: every document it fetches is
+    memoized, so enriching many rows that point at the same office/school/team
+    costs one round trip per collection instead of one per row.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._cache: Dict[str, Dict[str, Optional[dict]]] = {}
+
+    async def load_many(self, collection: str, ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """Fetch documents by id, returning a mapping of id -> document (or None if missing)"""
+        cache = self._cache.setdefault(collection, {})
+        wanted = {doc_id for doc_id in ids if doc_id is not None}
+        missing = [doc_id for doc_id in wanted if doc_id not in cache]
+
+        if missing:
+            docs = await self.db[collection].find({"_id": {"$in": missing}}, SEARCH_PROJECTION).to_list(len(missing))
+            for doc in docs:
+                cache[doc["_id"]] = doc
+            for doc_id in missing:
+                cache.setdefault(doc_id, None)
+
+        return {doc_id: cache[doc_id] for doc_id in wanted}
+
+    async def load(self, collection: str, doc_id: Optional[str]) -> Optional[dict]:
+        """Fetch a single document by id"""
+        if doc_id is None:
+            return None
+        docs = await self.load_many(collection, [doc_id])
+        return docs.get(doc_id)
+
+    async def attach(self, items: List[dict], field: str, collection: str, key: str) -> List[dict]:
+        """Set `item[field]` to the document referenced by `item[key]` for every item"""
+        docs = await self.load_many(collection, (item.get(key) for item in items))
+        for item in items:
+            item[field] = docs.get(item.get(key))
+        return items
+
@@ -0,0 +1,79 @@
+"""Keyset pagination with opaque cursors over (sort key, _id)"""
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+from bson import json_util
+from fastapi import HTTPException
+from pymongo import ASCENDING
+
+
+def encode_cursor(sort_value: Any, doc_id: Any) -> str:
+    """Opaque token for the position right after (sort_value, doc_id)"""
+    payload = json_util.dumps([sort_value, doc_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Inverse of encode_cursor; rejects tampered or malformed tokens"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, doc_id = json_util.loads(payload.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, doc_id
+
+
+def keyset_filter(field: str, direction: int, cursor: str) -> Dict:
+    """Match documents strictly after the cursor in (field, _id) order"""
+    sort_value, doc_id = decode_cursor(cursor)
+    op = "$gt" if direction == ASCENDING else "$lt"
+    return {"$or": [
+        {field: {op: sort_value}},
+        {field: sort_value, "_id": {op: doc_id}}
+    ]}
+
+
+def keyset_sort(field: str, direction: int) -> List[Tuple[str, int]]:
+    """Sort specification with `_id` as the tie-breaker"""
+    return [(field, direction), ("_id", direction)]
+
+
+def _get_path(doc: Dict, path: str) -> Any:
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def next_page(docs: List[Dict], limit: int, field: str) -> Tuple[List[Dict], Optional[str]]:
+    """Trim the look-ahead document fetched with `limit + 1` and build the cursor for the next page"""
+    if limit < 1:
+        return [], None
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(_get_path(last, field), last["_id"])
+
+
+async def find_page(
+    collection,
+    query: Dict,
+    field: str,
+    direction: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    projection: Optional[Dict] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of `collection` in (field, _id) order.
+
+    With a cursor the page starts from an index seek, so its cost does not grow with depth;
+    `skip` is still honoured for callers that page by offset but is ignored once a cursor is given.
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(field, direction, cursor)]}
+        skip = 0
+
+    docs = await collection.find(query, projection).sort(keyset_sort(field, direction)).skip(skip).limit(limit + 1).to_list(limit + 1)
+    return next_page(docs, limit, field)
@@ -12,7 +12,7 @@ import {
 } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useRouter, useLocalSearchParams } from 'expo-router';
-import { inspectionsApi } from '../../services/api';
+import { inspectionsApi, resolvePhotoUri } from '../../services/api';
 import { Inspection } from '../../types';
 import { Ionicons } from '@expo/vector-icons';
 
@@ -243,7 +243,7 @@ export default function HistoryDetailScreen() {
                     {inspection.report.photos.map((photo, index) => (
                       <Image
                         key={index}
-                        source={{ uri: `data:image/jpeg;base64,${photo}` }}
+                        source={{ uri: resolvePhotoUri(photo) }}
                         style={styles.photo}
                       />
                     ))}
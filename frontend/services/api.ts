@@ -12,6 +12,18 @@ const api = axios.create({
   },
 });
 
+// Report photos come back as signed URLs; paths are relative to the API host
+export const resolvePhotoUri = (photo: string): string => {
+  if (/^(https?:|data:)/.test(photo)) {
+    return photo;
+  }
+  if (photo.startsWith('/')) {
+    return `${API_URL}${photo}`;
+  }
+  // Reports stored before photos moved out of the document hold bare base64
+  return `data:image/jpeg;base64,${photo}`;
+};
+
 // Add token to requests
 api.interceptors.request.use(
   async (config) => {
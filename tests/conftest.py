@@ -0,0 +1,22 @@
+"""Shared fixtures: backend modules on the path and an in-memory database behind get_database()"""
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from utils import database  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database, returned by utils.database.get_database() for the test's duration"""
+    monkeypatch.setattr(database, "_client", AsyncMongoMockClient())
+    return database.get_database()
@@ -0,0 +1,79 @@
+"""Issue categorization in services.inspection_metrics"""
+import random
+
+import pytest
+
+from services.inspection_metrics import DEFAULT_ISSUE_KEYWORDS, IssueClassifier, categorize_issues, issue_category_stages
+
+
+def _naive(keywords, text):
+    """The per-keyword substring check the classifier must agree with"""
+    text = (text or "").lower()
+    return [category for category, words in keywords.items() if any(word.lower() in text for word in words)]
+
+
+def test_default_vocabulary():
+    assert categorize_issues("Dirty floors and RUDE staff") == ["Cleanliness", "Staff Behavior"]
+    assert categorize_issues("Long queue at the counter") == ["Service Quality"]
+    assert categorize_issues("Nothing to report") == []
+    assert categorize_issues("") == []
+    assert categorize_issues(None) == []
+
+
+def test_keyword_inside_a_longer_keyword_counts_for_both_categories():
+    keywords = {"Service": ["service"], "Vice": ["vice"], "Ice": ["ice"]}
+    classifier = IssueClassifier(keywords)
+
+    assert classifier.classify("poor service") == ["Service", "Vice", "Ice"]
+    assert classifier.classify("no vice here") == ["Vice", "Ice"]
+
+
+def test_overlapping_matches_are_all_found():
+    classifier = IssueClassifier({"A": ["abc"], "B": ["bcd"]})
+
+    assert classifier.classify("abcd") == ["A", "B"]
+
+
+def test_keywords_are_matched_literally():
+    classifier = IssueClassifier({"Price": ["$5+"], "Dots": ["a.b"]})
+
+    assert classifier.classify("charged $5+ fee") == ["Price"]
+    assert classifier.classify("axb") == []
+
+
+def test_empty_vocabulary_matches_nothing():
+    assert IssueClassifier({}).classify("anything") == []
+
+
+def test_agrees_with_naive_matching_on_random_texts():
+    rng = random.Random(7)
+    keywords = {**DEFAULT_ISSUE_KEYWORDS, "Overlap": ["aff", "ice", "wait"]}
+    classifier = IssueClassifier(keywords)
+    fragments = [word for words in keywords.values() for word in words] + ["x", " ", "Q", "st"]
+
+    for _ in range(500):
+        text = "".join(rng.choice(fragments)[: rng.randint(1, 8)] for _ in range(rng.randint(0, 12)))
+        assert classifier.classify(text) == _naive(keywords, text), text
+
+
+@pytest.mark.anyio
+async def test_issue_category_stages_count_stored_categories(db):
+    await db.inspections.insert_many([
+        {"_id": 1, "office_id": "o1", "report": {"issues": "dirty"}, "issue_categories": ["Cleanliness"]},
+        {"_id": 2, "office_id": "o1", "report": {"issues": "dirty, rude"}, "issue_categories": ["Cleanliness", "Staff Behavior"]},
+        {"_id": 3, "office_id": "o1", "report": {"issues": "odd"}, "issue_categories": []},
+        {"_id": 4, "office_id": "o1", "report": {"issues": ""}, "issue_categories": []},
+        {"_id": 5, "office_id": "o2", "report": {"issues": "dirty"}, "issue_categories": ["Cleanliness"]}
+    ])
+
+    rows = await db.inspections.aggregate(issue_category_stages({"office_id": "o1"})).to_list(None)
+    without_other = await db.inspections.aggregate(
+        issue_category_stages({"office_id": "o1"}, include_other=False)
+    ).to_list(None)
+
+    assert rows == [
+        {"_id": "Cleanliness", "count": 2},
+        {"_id": "Other", "count": 1},
+        {"_id": "Staff Behavior", "count": 1}
+    ]
+    assert without_other == [{"_id": "Cleanliness", "count": 2}, {"_id": "Staff Behavior", "count": 1}]
@@ -0,0 +1,79 @@
+"""Batching and memoization in utils.loader.RelationLoader"""
+import pytest
+
+from utils.loader import RelationLoader
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingDatabase:
+    """Wraps a database and records the ids requested by every find()"""
+
+    def __init__(self, db):
+        self.db = db
+        self.queries = []
+
+    def __getitem__(self, name):
+        collection = self.db[name]
+        queries = self.queries
+
+        class Collection:
+            def find(self, query, *args, **kwargs):
+                queries.append((name, sorted(query["_id"]["$in"])))
+                return collection.find(query, *args, **kwargs)
+
+        return Collection()
+
+
+@pytest.fixture
+async def counting_db(db):
+    await db.offices.insert_many([
+        {"_id": "office-1", "name": "North", "search_terms": ["no", "nor"], "search_version": 1},
+        {"_id": "office-2", "name": "South"}
+    ])
+    await db.schools.insert_one({"_id": "school-1", "name": "Central"})
+    return CountingDatabase(db)
+
+
+async def test_load_many_fetches_each_collection_once(counting_db):
+    loader = RelationLoader(counting_db)
+
+    offices = await loader.load_many("offices", ["office-1", "office-2", "office-1", None])
+    schools = await loader.load_many("schools", ["school-1"])
+
+    assert offices["office-1"]["name"] == "North"
+    assert offices["office-2"]["name"] == "South"
+    assert schools["school-1"]["name"] == "Central"
+    assert counting_db.queries == [("offices", ["office-1", "office-2"]), ("schools", ["school-1"])]
+
+
+async def test_repeated_ids_are_served_from_the_cache(counting_db):
+    loader = RelationLoader(counting_db)
+    await loader.load_many("offices", ["office-1"])
+
+    assert (await loader.load("offices", "office-1"))["name"] == "North"
+    await loader.load_many("offices", ["office-1", "office-2"])
+
+    assert counting_db.queries == [("offices", ["office-1"]), ("offices", ["office-2"])]
+
+
+async def test_missing_documents_are_memoized_as_none(counting_db):
+    loader = RelationLoader(counting_db)
+
+    assert await loader.load("offices", "gone") is None
+    assert await loader.load("offices", "gone") is None
+    assert await loader.load("offices", None) is None
+
+    assert counting_db.queries == [("offices", ["gone"])]
+
+
+async def test_attach_sets_related_documents_without_search_fields(counting_db):
+    loader = RelationLoader(counting_db)
+    items = [{"office_id": "office-1"}, {"office_id": "office-2"}, {"office_id": None}]
+
+    await loader.attach(items, "office", "offices", "office_id")
+
+    assert items[0]["office"] == {"_id": "office-1", "name": "North"}
+    assert items[1]["office"]["name"] == "South"
+    assert items[2]["office"] is None
+    assert len(counting_db.queries) == 1
@@ -0,0 +1,90 @@
+"""Eviction, expiry and the invalidation epoch guard of utils.cache.LRUCache"""
+import pytest
+
+from utils import cache
+from utils.cache import LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_read_started_before_invalidation_is_not_stored():
+    users = LRUCache(max_size=10, ttl=60)
+    epoch = users.epoch()
+
+    # A writer changes the user while the read is in flight
+    users.invalidate(["user-1"])
+    users.put("user-1", {"name": "stale"}, epoch)
+
+    assert users.get("user-1") is None
+
+
+def test_read_started_after_invalidation_is_stored():
+    users = LRUCache(max_size=10, ttl=60)
+    users.invalidate(["user-1"])
+    epoch = users.epoch()
+
+    users.put("user-1", {"name": "fresh"}, epoch)
+
+    assert users.get("user-1") == {"name": "fresh"}
+
+
+def test_clear_advances_the_epoch():
+    users = LRUCache(max_size=10, ttl=60)
+    epoch = users.epoch()
+    users.put("user-1", "a", epoch)
+
+    users.clear()
+    users.put("user-2", "b", epoch)
+
+    assert users.get("user-1") is None
+    assert users.get("user-2") is None
+
+
+def test_invalidate_removes_only_the_given_keys():
+    users = LRUCache(max_size=10, ttl=60)
+    users.put("user-1", "a")
+    users.put("user-2", "b")
+
+    users.invalidate(["user-1", "missing"])
+
+    assert users.get("user-1") is None
+    assert users.get("user-2") == "b"
+    assert users.stats()["invalidations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    users = LRUCache(max_size=2, ttl=60)
+    users.put("user-1", "a")
+    users.put("user-2", "b")
+    users.get("user-1")
+
+    users.put("user-3", "c")
+
+    assert users.get("user-2") is None
+    assert users.get("user-1") == "a"
+    assert users.get("user-3") == "c"
+    assert users.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    users = LRUCache(max_size=10, ttl=60)
+    users.put("user-1", "a")
+
+    clock[0] += 59
+    assert users.get("user-1") == "a"
+    clock[0] += 1
+    assert users.get("user-1") is None
+    assert users.stats()["size"] == 0
+
+
+def test_zero_size_cache_stores_nothing():
+    users = LRUCache(max_size=0, ttl=60)
+    users.put("user-1", "a")
+
+    assert users.get("user-1") is None
+    assert users.stats()["misses"] == 1
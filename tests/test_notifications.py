@@ -0,0 +1,76 @@
+"""Unread notification counters and the endpoints reporting them"""
+import pytest
+
+from routes import notifications
+from services import notification_service
+from services.notification_service import COUNTERS_COLLECTION, adjust_unread_counts, build_notification
+
+pytestmark = pytest.mark.anyio
+
+USER = {"_id": "user-1", "role": "student"}
+
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+async def _insert_unread(db, count, user_id="user-1"):
+    await db.notifications.insert_many([
+        build_notification(f"n-{user_id}-{i}", user_id, "Title", "Message", "info") for i in range(count)
+    ])
+
+
+async def test_unread_count_seeds_counter_from_notifications(db):
+    await _insert_unread(db, 3)
+    await _insert_unread(db, 2, user_id="user-2")
+
+    assert await notification_service.get_unread_count("user-1") == 3
+    assert (await db[COUNTERS_COLLECTION].find_one({"_id": "user-1"}))["unread"] == 3
+
+
+async def test_unread_count_follows_adjustments(db):
+    await _insert_unread(db, 3)
+    await notification_service.get_unread_count("user-1")
+
+    await adjust_unread_counts({"user-1": 2})
+    assert await notification_service.get_unread_count("user-1") == 5
+
+    await adjust_unread_counts({"user-1": -7})
+    assert await notification_service.get_unread_count("user-1") == 0
+
+
+async def test_insert_notifications_increments_counter(db):
+    await notification_service.get_unread_count("user-1")
+
+    await notification_service.insert_notifications([
+        build_notification("n-1", "user-1", "Title", "Message", "info"),
+        build_notification("n-2", "user-1", "Title", "Message", "info")
+    ])
+
+    assert await notification_service.get_unread_count("user-1") == 2
+
+
+async def test_unread_count_endpoint(db):
+    await _insert_unread(db, 4)
+
+    response = await notifications.get_unread_count(current_user=USER, db=db)
+
+    assert response == {"unread_count": 4}
+
+
+async def test_stream_starts_with_unread_count(db):
+    await _insert_unread(db, 2)
+
+    response = await notifications.stream_notifications(
+        request=ConnectedRequest(), last_event_id=None, current_user=USER, db=db
+    )
+    events = response.body_iterator
+    try:
+        assert (await events.__anext__()).startswith("retry:")
+        event = await events.__anext__()
+    finally:
+        await events.aclose()
+
+    assert event.startswith("event: unread_count\n")
+    assert '"unread_count": 2' in event
@@ -0,0 +1,77 @@
+"""Keyset cursors and page walking in utils.pagination"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from utils.pagination import decode_cursor, encode_cursor, find_page, next_page
+
+
+def test_cursor_round_trip_keeps_types():
+    created_at = datetime(2024, 5, 17, 10, 30, 15, 123000)
+
+    assert decode_cursor(encode_cursor(created_at, "insp-1")) == (created_at, "insp-1")
+    assert decode_cursor(encode_cursor(4.5, 12)) == (4.5, 12)
+    assert decode_cursor(encode_cursor(None, "x")) == (None, "x")
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("a/b+c?" * 10, "id")
+
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor!", "e30", "WzFd", encode_cursor(1, 2)[:-3] + "@@@", "////"])
+def test_invalid_cursor_is_rejected_with_400(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+
+    assert exc_info.value.status_code == 400
+
+
+def test_next_page_trims_look_ahead_and_points_at_last_document():
+    docs = [{"_id": i, "report": {"submitted_at": i * 10}} for i in range(4)]
+
+    page, cursor = next_page(docs, 3, "report.submitted_at")
+
+    assert page == docs[:3]
+    assert decode_cursor(cursor) == (20, 2)
+
+
+def test_next_page_without_more_documents_has_no_cursor():
+    docs = [{"_id": 1, "created_at": 1}]
+
+    assert next_page(docs, 1, "created_at") == (docs, None)
+    assert next_page(docs, 0, "created_at") == ([], None)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+async def test_find_page_walks_every_document_once(db, direction):
+    start = datetime(2024, 1, 1)
+    # Pairs of documents share a timestamp, so the _id tie-breaker matters
+    await db.items.insert_many([
+        {"_id": f"item-{i:02d}", "created_at": start + timedelta(days=i // 2)} for i in range(11)
+    ])
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await find_page(db.items, {}, "created_at", direction, 3, cursor=cursor)
+        seen.extend(doc["_id"] for doc in page)
+        if cursor is None:
+            break
+
+    expected = [f"item-{i:02d}" for i in range(11)]
+    assert seen == (expected if direction == ASCENDING else expected[::-1])
+
+
+@pytest.mark.anyio
+async def test_find_page_ignores_skip_once_a_cursor_is_given(db):
+    await db.items.insert_many([{"_id": i, "created_at": i} for i in range(6)])
+
+    first, cursor = await find_page(db.items, {}, "created_at", ASCENDING, 2, skip=1)
+    second, _ = await find_page(db.items, {}, "created_at", ASCENDING, 2, cursor=cursor, skip=1)
+
+    assert [doc["_id"] for doc in first] == [1, 2]
+    assert [doc["_id"] for doc in second] == [3, 4]
@@ -0,0 +1,96 @@
+"""Range parsing and signed URLs for inspection photos"""
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi import HTTPException
+
+from routes.inspections import _parse_byte_range, get_inspection_photo
+from services import photo_store
+from services.photo_store import photo_url, sign_report_photos, signed_photo_url, verify_photo_signature
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    (" bytes=0-0 ", (0, 0)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_parse_byte_range(header, expected):
+    assert _parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=-", "bytes=1000-", "bytes=50-10", "bytes=-0", "bytes=0-10,20-30", "items=0-10", "bytes=a-b", ""
+])
+def test_unsatisfiable_or_malformed_ranges(header):
+    assert _parse_byte_range(header, 1000) is None
+
+
+def test_empty_file_has_no_satisfiable_range():
+    assert _parse_byte_range("bytes=0-", 0) is None
+    assert _parse_byte_range("bytes=-10", 0) is None
+
+
+def _signed_params(inspection_id="insp-1", photo_id="photo-1"):
+    query = parse_qs(urlsplit(signed_photo_url(inspection_id, photo_id)).query)
+    return int(query["expires"][0]), query["signature"][0]
+
+
+def test_signed_url_verifies():
+    url = signed_photo_url("insp-1", "photo-1")
+    expires, signature = _signed_params()
+
+    assert url.startswith(photo_url("insp-1", "photo-1") + "?")
+    assert expires > time.time() + photo_store.PHOTO_URL_TTL_SECONDS
+    assert verify_photo_signature("insp-1", "photo-1", expires, signature)
+
+
+def test_signature_is_bound_to_photo_inspection_and_expiry():
+    expires, signature = _signed_params()
+
+    assert not verify_photo_signature("insp-1", "photo-2", expires, signature)
+    assert not verify_photo_signature("insp-2", "photo-1", expires, signature)
+    assert not verify_photo_signature("insp-1", "photo-1", expires + 3600, signature)
+    tampered = signature[:-1] + ("1" if signature[-1] == "0" else "0")
+    assert not verify_photo_signature("insp-1", "photo-1", expires, tampered)
+
+
+def test_expired_signature_is_rejected(monkeypatch):
+    expires, signature = _signed_params()
+    monkeypatch.setattr(photo_store.time, "time", lambda: expires + 1)
+
+    assert not verify_photo_signature("insp-1", "photo-1", expires, signature)
+
+
+def test_sign_report_photos_signs_stored_paths_only():
+    inspections = [
+        {
+            "_id": "insp-1",
+            "report": {
+                "photo_ids": ["photo-1"],
+                "photos": [photo_url("insp-1", "photo-1"), "https://example.org/external.jpg"]
+            }
+        },
+        {"_id": "insp-2", "report": None},
+        None
+    ]
+
+    sign_report_photos(inspections)
+
+    signed, external = inspections[0]["report"]["photos"]
+    assert "signature=" in signed
+    assert external == "https://example.org/external.jpg"
+
+
+@pytest.mark.anyio
+async def test_photo_endpoint_rejects_bad_signature():
+    expires, signature = _signed_params()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_inspection_photo("insp-1", "photo-2", request=None, expires=expires, signature=signature, db=None)
+
+    assert exc_info.value.status_code == 403
@@ -0,0 +1,48 @@
+"""Revision-guarded inspection writes and the 409 they map to"""
+from datetime import datetime
+
+import pytest
+
+from routes.inspections import concurrent_modification_handler
+from services.rollup_service import ConcurrentModificationError, update_inspection_with_rollup
+
+pytestmark = pytest.mark.anyio
+
+
+def _inspection():
+    now = datetime.utcnow()
+    return {
+        "_id": "insp-1",
+        "office_id": "office-1",
+        "school_id": "school-1",
+        "status": "assigned",
+        "assigned_date": now,
+        "created_at": now
+    }
+
+
+async def test_update_bumps_revision(db):
+    await db.inspections.insert_one(_inspection())
+    before = await db.inspections.find_one({"_id": "insp-1"})
+
+    after = await update_inspection_with_rollup(before, {"$set": {"status": "in_progress"}})
+
+    assert after["status"] == "in_progress"
+    assert after["revision"] == 1
+
+
+async def test_stale_read_raises_concurrent_modification(db):
+    await db.inspections.insert_one(_inspection())
+    before = await db.inspections.find_one({"_id": "insp-1"})
+    await update_inspection_with_rollup(before, {"$set": {"status": "in_progress"}})
+
+    with pytest.raises(ConcurrentModificationError):
+        await update_inspection_with_rollup(before, {"$set": {"status": "closed"}})
+
+    assert (await db.inspections.find_one({"_id": "insp-1"}))["status"] == "in_progress"
+
+
+async def test_concurrent_modification_maps_to_409():
+    response = await concurrent_modification_handler(None, ConcurrentModificationError("insp-1"))
+
+    assert response.status_code == 409
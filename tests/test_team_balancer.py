@@ -0,0 +1,37 @@
+"""Workload-balanced team assignment in services.campaign_service.TeamBalancer"""
+from collections import Counter
+
+from services.campaign_service import TeamBalancer
+
+
+def _teams(*team_ids, school_id="school-1"):
+    return [{"_id": team_id, "school_id": school_id} for team_id in team_ids]
+
+
+def test_assignments_spread_evenly_without_prior_workload():
+    balancer = TeamBalancer(_teams("a", "b", "c"), {})
+
+    assigned = Counter(balancer.assign()[0] for _ in range(9))
+
+    assert assigned == Counter({"a": 3, "b": 3, "c": 3})
+
+
+def test_least_loaded_teams_catch_up_first():
+    balancer = TeamBalancer(_teams("busy", "idle"), {"busy": 5, "idle": 1})
+
+    first = [balancer.assign()[0] for _ in range(4)]
+    rest = Counter(balancer.assign()[0] for _ in range(4))
+
+    assert first == ["idle"] * 4
+    assert rest == Counter({"busy": 2, "idle": 2})
+
+
+def test_assign_returns_the_team_school():
+    balancer = TeamBalancer(_teams("a", school_id="school-9"), {})
+
+    assert balancer.assign() == ("a", "school-9")
+
+
+def test_balancer_without_teams_is_falsy():
+    assert not TeamBalancer([], {})
+    assert TeamBalancer(_teams("a"), {})
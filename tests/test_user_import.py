@@ -0,0 +1,108 @@
+"""Row validation and duplicate detection in services.user_import batches"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pymongo import ASCENDING
+
+from services import user_import
+from utils.auth import verify_password
+
+pytestmark = pytest.mark.anyio
+
+
+def _row(email, role="student", **fields):
+    return {"email": email, "name": email.split("@")[0], "password": "secret123", "role": role, **fields}
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+@pytest.fixture
+async def users(db):
+    await db.users.create_index([("email", ASCENDING)], unique=True)
+    await db.users.insert_one({"_id": "existing", "email": "taken@example.org", "role": "student"})
+    return db.users
+
+
+async def _import(db, executor, rows, seen_emails=None, school_counts=None):
+    batch = list(enumerate(rows, start=2))
+    return await user_import._import_batch(
+        db,
+        executor,
+        batch,
+        seen_emails if seen_emails is not None else set(),
+        school_counts if school_counts is not None else Counter()
+    )
+
+
+async def test_valid_rows_are_created_with_hashed_passwords(db, users, executor):
+    school_counts = Counter()
+
+    rows = [_row("a@example.org", school_id="school-1"), _row("b@example.org", "office")]
+
+    result = await _import(db, executor, rows, school_counts=school_counts)
+
+    assert [user["email"] for user in result["created"]] == ["a@example.org", "b@example.org"]
+    assert result["errors"] == []
+    stored = await users.find_one({"email": "a@example.org"})
+    assert verify_password("secret123", stored["password"])
+    assert school_counts == Counter({"school-1": 1})
+
+
+async def test_duplicate_within_the_file_is_reported_once(db, users, executor):
+    result = await _import(db, executor, [_row("a@example.org"), _row("b@example.org"), _row("a@example.org")])
+
+    assert [user["email"] for user in result["created"]] == ["a@example.org", "b@example.org"]
+    assert result["errors"] == [{"row": 4, "email": "a@example.org", "error": "Email appears more than once in the file"}]
+
+
+async def test_duplicate_across_batches_of_one_file(db, users, executor):
+    seen_emails = set()
+    await _import(db, executor, [_row("a@example.org")], seen_emails=seen_emails)
+
+    result = await _import(db, executor, [_row("a@example.org")], seen_emails=seen_emails)
+
+    assert result["created"] == []
+    assert result["errors"][0]["error"] == "Email appears more than once in the file"
+
+
+async def test_email_already_in_the_database_is_rejected(db, users, executor):
+    result = await _import(db, executor, [_row("taken@example.org"), _row("new@example.org")])
+
+    assert [user["email"] for user in result["created"]] == ["new@example.org"]
+    assert result["errors"] == [{"row": 2, "email": "taken@example.org", "error": "Email already registered"}]
+    assert await users.count_documents({"email": "taken@example.org"}) == 1
+
+
+async def test_email_registered_while_the_batch_was_hashing(db, users, executor, monkeypatch):
+    hash_batch = user_import._hash_batch
+
+    async def hash_then_race(pool, passwords):
+        hashed = await hash_batch(pool, passwords)
+        await users.insert_one({"_id": "racer", "email": "a@example.org", "role": "student"})
+        return hashed
+
+    monkeypatch.setattr(user_import, "_hash_batch", hash_then_race)
+
+    result = await _import(db, executor, [_row("a@example.org"), _row("b@example.org")])
+
+    assert [user["email"] for user in result["created"]] == ["b@example.org"]
+    assert result["errors"] == [{"row": 2, "email": "a@example.org", "error": "Email already registered"}]
+
+
+async def test_invalid_rows_are_reported_in_row_order(db, users, executor):
+    result = await _import(db, executor, [
+        _row("a@example.org", role="janitor"),
+        {"email": "", "name": "", "password": "x", "role": "student"},
+        _row("c@example.org")
+    ])
+
+    assert [user["email"] for user in result["created"]] == ["c@example.org"]
+    assert result["errors"] == [
+        {"row": 2, "email": "a@example.org", "error": "Invalid role: janitor"},
+        {"row": 3, "email": "N/A", "error": "Missing required fields: email, name"}
+    ]